@@ -0,0 +1,629 @@
+"""Benchmarks for TweetFetch.
+
+Generates deterministic synthetic liked_tweets.json archives and times loading,
+date parsing, filtering, search, stats, .game setup and slideshow pagination
+against them through a fake command context, without connecting to Discord.
+
+    python bench.py --sizes 10000,100000
+    python bench.py --sizes 1000000 --output bench_new.txt --compare bench_old.txt
+    python bench.py --verify
+
+Every result is one JSON object per line in the output file (the first line
+describes the run), so runs of different versions can be diffed or compared
+with --compare. --verify checks the fast date parser, the parallel load and the
+NumPy column filters/aggregates against the strptime, one-process and Python index
+versions instead of timing anything.
+"""
+
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SIZES = (10_000, 100_000)
+DEFAULT_SEED = 1
+
+# Fixed English names, so the generated dates don't depend on the locale
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+# Liked tweets: about a third have no media, photos dominate, albums of up to 4
+MEDIA_COUNT_WEIGHTS = {0: 35, 1: 40, 2: 10, 3: 5, 4: 10}
+MEDIA_TYPE_WEIGHTS = {"jpg": 65, "png": 10, "mp4": 25}
+COMMON_WORDS = ("the", "of", "and", "to", "a", "in", "is", "you", "that", "it", "cat", "art")  # Most frequent first
+
+
+# Synthetic archives
+
+def zipf_cumulative_weights(count, exponent=1.1):
+    """Cumulative weights where rank r is picked proportionally to 1 / r^exponent."""
+    return list(itertools.accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+
+def format_created_at(dt):
+    """Twitter's created_at format ("Wed Oct 10 20:19:24 +0000 2018")."""
+    return f"{WEEKDAYS[dt.weekday()]} {MONTHS[dt.month - 1]} {dt:%d %H:%M:%S} +0000 {dt.year}"
+
+def generate_tweets(count, seed=DEFAULT_SEED):
+    """Yield count raw liked tweets. The same count and seed always give the same tweets.
+
+    Handles and words follow a Zipf distribution (a few accounts get most of the likes),
+    likes are newest first like the real export, and tweet dates spread over six years.
+    """
+    rng = random.Random(seed)
+    handle_count = min(50_000, max(50, count // 40))
+    handles = [f"{rng.choice(('art', 'daily', 'the', 'real', ''))}user_{i}{rng.choice(('', '_', 'x', 'HQ'))}"
+               for i in range(handle_count)]
+    handle_weights = zipf_cumulative_weights(handle_count)
+    vocabulary = list(COMMON_WORDS) + [''.join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(2, 9)))
+                                       for _ in range(5000)]
+    word_weights = zipf_cumulative_weights(len(vocabulary), 1.0)
+    media_counts, media_count_weights = zip(*MEDIA_COUNT_WEIGHTS.items())
+    media_types, media_type_weights = zip(*MEDIA_TYPE_WEIGHTS.items())
+
+    end = datetime.datetime(2025, 6, 1, tzinfo=datetime.timezone.utc)
+    span_seconds = 6 * 365 * 24 * 3600
+    for i in range(count):
+        # Tweet dates fall as we go down the list, with some jitter since old tweets get liked too
+        created = end - datetime.timedelta(seconds=int(span_seconds * i / count) + rng.randrange(30 * 24 * 3600))
+        words = rng.choices(vocabulary, cum_weights=word_weights, k=rng.randint(3, 40))
+        if rng.random() < 0.3:
+            words.append(f"https://t.co/{rng.getrandbits(40):x}")
+
+        media = []
+        for _ in range(rng.choices(media_counts, media_count_weights)[0]):
+            media_id = rng.getrandbits(60)
+            if rng.choices(media_types, media_type_weights)[0] == "mp4":
+                media.append(f"https://video.twimg.com/ext_tw_video/{media_id}/pu/vid/1280x720/{media_id:x}.mp4?tag=12")
+            else:
+                extension = "png" if rng.random() < MEDIA_TYPE_WEIGHTS["png"] / (MEDIA_TYPE_WEIGHTS["png"] + MEDIA_TYPE_WEIGHTS["jpg"]) else "jpg"
+                media.append(f"https://pbs.twimg.com/media/{media_id:x}.{extension}")
+
+        yield {
+            "tweet_id": str(1_000_000_000_000_000_000 + i),
+            "user_handle": rng.choices(handles, cum_weights=handle_weights)[0],
+            "tweet_content": " ".join(words),
+            "tweet_created_at": format_created_at(created),
+            "tweet_media_urls": media,
+        }
+
+def write_archive(path, count, seed=DEFAULT_SEED):
+    """Stream a generated archive to path (formatted like the exporter's JSON array)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write("[\n")
+        for i, tweet in enumerate(generate_tweets(count, seed)):
+            if i:
+                f.write(",\n")
+            f.write(json.dumps(tweet, ensure_ascii=False))
+        f.write("\n]\n")
+    os.replace(temp_path, path)
+
+def profile_name_for(size, seed):
+    return f"bench-{size}-s{seed}"
+
+def prepare_archives(data_dir, sizes, seed):
+    """Generate any missing archives under data_dir/users/<profile>/liked_tweets.json."""
+    for size in sizes:
+        path = os.path.join(data_dir, "users", profile_name_for(size, seed), "liked_tweets.json")
+        if not os.path.exists(path):
+            print(f"🛠️  Generating {size} tweets -> {path}")
+            started = time.perf_counter()
+            write_archive(path, size, seed)
+            print(f"   done in {time.perf_counter() - started:.1f}s ({os.path.getsize(path) / 1e6:.0f} MB)")
+
+
+# Fake Discord objects
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+        self.mention = f"<@{user_id}>"
+        self.name = f"bench{user_id}"
+
+class FakeChannel:
+    def __init__(self, channel_id):
+        self.id = channel_id
+
+class FakeGuild:
+    def __init__(self, guild_id):
+        self.id = guild_id
+
+class FakeMessage:
+    id = 1
+
+    async def add_reaction(self, emoji):
+        pass
+
+    async def edit(self, **kwargs):
+        pass
+
+class FakeContext:
+    """Enough of commands.Context for the bot's commands: it records what gets sent."""
+
+    def __init__(self, user_id=1, guild_id=1, channel_id=1):
+        self.author = FakeUser(user_id)
+        self.guild = FakeGuild(guild_id)
+        self.channel = FakeChannel(channel_id)
+        self.sent = []
+
+    async def send(self, content=None, **kwargs):
+        self.sent.append((content, kwargs))
+        return FakeMessage()
+
+    @property
+    def last_view(self):
+        return self.sent[-1][1].get("view") if self.sent else None
+
+
+# Timing
+
+def measure(fn, repeat):
+    """Run fn repeat times; returns (timings in seconds, last return value)."""
+    timings = []
+    value = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        value = fn()
+        timings.append(time.perf_counter() - started)
+    return timings, value
+
+async def measure_async(fn, repeat):
+    timings = []
+    value = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        value = await fn()
+        timings.append(time.perf_counter() - started)
+    return timings, value
+
+class Results:
+    """Collects results and writes them as JSON lines."""
+
+    def __init__(self, output_path, meta):
+        self.output_path = output_path
+        self.records = [dict(meta, record="run")]
+
+    def add(self, size, benchmark, timings, **extra):
+        record = {
+            "record": "result",
+            "size": size,
+            "benchmark": benchmark,
+            "median_s": statistics.median(timings),
+            "min_s": min(timings),
+            "runs": len(timings),
+        }
+        record.update(extra)
+        self.records.append(record)
+        print(f"  {benchmark:<32} {record['median_s'] * 1000:>10.2f} ms" + (f"  {extra}" if extra else ""))
+
+    def write(self):
+        with open(self.output_path, "w", encoding="utf-8") as f:
+            for record in self.records:
+                f.write(json.dumps(record) + "\n")
+        print(f"\n📝 Wrote {len(self.records) - 1} results to {self.output_path}")
+
+def run_metadata(args):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "started_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "seed": args.seed,
+        "sizes": args.sizes,
+        "repeat": args.repeat,
+    }
+
+def compare(old_path, records):
+    """Print how this run's medians compare to a previous output file."""
+    with open(old_path, encoding="utf-8") as f:
+        old = [json.loads(line) for line in f if line.strip()]
+    old_medians = {(r["size"], r["benchmark"]): r["median_s"] for r in old if r.get("record") == "result"}
+    print(f"\n📊 Compared with {old_path} ({old[0].get('commit') if old else '?'}):")
+    for record in records:
+        key = (record.get("size"), record.get("benchmark"))
+        if record.get("record") != "result" or key not in old_medians or not record["median_s"]:
+            continue
+        ratio = old_medians[key] / record["median_s"]
+        print(f"  {record['size']:>9} {record['benchmark']:<32} {ratio:>6.2f}x {'faster' if ratio >= 1 else 'slower'}")
+
+
+# Benchmarks
+
+FILTER_QUERIES = {
+    "filter_all": {},
+    "filter_handle": {"username": "user_1"},
+    "filter_year": {"year": "2023"},
+    "filter_month": {"year": "2022", "month": "07"},
+    "filter_handle_year": {"username": "user_2", "year": "2024"},
+    "filter_search": {"search": "the OR and"},
+    "filter_range": {"range_args": ["2023-01..2023-06"]},
+    "filter_newest": {"range_args": ["newest"]},
+}
+
+STATS_ARGS = {
+    "stats_general": (),
+    "stats_top_users": ("top_users",),
+    "stats_media": ("media",),
+    "stats_longest": ("longest",),
+    "stats_year": ("2023",),
+}
+
+def bench_parse_dates(bot, size, seed, results, repeat):
+    raw = list(itertools.islice(generate_tweets(size, seed), 20_000))
+    timings, _ = measure(lambda: [bot.parse_tweet_date(tweet) for tweet in raw], repeat)
+    results.add(size, "parse_tweet_date_x20k", timings, per_tweet_us=round(statistics.median(timings) / len(raw) * 1e6, 3))
+    dates = [tweet["tweet_created_at"] for tweet in raw]
+    timings, _ = measure(lambda: [bot.parse_created_at(text) for text in dates], repeat)
+    results.add(size, "parse_created_at_x20k", timings, per_tweet_us=round(statistics.median(timings) / len(raw) * 1e6, 3))
+
+def bench_load(bot, name, size, results, repeat):
+    json_path = bot.PROFILES[name]
+    snapshot_path = bot.snapshot_path_for(json_path)
+    file_mb = os.path.getsize(json_path) / 1e6
+
+    def cold_load(snapshots):
+        bot.PROFILE_CACHE.discard(name)
+        bot.SNAPSHOTS_ENABLED = snapshots
+        if not snapshots and os.path.exists(snapshot_path):
+            os.remove(snapshot_path)
+        return bot.load_tweets(name)
+
+    timings, data = measure(lambda: cold_load(False), repeat)
+    results.add(size, "load_parse", timings, tweets=len(data.tweets), file_mb=round(file_mb, 1),
+                mb_per_s=round(file_mb / statistics.median(timings), 1))
+
+    timings, _ = measure(lambda: cold_load(True), 1)  # First load also writes the snapshot
+    results.add(size, "load_parse_and_write_snapshot", timings)
+    timings, data = measure(lambda: cold_load(True), repeat)
+    results.add(size, "load_snapshot", timings, tweets=len(data.tweets))
+
+    timings, _ = measure(lambda: bot.load_tweets(name, force_reload=True), repeat)
+    results.add(size, "reload_unchanged", timings)
+    return data
+
+def bench_filters(bot, ctx, size, results, repeat):
+    for benchmark, query in FILTER_QUERIES.items():
+        time_args = query.get("range_args", [])
+        _, time_range, order = bot.parse_time_filters(time_args)
+
+        def run():
+            bot.QUERY_CACHE.invalidate()
+            result = bot.filter_tweets(ctx, query.get("username"), query.get("year"), query.get("month"),
+                                       query.get("day"), search=query.get("search"), time_range=time_range, order=order)
+            return len(result)
+
+        timings, matches = measure(run, repeat)
+        results.add(size, benchmark, timings, matches=matches)
+
+    len(bot.filter_tweets(ctx, "user_1"))
+    timings, _ = measure(lambda: len(bot.filter_tweets(ctx, "user_1")), repeat)
+    results.add(size, "filter_handle_cached", timings)
+
+    data = bot.load_tweets(bot.profile_for(ctx))
+    for benchmark, query in (("search_word", "the"), ("search_and", "the and"), ("search_phrase", '"of the"')):
+        timings, ranked = measure(lambda: data.text_index.ranked(query), repeat)
+        results.add(size, benchmark, timings, matches=len(ranked))
+
+async def bench_commands(bot, ctx, data, size, results, repeat):
+    for benchmark, args in STATS_ARGS.items():
+        timings, _ = await measure_async(lambda: bot.stats.callback(ctx, *args), repeat)
+        results.add(size, benchmark, timings)
+    top_handle = data.stats.top_users()[0][0]
+    timings, _ = await measure_async(lambda: bot.stats.callback(ctx, "user", top_handle), repeat)
+    results.add(size, "stats_user", timings)
+
+    # .game setup: building the image pool, then drawing from it
+    timings, pool = measure(lambda: bot.GamePool(data.tweets), repeat)
+    results.add(size, "game_pool_build", timings, images=len(pool))
+    timings, _ = measure(lambda: [pool.draw(channel) for channel in range(100)], repeat)
+    results.add(size, "game_draw_x100", timings)
+
+    # .compile up to the menu, then a slideshow paged forwards, to the end and back
+    def compile_command():
+        bot.QUERY_CACHE.invalidate()
+        return bot.compile.callback(ctx)
+    timings, _ = await measure_async(compile_command, repeat)
+    results.add(size, "compile_menu", timings)
+
+    result = bot.filter_tweets(ctx)
+    timings, _ = await measure_async(lambda: bot.send_rich_slideshow(ctx, result), repeat)
+    results.add(size, "slideshow_open", timings)
+    view = ctx.last_view
+
+    def page_through():
+        pages = min(view.total_pages, 50)
+        for page in range(pages):
+            view.embed_factory(page)
+        view.embed_factory(view.total_pages - 1)
+        for page in range(view.total_pages - 1, max(view.total_pages - 11, -1), -1):
+            view.embed_factory(page)
+    timings, _ = measure(page_through, repeat)
+    results.add(size, "slideshow_page_x60", timings)
+    view.stop()
+
+    filtered = bot.filter_tweets(ctx, "user_1", order="newest")
+    timings, _ = await measure_async(lambda: bot.send_slideshow(ctx, filtered), repeat)
+    results.add(size, "slideshow_open_filtered", timings)
+    ctx.last_view.stop()
+
+async def run_benchmarks(bot, args, results):
+    for size in args.sizes:
+        name = profile_name_for(size, args.seed)
+        print(f"\n⏱️  {size} tweets ({name})")
+        bot.refresh_profiles()
+        bot.active_profiles["guild:1"] = name
+        ctx = FakeContext()
+
+        bench_parse_dates(bot, size, args.seed, results, args.repeat)
+        data = bench_load(bot, name, size, results, args.repeat)
+        bench_filters(bot, ctx, size, results, args.repeat)
+        await bench_commands(bot, ctx, data, size, results, args.repeat)
+        bot.PROFILE_CACHE.discard(name)
+
+# Equivalence checks (--verify)
+
+EDGE_CASE_DATES = (
+    "Wed Oct 10 20:19:24 +0000 2018",
+    "Mon Feb 29 23:59:59 -0530 2016",
+    "Sun Jan 01 00:00:00 +1400 0001",
+    "Fri Dec 31 23:59:59 -2359 9999",
+    "Tue Feb 29 12:00:00 +0000 2100",  # Not a leap year
+    "Wed Oct 10 20:19:60 +0000 2018",
+    "Wed Oct 10 24:00:00 +0000 2018",
+    "Wed Oct 10 20:19:24 +2400 2018",
+    "Wed Oct 10 20:19:24 +0060 2018",
+    "Wed Oct 10 20:19:24 -0000 2018",
+    "Wed Oct 10 20:19:24 +0000 0000",
+    "Wed Oct 00 20:19:24 +0000 2018",
+    "Wed Oct  1 20:19:24 +0000 2018",
+    "Wed Oct 10 2:19:24 +0000 2018",
+    "wed oct 10 20:19:24 +0000 2018",
+    "Wednesday October 10 20:19:24 +0000 2018",
+    "Wed Oct 10 20:19:24 Z 2018",
+    "Wed Oct 10 20:19:24 +00:00 2018",
+    "Wed Oct 10 20:19:24 +0000 2018 ",
+    "Wed Oct 10 20:19:24 +0000 2018\n",
+    "Wed Oct 10 20:19:24 +0000 02018",
+    "Wed Oct 10 20:19:24 +0000 201\u0663",  # Arabic-Indic digit
+    "Xyz Oct 10 20:19:24 +0000 2018",
+    "",
+)
+MUTATION_CHARS = "0123456789 :+-ZWedOctMonFbJanx\t"
+
+def created_at_cases(seed, count=100_000):
+    """Dates to check: generated ones, edge cases, random mutations of valid dates and a
+    sweep over years, months, days and offsets."""
+    rng = random.Random(seed)
+    valid = [tweet["tweet_created_at"] for tweet in itertools.islice(generate_tweets(20_000, seed), 20_000)]
+    yield from valid
+    yield from EDGE_CASE_DATES
+    for _ in range(count):
+        chars = list(rng.choice(valid))
+        for _ in range(rng.randint(1, 3)):
+            index, operation = rng.randrange(len(chars)), rng.random()
+            if operation < 0.7:
+                chars[index] = rng.choice(MUTATION_CHARS)
+            elif operation < 0.85:
+                del chars[index]
+            else:
+                chars.insert(index, rng.choice(MUTATION_CHARS))
+        yield "".join(chars)
+    for year in range(1, 10000, 7):
+        for month in MONTHS:
+            yield (f"{rng.choice(WEEKDAYS)} {month} {rng.randint(0, 32):02d} {rng.randint(0, 24):02d}:"
+                   f"{rng.randint(0, 60):02d}:{rng.randint(0, 60):02d} {rng.choice('+-')}{rng.randint(0, 24):02d}"
+                   f"{rng.randint(0, 60):02d} {year:04d}")
+
+def verify_created_at(bot, seed):
+    """parse_created_at against strptime (bot.parse_tweet_date), including what they reject."""
+    checked = mismatches = 0
+    for text in created_at_cases(seed):
+        expected = bot.parse_tweet_date({"tweet_created_at": text})
+        if expected is not None:
+            expected = (int(expected.timestamp()), int(expected.utcoffset().total_seconds()))
+        actual = bot.parse_created_at(text)
+        checked += 1
+        if actual != expected:
+            mismatches += 1
+            if mismatches <= 10:
+                print(f"  ❌ {text!r}: parse_created_at {actual}, strptime {expected}")
+    print(f"  parse_created_at: {checked} dates, {mismatches} mismatches")
+    return not mismatches
+
+def verify_parallel_parse(bot, args):
+    """parse_tweets_parallel against the one-process parse, for every archive."""
+    pool = bot.PARSE_POOL or bot.start_parse_pool(2)
+    if pool is None:
+        print("  parse_tweets_parallel: skipped (needs fork)")
+        return True
+    ok = True
+    for size in args.sizes:
+        json_path = os.path.join(args.data_dir, "users", profile_name_for(size, args.seed), "liked_tweets.json")
+        serial = bot.parse_tweets_file(json_path, parallel=False)
+        parallel = bot.parse_tweets_parallel(json_path, pool)
+        fields = lambda tweets: [(t.tweet_id, t.user_handle, t.text, t.timestamp, t.utc_offset, t.media, t.media_types)
+                                 for t in tweets]
+        same = parallel is not None and fields(parallel[0]) == fields(serial[0]) and parallel[2] == serial[2]
+        print(f"  parse_tweets_parallel: {size} tweets {'match' if same else 'DIFFER'}")
+        ok = ok and same
+    return ok
+
+QUERY_HANDLES = (None, "user_1", "user_12", "USER_3", "art", "nobody")
+QUERY_DATES = ((None, None, None), ("2023", None, None), ("2022", "07", None), ("2024", "02", "29"), (None, "03", None),
+               (None, None, "15"), ("2023", None, "01"), ("2023", "7", None), ("0999", None, None))
+QUERY_SEARCHES = (None, "the", "cat OR art", '"of the"')
+QUERY_TIMES = ((), ("2023-01..2023-06",), ("since", "2024-01-01"), ("newest",), ("oldest",), ("2021..2022", "newest"))
+
+def verification_tweets(bot, json_path):
+    """An archive's tweets plus re-cased and re-offset copies of a few, so handles with
+    several spellings and dates near midnight in other time zones are covered too."""
+    tweets = bot.parse_tweets_file(json_path, parallel=False)[0]
+    variants = [bot.Tweet(t.tweet_id, t.user_handle.upper(), t.text, t.timestamp, offset, t.media, t.media_types)
+                for t, offset in zip(tweets[:600], itertools.cycle((19800, -18000, 50400)))]
+    return tweets + variants
+
+def stats_state(stats):
+    """Everything TweetStats has counted, dict order included."""
+    state = {}
+    for name, value in vars(stats).items():
+        if name.startswith("_"):  # Cached sorted views
+            continue
+        if isinstance(value, dict):
+            value = [(key, list(inner.items()) if isinstance(inner, dict) else inner) for key, inner in value.items()]
+        state[name] = value
+    return state
+
+def column_profiles(bot, json_path):
+    """The verification tweets as (indexed, indexed_appended, columns, columns_appended)
+    ProfileData. The appended ones are built from parts: two that interleave in time with
+    what's there and a last one newer than everything."""
+    tweets = verification_tweets(bot, json_path)
+    latest = max(tweet.timestamp for tweet in tweets)
+    tweets += [bot.Tweet(t.tweet_id, t.user_handle, t.text, latest + 86400 + t.timestamp % 86400, t.utc_offset, t.media, t.media_types)
+               for t in tweets[:300]]
+    parts = [tweets[:len(tweets) // 2], tweets[len(tweets) // 2:-700], tweets[-700:-300], tweets[-300:]]
+
+    def appended(name):
+        data = bot.ProfileData(name, json_path, list(parts[0]), {}, {})
+        for part in parts[1:]:
+            data.extend(part)
+        return data
+
+    columnar = bot.COLUMNAR
+    try:
+        bot.COLUMNAR = False
+        indexed, indexed_appended = bot.ProfileData("indexed", json_path, list(tweets), {}, {}), appended("indexed")
+        bot.COLUMNAR = True
+        columns, columns_appended = bot.ProfileData("columns", json_path, list(tweets), {}, {}), appended("columns")
+    finally:
+        bot.COLUMNAR = columnar
+    return indexed, indexed_appended, columns, columns_appended
+
+def column_queries(bot, seed, count=400):
+    """count filter_tweets argument tuples (after the media preference) sampled from every combination."""
+    queries = [(preference, handle, *date, search, time_args)
+               for preference in ("all", "jpg", "png", "mp4") for handle in QUERY_HANDLES
+               for date in QUERY_DATES for search in QUERY_SEARCHES for time_args in QUERY_TIMES]
+    sampled = []
+    for preference, username, year, month, day, search, time_args in random.Random(seed).sample(queries, count):
+        _, time_range, order = bot.parse_time_filters(list(time_args))
+        sampled.append((preference, username, year, month, day, search, time_range, order))
+    return sampled
+
+def column_mismatches(bot, profiles, queries):
+    """Queries where an appended index or the columns give other positions than the index built in one go."""
+    indexed, indexed_appended, columns, columns_appended = profiles
+    mismatches = []
+    for query in queries:
+        expected = list(bot._indexed_query(indexed, *query).positions())
+        if list(bot._indexed_query(indexed_appended, *query).positions()) != expected:
+            mismatches.append(("indexed, appended", query))
+        for label, data in (("columns", columns), ("columns, appended", columns_appended)):
+            if list(bot._columnar_query(data, *query).positions()) != expected:
+                mismatches.append((label, query))
+    for preference in ("all", "jpg", "mp4"):  # .search's media filter
+        ranked = indexed.text_index.ranked("the cat")
+        expected = [position for position in ranked if indexed.tweets[position].media_for(preference)]
+        for label, data in (("columns", columns), ("columns, appended", columns_appended)):
+            if list(data.columns.with_media(ranked, preference)) != expected:
+                mismatches.append((label, ("with_media", preference)))
+    return mismatches
+
+def game_draws(pool, user_counts, seed, count=200):
+    random.seed(seed)
+    return [pool.draw_weighted(0, user_counts) for _ in range(count)]
+
+def same_game_pool(pool, expected, expected_draws, user_counts, seed):
+    """Same images as the expected pool, and the same weighted draws (expected_draws, from game_draws)."""
+    return (pool.positions == expected.positions and pool.media_indices == expected.media_indices
+            and game_draws(pool, user_counts, seed) == expected_draws)
+
+def verify_columns(bot, args):
+    """Column filters, stats and .game pool against the Python index versions, built in one
+    go and by appending (column_profiles)."""
+    if bot.np is None:
+        print("  columns: skipped (needs numpy)")
+        return True
+    ok = True
+    for size in args.sizes:
+        json_path = os.path.join(args.data_dir, "users", profile_name_for(size, args.seed), "liked_tweets.json")
+        profiles = column_profiles(bot, json_path)
+        indexed = profiles[0]
+        mismatches = column_mismatches(bot, profiles, column_queries(bot, args.seed))
+        for label, query in mismatches[:10]:
+            print(f"  ❌ {label}: {query}")
+        print(f"  columnar filters: {size} tweets, 400 queries, {len(mismatches)} mismatches")
+
+        same_stats = all(stats_state(data.stats) == stats_state(indexed.stats) for data in profiles[2:])
+        user_counts = indexed.stats.user_counts
+        expected_draws = game_draws(indexed.game_pool, user_counts, args.seed)
+        same_pool = all(same_game_pool(data.game_pool, indexed.game_pool, expected_draws, user_counts, args.seed)
+                        for data in profiles[2:])
+        print(f"  columnar stats: {'match' if same_stats else 'DIFFER'}, game pool: {'match' if same_pool else 'DIFFER'}")
+        ok = ok and not mismatches and same_stats and same_pool
+    return ok
+
+def import_bot(data_dir, profile):
+    """Import bot.py against the generated archives (no prompt, no Discord connection)."""
+    os.environ["TWEETFETCH_USERS_PATH"] = os.path.join(data_dir, "users") + os.sep
+    os.environ["TWEETFETCH_PROFILE"] = profile
+    os.chdir(data_dir)  # config.json and state.json are written to the working directory
+    sys.path.insert(0, REPO_DIR)
+    import bot
+    return bot
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark TweetFetch on synthetic archives.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="Comma-separated archive sizes in tweets (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per benchmark, the median is reported")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "tweetfetch-bench"),
+                        help="Where archives are generated and kept between runs")
+    parser.add_argument("--output", default=os.path.join(REPO_DIR, "bench_output.txt"))
+    parser.add_argument("--compare", help="A previous --output file to compare against")
+    parser.add_argument("--generate-only", action="store_true", help="Only write the archives")
+    parser.add_argument("--verify", action="store_true",
+                        help="Check the fast paths against their reference versions instead of timing")
+    args = parser.parse_args(argv)
+    args.sizes = [int(size) for size in args.sizes.split(",") if size]
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    args.data_dir = os.path.abspath(args.data_dir)
+    args.output = os.path.abspath(args.output)
+    prepare_archives(args.data_dir, args.sizes, args.seed)
+    if args.generate_only:
+        return
+
+    bot = import_bot(args.data_dir, profile_name_for(args.sizes[0], args.seed))
+    if args.verify:
+        print("\n🔍 Verifying")
+        ok = verify_created_at(bot, args.seed) & verify_parallel_parse(bot, args) & verify_columns(bot, args)
+        print("✅ All match" if ok else "❌ Mismatches found")
+        sys.exit(0 if ok else 1)
+    results = Results(args.output, run_metadata(args))
+    asyncio.run(run_benchmarks(bot, args, results))
+    results.write()
+    if args.compare:
+        compare(args.compare, results.records)
+
+if __name__ == "__main__":
+    main()
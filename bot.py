@@ -7,10 +7,33 @@ import urllib.parse
 import collections
 import random
 import os
+import sys
+import bisect
+import codecs
+import re
+import array
+import hashlib
+import io
+import math
+import mmap
+import multiprocessing
+import itertools
+import time
+import contextlib
+import argparse
+import concurrent.futures
+import contextvars
+import threading
+import aiohttp
+from aiohttp import web
 from discord.ext import commands
+try:
+    import numpy as np
+except ImportError:  # Optional: without it filters, .stats and .game use the Python indexes
+    np = None
 
 # Folder discovery and validation
-USERS_BASE_PATH = "/Users/gaoe/Downloads/projects/LikedTweets/users/"
+USERS_BASE_PATH = os.environ.get("TWEETFETCH_USERS_PATH", "/Users/gaoe/Downloads/projects/LikedTweets/users/")
 
 def discover_user_folders():
     """Scan for available user folders containing liked_tweets.json"""
@@ -62,8 +85,23 @@ def prompt_user_selection(available_folders):
             print("\n❌ Invalid input. Exiting.")
             exit()
 
+def parse_startup_args():
+    """Command-line options; only parsed when bot.py is run directly, not imported."""
+    parser = argparse.ArgumentParser(description="TweetFetch Discord bot")
+    parser.add_argument("--profile", help="Profile to start with, instead of prompting (also TWEETFETCH_PROFILE)")
+    parser.add_argument("--no-prompt", action="store_true",
+                        help="Never prompt: without --profile, use the profile saved in config.json")
+    parser.add_argument("--loader", action="store_true",
+                        help="Don't connect to Discord, keep the profiles published in SHARED_STORE_DIR instead")
+    parser.add_argument("--shard-id", type=int, help="Run as this shard (0-based), for one process per shard")
+    parser.add_argument("--shard-count", type=int, help="Total number of shards, with --shard-id")
+    if __name__ == "__main__":
+        return parser.parse_args()
+    return parser.parse_args([])
+
 def validate_and_update_config():
-    """Always prompt user to select profile on startup"""
+    """Prompt user to select profile on startup, unless it's given by --profile or TWEETFETCH_PROFILE.
+    Without a terminal to prompt on (or with --no-prompt), the profile saved in config.json is used."""
     config_path = "config.json"
     
     # Load existing config or create new one
@@ -81,8 +119,17 @@ def validate_and_update_config():
         print("❌ No user folders found! Please check your folder structure.")
         exit()
     
-    # Always prompt for selection
-    selected_folder = prompt_user_selection(available_folders)
+    startup_args = STARTUP_ARGS
+    selected_folder = startup_args.profile or os.environ.get("TWEETFETCH_PROFILE")
+    if selected_folder and selected_folder not in available_folders:
+        print(f"❌ Profile '{selected_folder}' not found. Available: {', '.join(sorted(available_folders))}")
+        exit()
+    if not selected_folder and (startup_args.no_prompt or startup_args.loader or not sys.stdin.isatty()):
+        saved = config.get("SELECTED_PROFILE")
+        selected_folder = saved if saved in available_folders else sorted(available_folders)[0]
+        print(f"✅ Using profile: {selected_folder}")
+    if not selected_folder:
+        selected_folder = prompt_user_selection(available_folders)
     if not selected_folder:
         exit()
     
@@ -102,49 +149,377 @@ def validate_and_update_config():
     return config
 
 # Load and validate config
+STARTUP_ARGS = parse_startup_args()
 config = validate_and_update_config()
 
 TOKEN = config["TOKEN"]
 # Support both string (legacy) and dict (profiles) for JSON_FILE
 DEFAULT_JSON_FILE = config["JSON_FILE"]
 
-# Determine active profile from config or use default
+# Determine the default profile from config (used by every guild until it picks its own)
 if "SELECTED_PROFILE" in config and isinstance(DEFAULT_JSON_FILE, dict):
-    ACTIVE_PROFILE = config["SELECTED_PROFILE"]
+    DEFAULT_PROFILE = config["SELECTED_PROFILE"]
 else:
-    ACTIVE_PROFILE = "default"
+    DEFAULT_PROFILE = "default"
 
 # Build PROFILES dict
 PROFILES = {"default": DEFAULT_JSON_FILE} if isinstance(DEFAULT_JSON_FILE, str) else DEFAULT_JSON_FILE
-CURRENT_JSON_PATH = PROFILES.get(ACTIVE_PROFILE, list(PROFILES.values())[0] if PROFILES else None)
+if DEFAULT_PROFILE not in PROFILES and PROFILES:
+    DEFAULT_PROFILE = next(iter(PROFILES))
+DEFAULT_JSON_PATH = PROFILES.get(DEFAULT_PROFILE)
 
-if not CURRENT_JSON_PATH or not os.path.exists(CURRENT_JSON_PATH):
-    print(f"❌ Error: Selected profile '{ACTIVE_PROFILE}' path not found: {CURRENT_JSON_PATH}")
+if not DEFAULT_JSON_PATH or not os.path.exists(DEFAULT_JSON_PATH):
+    print(f"❌ Error: Selected profile '{DEFAULT_PROFILE}' path not found: {DEFAULT_JSON_PATH}")
     exit()
 
-print(f"🚀 Starting bot with profile: {ACTIVE_PROFILE}")
-print(f"📂 Using JSON file: {CURRENT_JSON_PATH}\n")
+print(f"🚀 Starting bot with profile: {DEFAULT_PROFILE}")
+print(f"📂 Using JSON file: {DEFAULT_JSON_PATH}\n")
+
+# Profile cache budget (see ProfileCache); per-guild active profiles are kept in STATE below
+PROFILE_CACHE_MB = config.get("PROFILE_CACHE_MB", 1024)
+
+
+# Telemetry: latency histograms and counters, shown by .perf and exported for Prometheus
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+class Histogram:
+    """Cumulative-bucket latency histogram, Prometheus style."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (None if empty)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        for bound, seen in zip(self.buckets + (math.inf,), itertools.accumulate(self.counts)):
+            if seen >= rank:
+                return bound
+        return math.inf
+
+class Metrics:
+    """Named histograms and counters, each keyed by a tuple of (label, value) pairs.
+
+    Values computed elsewhere (queue depth, cache counters) are registered as callables
+    returning a number or a {labels: number} dict, and read when rendering.
+    """
+
+    def __init__(self):
+        self.help = {}  # name -> (type, help text)
+        self.histograms = collections.defaultdict(dict)  # name -> labels -> Histogram
+        self.counters = collections.defaultdict(lambda: collections.defaultdict(float))  # name -> labels -> value
+        self.collectors = {}  # name -> callable
+        self.lock = threading.Lock()  # Recorded from worker threads as well as the event loop
+
+    def describe(self, name, kind, text):
+        self.help[name] = (kind, text)
+
+    def observe(self, name, seconds, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            histogram = self.histograms[name].get(key)
+            if histogram is None:
+                histogram = self.histograms[name][key] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name, amount=1, **labels):
+        with self.lock:
+            self.counters[name][tuple(sorted(labels.items()))] += amount
+
+    def collect(self, name, kind, text, fn):
+        self.describe(name, kind, text)
+        self.collectors[name] = fn
+
+    @contextlib.contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def histogram(self, name, **labels):
+        return self.histograms[name].get(tuple(sorted(labels.items())))
+
+    @staticmethod
+    def _labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ""
+        escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+        return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+    @staticmethod
+    def _number(value):
+        return int(value) if float(value).is_integer() else value
+
+    def render_prometheus(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        def header(name, default_kind):
+            kind, text = self.help.get(name, (default_kind, name))
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self.lock:
+            for name, series in self.histograms.items():
+                header(name, "histogram")
+                for labels, histogram in series.items():
+                    for bound, seen in zip(histogram.buckets + ("+Inf",), itertools.accumulate(histogram.counts)):
+                        lines.append(f"{name}_bucket{self._labels(labels, [('le', bound)])} {seen}")
+                    lines.append(f"{name}_sum{self._labels(labels)} {histogram.sum}")
+                    lines.append(f"{name}_count{self._labels(labels)} {histogram.count}")
+            for name, series in self.counters.items():
+                header(name, "counter")
+                for labels, value in series.items():
+                    lines.append(f"{name}{self._labels(labels)} {self._number(value)}")
+        for name, fn in self.collectors.items():
+            try:
+                value = fn()
+            except Exception as e:
+                print(f"Error collecting metric {name}: {e}")
+                continue
+            header(name, "gauge")
+            series = value if isinstance(value, dict) else {(): value}
+            for labels, number in series.items():
+                lines.append(f"{name}{self._labels(labels)} {self._number(number)}")
+        return "\n".join(lines) + "\n"
+
+METRICS = Metrics()
+METRICS.describe("tweetfetch_command_seconds", "histogram", "Command handling time (until the command's own replies are sent)")
+METRICS.describe("tweetfetch_profile_load_seconds", "histogram", "Profile loads (kind=full) and incremental reloads (kind=refresh)")
+METRICS.describe("tweetfetch_profile_build_seconds", "histogram", "Building a profile's derived structures after its tweets are read")
+METRICS.describe("tweetfetch_filter_seconds", "histogram", "filter_tweets and .search lookups")
+METRICS.describe("tweetfetch_send_seconds", "histogram", "Outbound REST sends, including rate limit waits")
+METRICS.describe("tweetfetch_tweets_loaded_total", "counter", "Tweets read from profile files")
+METRICS.describe("tweetfetch_bytes_loaded_total", "counter", "Bytes of profile files read")
+METRICS.describe("tweetfetch_profile_cache_requests_total", "counter", "Profile lookups by result (hit/miss)")
+METRICS.describe("tweetfetch_messages_sent_total", "counter", "Messages posted by the outbound sender")
+METRICS.describe("tweetfetch_messages_rejected_total", "counter", "Messages Discord refused (4xx other than 429) and that were skipped")
+METRICS.describe("tweetfetch_rate_limited_total", "counter", "429 responses received by the outbound sender")
+METRICS.describe("tweetfetch_event_loop_lag_seconds", "histogram", "How late the event loop ran a timer (time it was blocked)")
+METRICS.describe("tweetfetch_worker_seconds", "histogram", "Jobs run in the worker pool")
+
+
+# Worker pool: CPU-heavy work (loading, filtering, search, stats) runs here instead of on
+# the event loop. Python threads share the GIL, but the loop still gets scheduled between
+# bytecodes, so heartbeats, buttons and other users' commands keep being served.
+WORKER_THREADS = config.get("WORKER_THREADS", 2)
+WORKER_TIMEOUT = config.get("WORKER_TIMEOUT", 60)  # Seconds before a command's work is abandoned
+WORKER_POOL = concurrent.futures.ThreadPoolExecutor(max_workers=WORKER_THREADS, thread_name_prefix="tweetfetch-worker")
+
+class WorkCancelled(Exception):
+    """Raised inside a worker job once whoever was waiting for it has given up."""
+
+_cancel_event = contextvars.ContextVar("cancel_event", default=None)
+running_work = collections.defaultdict(dict)  # user id -> {task: label} of commands waiting on the pool
+
+def check_cancelled():
+    """Call from long loops: stops a worker job whose command was cancelled. No-op elsewhere."""
+    event = _cancel_event.get()
+    if event is not None and event.is_set():
+        raise WorkCancelled()
+
+async def run_in_worker(fn, *args, owner=None, label=None, timeout=None):
+    """Run fn(*args) in the worker pool and return its result.
+
+    If the awaiting task is cancelled (e.g. by .stop) or timeout runs out, the job is told
+    to stop at its next check_cancelled(). owner is the user id .stop cancels it for.
+    """
+    cancel_event = threading.Event()
+    context = contextvars.copy_context()
+    context.run(_cancel_event.set, cancel_event)
+    label = label or getattr(fn, "__name__", "job")
+
+    def job():
+        with METRICS.timer("tweetfetch_worker_seconds", job=label):
+            return context.run(fn, *args)
+
+    task = asyncio.current_task()
+    if owner is not None:
+        running_work[owner][task] = label
+    future = asyncio.get_running_loop().run_in_executor(WORKER_POOL, job)
+    try:
+        return await asyncio.wait_for(future, timeout)
+    except (asyncio.CancelledError, asyncio.TimeoutError):
+        cancel_event.set()
+        raise
+    finally:
+        if owner is not None:
+            running_work[owner].pop(task, None)
+            if not running_work[owner]:
+                del running_work[owner]
+
+def cancel_user_work(user_id):
+    """Cancel the commands a user has waiting on the worker pool. Returns how many."""
+    tasks = list(running_work.get(user_id, {}))
+    for task in tasks:
+        task.cancel()
+    return len(tasks)
 
-# Global Cache
-TWEET_CACHE = []
-CACHE_TIMESTAMP = None
 
 
 # Set up bot
 intents = discord.Intents.default()
 intents.message_content = True  # Enables message content intent
-bot = commands.Bot(command_prefix=".", intents=intents)
+class TweetFetchBot(commands.Bot):
+    async def close(self):
+        await shutdown()  # Defined next to on_ready, with the things it stops
+        await super().close()
+
+bot = TweetFetchBot(command_prefix=".", intents=intents, shard_id=STARTUP_ARGS.shard_id, shard_count=STARTUP_ARGS.shard_count)
 bot.remove_command("help") # Remove default help
 
-abort_flag = {}
 
 MONTH_MAP = {m.lower(): str(i).zfill(2) for i, m in enumerate(calendar.month_name) if m}
 MONTH_ABBR_MAP = {m.lower(): str(i).zfill(2) for i, m in enumerate(calendar.month_abbr) if m}
 
 
-USER_PREFS_FILE = "user_prefs.json"
+STATE_FILE = config.get("STATE_FILE", "state.json")
+STATE_FLUSH_INTERVAL = config.get("STATE_FLUSH_INTERVAL", 5)  # Seconds; changes made in between are written together
+STATE_LOG_COMPACT = 1000  # Log lines before the log is folded into the state file
+if STARTUP_ARGS.shard_id is not None:  # Each shard process keeps its own; a guild always lands on the same shard
+    STATE_FILE = f"{os.path.splitext(STATE_FILE)[0]}.shard{STARTUP_ARGS.shard_id}.json"
+USER_PREFS_FILE = "user_prefs.json"  # Where preferences were kept before STATE, imported once
+
+METRICS.describe("tweetfetch_state_writes_total", "counter", "State store flushes by kind (log appends, or compact rewrites of the state file)")
+
+class StateStore:
+    """Small bot state that has to survive restarts (media preferences, per-guild profiles,
+    .game rotations), as namespaces of JSON values.
+
+    put() only changes memory; the changes are written behind, at most once per flush
+    interval. A flush appends one log line per changed key to <file>.log, or once the log
+    is long, rewrites the state file (temp file + os.replace) and empties the log. Log
+    lines carry the state file's generation, so after a crash between the two only the
+    lines written since that file are replayed. Loading replays the log over the file;
+    a crash loses at most the last interval, and a line cut off mid-write is skipped.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.log_path = f"{path}.log"
+        self.data = {}  # namespace -> {key: value}
+        self.generation = 0
+        self.pending = {}  # (namespace, key) -> value (None removes it), not written yet
+        self.log_lines = 0
+        self.lock = threading.Lock()  # put() runs on the event loop, flush() in a worker thread
+        self.flushing = threading.Lock()  # One flush at a time, e.g. the shutdown one waits for a running one
+
+    def load(self):
+        try:
+            with open(self.path, "r") as f:
+                saved = json.load(f)
+            self.data, self.generation = saved["data"], saved["generation"]
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error loading {self.path}: {e}")
+
+        damaged = False
+        try:
+            with open(self.log_path, "rb") as f:
+                for line in f:
+                    try:
+                        generation, namespace, key, value = json.loads(line)
+                    except ValueError:
+                        damaged = True  # Cut off by a crash
+                        continue
+                    damaged = damaged or not line.endswith(b"\n")
+                    if generation == self.generation:
+                        self._apply(namespace, key, value)
+                        self.log_lines += 1
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Error reading {self.log_path}: {e}")
+        if damaged:
+            # Start a clean log, or the next append would run on from the damaged line
+            self.flush(compact=True)
+
+    def namespace(self, name):
+        """The live dict of a namespace. Read it freely, but change it through put()."""
+        return self.data.setdefault(name, {})
+
+    def _apply(self, namespace, key, value):
+        values = self.data.setdefault(namespace, {})
+        if value is None:
+            values.pop(key, None)
+        else:
+            values[key] = value
+
+    def put(self, namespace, key, value):
+        """Set a value (None removes it). It's written at the next flush."""
+        with self.lock:
+            self._apply(namespace, key, value)
+            self.pending[(namespace, key)] = value
+
+    def flush(self, compact=False):
+        """Write what changed since the last flush. Blocking; returns whether anything was written."""
+        with self.flushing:
+            return self._flush(compact)
+
+    def _flush(self, compact):
+        with self.lock:
+            if not self.pending and not compact:
+                return False
+            pending, self.pending = self.pending, {}
+            compact = compact or self.log_lines + len(pending) > STATE_LOG_COMPACT
+            if compact:
+                payload = json.dumps({"generation": self.generation + 1, "data": self.data})
+            else:
+                payload = "".join(json.dumps([self.generation, namespace, key, value]) + "\n"
+                                  for (namespace, key), value in pending.items())
+        try:
+            if compact:
+                self._replace(payload)
+                self.generation += 1
+                self.log_lines = 0
+                with open(self.log_path, "w"):
+                    pass  # Lines of older generations are ignored anyway; this just reclaims the space
+            else:
+                with open(self.log_path, "a") as f:
+                    f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+                self.log_lines += len(pending)
+        except OSError as e:
+            print(f"Error saving {self.path}: {e}")
+            with self.lock:  # Try again next time, unless they've changed since
+                for item, value in pending.items():
+                    self.pending.setdefault(item, value)
+            return False
+        METRICS.inc("tweetfetch_state_writes_total", kind="compact" if compact else "append")
+        return True
+
+    def _replace(self, payload):
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+
+    async def flush_periodically(self, interval):
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                if self.pending:
+                    await run_in_worker(self.flush, label="state")
+        finally:
+            self.flush()  # Shutting down: write what's left
 
 def load_user_prefs():
+    """Preferences from the old user_prefs.json, if there is one."""
     if os.path.exists(USER_PREFS_FILE):
         try:
             with open(USER_PREFS_FILE, "r") as f:
@@ -153,53 +528,2236 @@ def load_user_prefs():
             print(f"Error loading user prefs: {e}")
     return {}
 
-def save_user_prefs():
-    try:
-        with open(USER_PREFS_FILE, "w") as f:
-            json.dump(user_media_preferences, f)
-    except Exception as e:
-        print(f"Error saving user prefs: {e}")
+STATE = StateStore(STATE_FILE)
+STATE.load()
+if "user_prefs" not in STATE.data:
+    for user_id, media_type in load_user_prefs().items():
+        STATE.put("user_prefs", user_id, media_type)
+user_media_preferences = STATE.namespace("user_prefs")  # User id (string) -> media type (jpg, mp4, etc)
+active_profiles = STATE.namespace("profiles")  # "guild:<id>" / "user:<id>" (DMs) -> profile name
+game_rotations = STATE.namespace("game_rotations")  # "<profile>:<channel id>" -> GameRotation.state()
+state_task = None
 
-user_media_preferences = load_user_prefs()  # Stores user preferences (jpg, mp4, etc)
+CREATED_AT_FORMAT = "%a %b %d %H:%M:%S %z %Y"  # e.g. "Wed Oct 10 20:19:24 +0000 2018"
 
 def parse_tweet_date(tweet):
-    """Helper to parse date from tweet and add structured fields."""
+    """Helper to parse the creation date of a raw tweet. Returns None if it is invalid."""
     try:
         tweet_time = tweet.get("tweet_created_at", "")
-        tweet_dt = datetime.datetime.strptime(tweet_time, "%a %b %d %H:%M:%S %z %Y")
-        tweet["parsed_year"] = str(tweet_dt.year)
-        tweet["parsed_month"] = str(tweet_dt.month).zfill(2)
-        tweet["parsed_day"] = str(tweet_dt.day).zfill(2)
-        tweet["parsed_dt"] = tweet_dt # Store datetime object for sorting/formatting if needed
-        return True
+        return datetime.datetime.strptime(tweet_time, CREATED_AT_FORMAT)
     except ValueError:
-        return False
+        return None
 
-def load_tweets(force_reload=False):
-    """Load tweets from JSON file with caching."""
-    global TWEET_CACHE, CACHE_TIMESTAMP
-    
-    if not force_reload and TWEET_CACHE:
-        return TWEET_CACHE
+# Names as strptime matches them in the current locale
+_WEEKDAY_ABBRS = frozenset(calendar.day_abbr)
+_MONTH_NUMBERS = {abbr: number for number, abbr in enumerate(calendar.month_abbr) if abbr}
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+_created_days = {}  # "Oct 10 2018" -> days since the epoch, None if invalid
+_created_offsets = {}  # "+0000" -> UTC offset in seconds, None if invalid
+
+def _days_since_epoch(date_key):
+    month = _MONTH_NUMBERS.get(date_key[:3])
+    day, year = date_key[4:6], date_key[7:]
+    if not (month and date_key[3] == " " and date_key[6] == " " and day.isdigit() and year.isdigit()):
+        return None
+    day, year = int(day), int(year)
+    if not year or not 1 <= day <= calendar.monthrange(year, month)[1]:
+        return None
+    return datetime.date(year, month, day).toordinal() - _EPOCH_ORDINAL
+
+def _offset_seconds(offset_key):
+    if offset_key[0] not in "+-" or not offset_key[1:].isdigit():
+        return None
+    hours, minutes = int(offset_key[1:3]), int(offset_key[3:])
+    if hours >= 24 or minutes >= 60:
+        return None
+    return -(hours * 3600 + minutes * 60) if offset_key[0] == "-" else hours * 3600 + minutes * 60
+
+def parse_created_at(text):
+    """(epoch seconds, UTC offset in seconds) of a created_at string, or None if it's invalid.
+
+    Agrees with strptime and CREATED_AT_FORMAT (bench.py --verify checks this), only much
+    faster: strings in Twitter's exact layout are read at fixed positions, with the date
+    and offset parts looked up in small caches, and anything else (other spacing, full or
+    lowercase names, out of range fields...) is left to strptime itself.
+    """
+    if (type(text) is str and len(text) == 30 and text.isascii() and text[3] == " " and text[13] == ":"
+            and text[16] == ":" and text[19] == " " and text[25] == " " and text[:3] in _WEEKDAY_ABBRS):
+        date_key = text[4:11] + text[26:]
+        if date_key in _created_days:
+            days = _created_days[date_key]
+        else:
+            days = _created_days[date_key] = _days_since_epoch(date_key)
+        offset_key = text[20:25]
+        if offset_key in _created_offsets:
+            utc_offset = _created_offsets[offset_key]
+        else:
+            utc_offset = _created_offsets[offset_key] = _offset_seconds(offset_key)
+        clock = text[11:13] + text[14:16] + text[17:19]
+        if days is not None and utc_offset is not None and clock.isdigit():
+            clock = int(clock)
+            hour, minute, second = clock // 10000, clock // 100 % 100, clock % 100
+            if hour < 24 and minute < 60 and second < 60:
+                return days * 86400 + hour * 3600 + minute * 60 + second - utc_offset, utc_offset
 
-    print(f"Loading tweets from {CURRENT_JSON_PATH}...")
     try:
-        with open(CURRENT_JSON_PATH, "r", encoding="utf-8") as f:
-            tweets = json.load(f)
-            
-        # Pre-process tweets
-        valid_tweets = []
+        created = datetime.datetime.strptime(text, CREATED_AT_FORMAT)
+    except ValueError:
+        return None
+    return int(created.timestamp()), int(created.utcoffset().total_seconds())
+
+MEDIA_TYPES = ("jpg", "png", "mp4")
+
+def media_type_of(url):
+    """Return the media type (jpg/png/mp4) a URL counts as for user preferences, or None."""
+    lowered = url.lower()
+    if not lowered.startswith("https"):
+        return None
+    path = lowered.split("?")[0]
+    for media_type in MEDIA_TYPES:
+        if path.endswith(media_type):
+            return media_type
+    return None
+
+_TIMEZONES = {}
+
+def timezone_for(utc_offset):
+    """Shared tzinfo for an offset in seconds (tweets almost always use +0000)."""
+    tz = _TIMEZONES.get(utc_offset)
+    if tz is None:
+        tz = _TIMEZONES[utc_offset] = datetime.timezone(datetime.timedelta(seconds=utc_offset))
+    return tz
+
+class Tweet:
+    """Compact in-memory form of a liked tweet, normalised once at load time.
+
+    The handle is interned, the creation time is a single epoch integer (plus the UTC
+    offset it was posted with) and media URLs are already cleaned, with media_types
+    holding the matching jpg/png/mp4 tag (or None) for each URL.
+    """
+    __slots__ = ("tweet_id", "user_handle", "text", "timestamp", "utc_offset", "media", "media_types")
+
+    def __init__(self, tweet_id, user_handle, text, timestamp, utc_offset, media, media_types):
+        self.tweet_id = tweet_id
+        self.user_handle = user_handle
+        self.text = text
+        self.timestamp = timestamp
+        self.utc_offset = utc_offset
+        self.media = media
+        self.media_types = media_types
+
+    @property
+    def created_dt(self):
+        return datetime.datetime.fromtimestamp(self.timestamp, timezone_for(self.utc_offset))
+
+    def media_for(self, preference):
+        """Media URLs matching a user media preference ("all", "jpg", "png" or "mp4")."""
+        if preference == "all":
+            return self.media
+        return tuple(url for url, media_type in zip(self.media, self.media_types) if media_type == preference)
+
+def make_tweet(raw_tweet):
+    """Convert a raw liked_tweets.json entry into a Tweet, or None if its date is invalid."""
+    created = parse_created_at(raw_tweet.get("tweet_created_at", ""))
+    if created is None:
+        return None
+
+    media_urls = raw_tweet.get("tweet_media_urls") or []
+    return Tweet(
+        str(raw_tweet.get("tweet_id") or ""),  # Some exports store ids as numbers; snapshots pack strings
+        sys.intern(str(raw_tweet.get("user_handle") or "")),
+        raw_tweet.get("tweet_content") or "",
+        created[0],
+        created[1],
+        tuple(clean_media_url(url) for url in media_urls),
+        tuple(media_type_of(url) for url in media_urls),
+    )
+
+def deep_sizeof(obj, seen=None):
+    """Approximate the bytes held by obj and everything it references (shared objects count once)."""
+    if seen is None:
+        seen = {}  # id -> True; the `set` builtin is shadowed by the .set command below
+    if id(obj) in seen:
+        return 0
+    seen[id(obj)] = True
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, "__slots__"):
+        size += sum(deep_sizeof(getattr(obj, attr), seen) for attr in obj.__slots__)
+    return size
+
+MEMORY_REPORT_SAMPLE = 1000
+
+def build_memory_report(raw_sample, tweets):
+    """Compare bytes per tweet as raw JSON dicts against the compact Tweet records."""
+    if not raw_sample or not tweets:
+        return {}
+
+    compact_sample = tweets[:len(raw_sample)]
+    raw_per_tweet = deep_sizeof(raw_sample) / len(raw_sample)
+    compact_per_tweet = deep_sizeof(compact_sample) / len(compact_sample)
+    return {
+        "tweets": len(tweets),
+        "raw_bytes_per_tweet": round(raw_per_tweet),
+        "compact_bytes_per_tweet": round(compact_per_tweet),
+        "estimated_cache_mb": round(compact_per_tweet * len(tweets) / 1024 / 1024, 1),
+    }
+
+def build_tweet_index(tweets):
+    """Build the lookup index used by filter_tweets.
+
+    Every bucket maps a key to an ascending list of positions in the tweet cache:
+    "handle" (lowercased user_handle), "year" (YYYY), "month" (YYYY-MM),
+    "day" (YYYY-MM-DD) and "media" ("all" for any media, plus jpg/png/mp4).
+    """
+    index = {bucket: collections.defaultdict(list) for bucket in ("handle", "year", "month", "day", "media")}
+    index_tweets(index, tweets)
+    return index
+
+def index_tweets(index, tweets, start=0):
+    """Add tweets to an index, numbering them from start (their position in the cache).
+
+    Positions only ever grow, so appending keeps every list sorted.
+    """
+    for position, tweet in enumerate(tweets, start):
+        tweet_dt = tweet.created_dt
+        year, month, day = str(tweet_dt.year), str(tweet_dt.month).zfill(2), str(tweet_dt.day).zfill(2)
+        index["handle"][tweet.user_handle.lower()].append(position)
+        index["year"][year].append(position)
+        index["month"][f"{year}-{month}"].append(position)
+        index["day"][f"{year}-{month}-{day}"].append(position)
+
+        if tweet.media:
+            index["media"]["all"].append(position)
+        for media_type in frozenset(tweet.media_types):
+            if media_type:
+                index["media"][media_type].append(position)
+
+class TimeSlice:
+    """Read-only view of positions[lo:hi], optionally newest first, that doesn't copy anything."""
+
+    __slots__ = ("positions", "lo", "hi", "newest_first")
+
+    def __init__(self, positions, lo, hi, newest_first=False):
+        self.positions = positions
+        self.lo = lo
+        self.hi = hi
+        self.newest_first = newest_first
+
+    def __len__(self):
+        return self.hi - self.lo
+
+    def __getitem__(self, i):
+        return self.positions[self.hi - 1 - i] if self.newest_first else self.positions[self.lo + i]
+
+class TimeIndex:
+    """Cache positions sorted by tweet time, for date ranges and newest/oldest ordering.
+
+    Times are the tweet's local wall-clock time as seconds (timestamp + utc_offset), the
+    same clock the year/month/day buckets use. Ties keep cache order.
+    """
+
+    def __init__(self, tweets):
+        self.times = array.array("q")  # Local time of each position
+        self.positions = array.array("i")  # Positions sorted by time
+        self.sorted_times = array.array("q")  # Their times, for bisecting
+        self.add(tweets)
+
+    def add(self, new_tweets, start=0):
+        self.times.extend(tweet.timestamp + tweet.utc_offset for tweet in new_tweets)
+        new_positions = sorted(range(start, len(self.times)), key=self.times.__getitem__)
+        if not new_positions:
+            return
+        # Slots before the earliest new time stay as they are, only the rest is merged (two
+        # sorted runs, so a linear merge). Ties put the new positions last, after older ones.
+        split = bisect.bisect_right(self.sorted_times, self.times[new_positions[0]])
+        merged = sorted(itertools.chain(self.positions[split:], new_positions), key=self.times.__getitem__)
+        merged_times = (self.times[position] for position in merged)
+        if split == len(self.positions):
+            # All newer: appended in place, which open results (views of slots before their end) never see
+            self.positions.extend(merged)
+            self.sorted_times.extend(merged_times)
+        else:
+            # New arrays rather than in-place updates, so results that are still open keep a consistent view
+            positions, sorted_times = self.positions[:split], self.sorted_times[:split]
+            positions.extend(merged)
+            sorted_times.extend(merged_times)
+            self.positions, self.sorted_times = positions, sorted_times
+
+    def span(self, time_range=None):
+        """(lo, hi) slots of the positions with start <= time < end; None ends are open."""
+        start, end = time_range or (None, None)
+        lo = 0 if start is None else bisect.bisect_left(self.sorted_times, start)
+        hi = len(self.sorted_times) if end is None else bisect.bisect_left(self.sorted_times, end)
+        return lo, max(lo, hi)
+
+    def in_range(self, position, time_range):
+        start, end = time_range or (None, None)
+        time = self.times[position]
+        return (start is None or time >= start) and (end is None or time < end)
+
+    def ordered(self, time_range=None, newest_first=False):
+        return TimeSlice(self.positions, *self.span(time_range), newest_first)
+
+    def positions_between(self, time_range):
+        """Positions in the range, in cache order, for use as a filter_tweets candidate list."""
+        lo, hi = self.span(time_range)
+        return sorted(self.positions[lo:hi])
+
+IMAGE_SUFFIXES = ('.jpg', '.png', '.jpeg')  # What .stats and .game count as an image
+
+class ColumnArrays:
+    """One version of every TweetColumns column. Never changed once made: TweetColumns.add()
+    makes the next version and swaps it in whole, so a reader holding one sees columns that
+    all have the same length."""
+
+    __slots__ = ("local_time", "year", "month", "day", "handle_code", "text_length",
+                 "media_mask", "media_offsets", "url_kind", "url_position", "time_order")
+
+    def __init__(self, **columns):
+        for name in self.__slots__:
+            setattr(self, name, columns[name])
+
+    def replace(self, **changes):
+        return ColumnArrays(**{name: changes.get(name, getattr(self, name)) for name in self.__slots__})
+
+class TweetColumns:
+    """The tweets of a profile as NumPy columns, so filters, .stats and the .game pool are
+    array operations instead of loops over Tweet objects.
+
+    Per tweet: local_time (timestamp + utc_offset, the clock the date filters use) and its
+    year/month/day, handle_code (into handles, numbered in order of first appearance),
+    text_length and media_mask (MEDIA_BITS of the media it has). Tweet i's media are
+    media_offsets[i]:media_offsets[i + 1] of a flat table holding each URL's url_kind
+    (IMAGE, VIDEO or 0) and url_position. time_order is every position sorted by
+    local_time, ties in cache order.
+
+    The columns live in arrays (a ColumnArrays), readable as attributes of this object
+    too. Code that runs while a refresh may be appending (filters, .game weights) takes
+    arrays once and reads every column from it. Each column is a view of the start of a
+    bigger buffer, so appends fill spare room (doubling it when it runs out) instead of
+    copying every column each time.
+    """
+
+    MEDIA_BITS = {"all": 1, "jpg": 2, "png": 4, "mp4": 8}
+    IMAGE, VIDEO = 1, 2
+    # Columns a SharedStore file holds; handle_code and media_offsets are the snapshot's own
+    STORED = ("local_time", "year", "month", "day", "text_length", "media_mask", "url_kind", "url_position", "time_order")
+
+    def __init__(self, tweets):
+        self.handles = []  # code -> handle as stored
+        self.codes = {}  # handle as stored -> code
+        self.lower_codes = collections.defaultdict(list)  # lowercased handle -> codes of its spellings
+        self.arrays = ColumnArrays(
+            local_time=np.zeros(0, np.int64), year=np.zeros(0, np.int16), month=np.zeros(0, np.int8),
+            day=np.zeros(0, np.int8), handle_code=np.zeros(0, np.int32), text_length=np.zeros(0, np.int32),
+            media_mask=np.zeros(0, np.uint8), media_offsets=np.zeros(1, np.int64), url_kind=np.zeros(0, np.uint8),
+            url_position=np.zeros(0, np.int32), time_order=np.zeros(0, np.int32))
+        self.buffers = {}  # column name -> array the column is the start of
+        self.add(tweets)
+
+    @classmethod
+    def mapped(cls, handles, arrays):
+        """Columns over arrays another process built (see SharedStore), used as they are."""
+        columns = cls(())
+        for handle in handles:
+            columns.handle_code_of(handle)
+        columns.arrays = ColumnArrays(**arrays)
+        return columns
+
+    def __getattr__(self, name):
+        if name in ColumnArrays.__slots__:
+            return getattr(self.arrays, name)
+        raise AttributeError(name)
+
+    def __len__(self):
+        return len(self.arrays.local_time)
+
+    def handle_code_of(self, handle):
+        code = self.codes.get(handle)
+        if code is None:
+            code = self.codes[handle] = len(self.handles)
+            self.handles.append(handle)
+            self.lower_codes[handle.lower()].append(code)
+        return code
+
+    def _appended(self, name, values):
+        """Column name with values after it, written past the end of its buffer (moved to a
+        bigger one if needed)."""
+        column = getattr(self.arrays, name)
+        end = len(column) + len(values)
+        buffer = self.buffers.get(name)
+        if buffer is None or len(buffer) < end:
+            buffer = np.empty(max(end, 2 * len(column)), column.dtype)
+            buffer[:len(column)] = column
+            self.buffers[name] = buffer
+        buffer[len(column):end] = values
+        return buffer[:end]
+
+    def add(self, new_tweets):
+        """Append tweets. Values are only written past the end of each column and the new
+        columns are swapped in together, so nothing holding the old arrays sees a change."""
+        start = len(self)
+        times, codes, text_lengths = array.array("q"), array.array("i"), array.array("i")
+        masks, media_counts, kinds = array.array("B"), array.array("q"), array.array("B")
+        for tweet in new_tweets:
+            times.append(tweet.timestamp + tweet.utc_offset)
+            codes.append(self.handle_code_of(tweet.user_handle))
+            text_lengths.append(len(tweet.text))
+            bits = 1 if tweet.media else 0
+            for media_type in tweet.media_types:
+                if media_type:
+                    bits |= self.MEDIA_BITS[media_type]
+            masks.append(bits)
+            media_counts.append(len(tweet.media))
+            for url in tweet.media:
+                kinds.append(self.IMAGE if url.endswith(IMAGE_SUFFIXES) else self.VIDEO if url.endswith('.mp4') else 0)
+
+        new_times = np.frombuffer(times, np.int64)
+        days = (new_times // 86400).astype("datetime64[D]")
+        months = days.astype("datetime64[M]")
+        years = months.astype("datetime64[Y]")
+        new_counts = np.frombuffer(media_counts, np.int64)
+
+        end = start + len(new_times)
+        local_time = self._appended("local_time", new_times)
+        self.arrays = self.arrays.replace(
+            local_time=local_time,
+            year=self._appended("year", years.astype(np.int64) + 1970),
+            month=self._appended("month", months.astype(np.int64) % 12 + 1),
+            day=self._appended("day", (days - months).astype(np.int64) + 1),
+            handle_code=self._appended("handle_code", np.frombuffer(codes, np.int32)),
+            text_length=self._appended("text_length", np.frombuffer(text_lengths, np.int32)),
+            media_mask=self._appended("media_mask", np.frombuffer(masks, np.uint8)),
+            media_offsets=self._appended("media_offsets", self.arrays.media_offsets[-1] + np.cumsum(new_counts)),
+            url_kind=self._appended("url_kind", np.frombuffer(kinds, np.uint8)),
+            url_position=self._appended("url_position", np.repeat(np.arange(start, end, dtype=np.int32), new_counts)),
+            time_order=self._merged_time_order(local_time, start + np.argsort(new_times, kind="stable")))
+
+    def _merged_time_order(self, times, new_order):
+        """time_order with positions start.. (new_order, sorted by time) merged in. Slots
+        before the earliest new time stay as they are; only the ones after it are sorted again."""
+        order = self.arrays.time_order
+        if not len(new_order):
+            return order
+        split = bisect.bisect_right(range(len(order)), times[new_order[0]], key=lambda slot: times[order[slot]])
+        if split == len(order):
+            return self._appended("time_order", new_order)
+        tail = np.concatenate((order[split:], new_order))
+        tail = tail[np.argsort(times[tail], kind="stable")]  # Ties keep older positions first
+        # A new buffer rather than rewriting slots the current time_order shows
+        buffer = np.empty(max(len(self.buffers.get("time_order", order)), split + len(tail)), order.dtype)
+        buffer[:split] = order[:split]
+        buffer[split:split + len(tail)] = tail
+        self.buffers["time_order"] = buffer
+        return buffer[:split + len(tail)]
+
+    def nbytes(self):
+        return sum(self.buffers.get(name, getattr(self.arrays, name)).nbytes for name in ColumnArrays.__slots__)
+
+    @staticmethod
+    def date_number(value, width):
+        """A year/month/day filter as a number, or None if the index would never match
+        it (e.g. "0999" or non-ASCII digits; keys are str(year) and zero-padded months/days)."""
+        try:
+            number = int(value)
+        except ValueError:
+            return None
+        return number if str(number).zfill(width) == value else None
+
+    def select(self, preference, handle_keys=None, year=None, month=None, day=None,
+               search_positions=None, time_range=None, order=None):
+        """Positions matching every given filter, as an array.array("i").
+
+        handle_keys are lowercased handles (any of them matches), year/month/day the
+        strings parse_date_filters gives and search_positions an ascending position
+        list. Positions come in cache order, or by time for order "newest"/"oldest".
+        """
+        arrays = self.arrays
+        match = ColumnFilter(self, preference, handle_keys, year, month, day, search_positions, time_range)
+        mask = match.mask(arrays, slice(0, len(arrays.local_time)))
+        if order:
+            positions = arrays.time_order[mask[arrays.time_order]]
+            if order == "newest":
+                positions = positions[::-1]
+        else:
+            positions = np.flatnonzero(mask)
+        return array.array("i", positions.astype(np.int32).tobytes())
+
+    def with_media(self, positions, preference):
+        """positions, in their order, that have media of the preferred type."""
+        positions = np.asarray(positions, np.int64)
+        keep = (self.media_mask[positions] & self.MEDIA_BITS.get(preference, 0)) != 0
+        return array.array("i", positions[keep].astype(np.int32).tobytes())
+
+class ColumnFilter:
+    """The filters of TweetColumns.select() resolved once (handle keys to codes, date strings
+    to numbers), then applied to any part of the columns."""
+
+    __slots__ = ("bit", "codes", "dates", "search", "time_range", "never")
+
+    def __init__(self, columns, preference, handle_keys=None, year=None, month=None, day=None,
+                 search_positions=None, time_range=None):
+        self.bit = columns.MEDIA_BITS.get(preference, 0)
+        self.codes = None
+        if handle_keys is not None:
+            self.codes = np.array([code for key in handle_keys for code in columns.lower_codes.get(key, ())], np.int32)
+        self.dates = []  # (column name, number)
+        self.never = False
+        for name, value, width in (("year", year, 1), ("month", month, 2), ("day", day, 2)):
+            if value:
+                number = columns.date_number(value, width)
+                if number is None:
+                    self.never = True
+                else:
+                    self.dates.append((name, number))
+        self.search = None if search_positions is None else np.asarray(search_positions, np.int64)
+        if self.search is not None and not len(self.search):
+            self.never = True
+        self.time_range = time_range or (None, None)
+
+    def mask(self, arrays, positions):
+        """Which of positions (a slice or an array of positions) of arrays match."""
+        mask = (arrays.media_mask[positions] & self.bit) != 0
+        if self.never:
+            mask[:] = False
+            return mask
+        if self.codes is not None:
+            mask &= np.isin(arrays.handle_code[positions], self.codes)
+        for name, number in self.dates:
+            mask &= getattr(arrays, name)[positions] == number
+        if self.search is not None:
+            if isinstance(positions, slice):
+                positions = np.arange(*positions.indices(len(arrays.local_time)))
+            slots = np.minimum(np.searchsorted(self.search, positions), len(self.search) - 1)
+            mask &= self.search[slots] == positions
+        start, end = self.time_range
+        if start is not None:
+            mask &= arrays.local_time[positions] >= start
+        if end is not None:
+            mask &= arrays.local_time[positions] < end
+        return mask
+
+def grouped_counts(keys, *weights):
+    """Distinct keys in order of first appearance, their counts and the sum of each weights array per key, as lists."""
+    unique, first, inverse, counts = np.unique(keys, return_index=True, return_inverse=True, return_counts=True)
+    order = np.argsort(first)
+    sums = [np.bincount(inverse, weights=w, minlength=len(unique))[order].astype(np.int64).tolist() for w in weights]
+    return [unique[order].tolist(), counts[order].tolist(), *sums]
+
+def edit_distance(a, b, limit=None):
+    """Edit distance between two strings, counting a swap of neighbouring characters as one typo.
+    Gives up with limit + 1 once the distance must exceed limit."""
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is not None and len(a) - len(b) > limit:
+        return limit + 1
+    before, previous = None, list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b))
+            if before is not None and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b:
+                cost = min(cost, before[j - 2] + 1)
+            current.append(cost)
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return previous[-1]
+
+def typo_tolerance(text):
+    """Typos forgiven in a handle of this length: none up to 4 characters, then 1, then 2 from 10."""
+    return min(2, len(text) // 5)
+
+class HandleIndex:
+    """Trigram index over the distinct handles of a profile.
+
+    grams maps each trigram of "^handle$" (lowercased) to the handles containing it, so
+    a lookup only looks at handles sharing a trigram with the query and never at tweets.
+    """
+
+    FUZZY_CANDIDATES = 50
+
+    def __init__(self, tweets=()):
+        self.names = {}  # lowercased handle -> handle as stored
+        self.grams = collections.defaultdict(list)
+        self.add(tweets)
+
+    @staticmethod
+    def trigrams(text):
+        return list(dict.fromkeys(text[i:i + 3] for i in range(len(text) - 2)))
+
+    def add(self, tweets):
+        self.add_handles(tweet.user_handle for tweet in tweets)
+
+    def add_handles(self, handles):
+        for handle in handles:
+            key = handle.lower()
+            if key not in self.names:
+                self.names[key] = handle
+                for gram in self.trigrams(f"^{key}$"):
+                    self.grams[gram].append(key)
+
+    def containing(self, query):
+        """Lowercased handles that contain query."""
+        query = query.lower()
+        grams = self.trigrams(query)
+        if not grams:  # Too short for a trigram, the handles themselves are the only index
+            return [key for key in list(self.names) if query in key]  # A copy, a refresh may be adding handles
+        shortest = min((self.grams.get(gram, ()) for gram in grams), key=len)
+        return [key for key in shortest if query in key]
+
+    def close_matches(self, query, max_distance=None, limit=3):
+        """Lowercased handles within max_distance typos of query (by default its typo_tolerance, at least 1), closest first."""
+        query = query.lower()
+        if max_distance is None:
+            max_distance = max(1, typo_tolerance(query))
+        shared = collections.Counter()
+        for gram in self.trigrams(f"^{query}$"):
+            for key in self.grams.get(gram, ()):
+                shared[key] += 1
+
+        matches = []
+        for key, _ in shared.most_common(self.FUZZY_CANDIDATES):
+            distance = edit_distance(query, key, max_distance)
+            if distance <= max_distance:
+                matches.append((distance, -shared[key], key))
+        return [key for _, _, key in sorted(matches)[:limit]]
+
+    def resolve(self, guess):
+        """The handle a (possibly misspelled) guess most likely means, or None if it's unclear."""
+        guess = guess.lower().lstrip("@")
+        if guess in self.names:
+            return guess
+        tolerance = typo_tolerance(guess)
+        if not tolerance:
+            return None
+        scored = sorted((edit_distance(guess, key, tolerance), key) for key in self.close_matches(guess, tolerance))
+        if not scored or (len(scored) > 1 and scored[0][0] == scored[1][0]):
+            return None
+        return scored[0][1]
+
+    def suggestions(self, query):
+        """Stored handles to offer as "did you mean" for a query matching nothing."""
+        return [self.names[key] for key in self.close_matches(query)]
+
+class TweetStats:
+    """Aggregates behind .stats, computed once at load and updated as tweets are appended.
+
+    Sorted views (top users overall or per year) are cached until the next add(). _lock
+    keeps add() (a refresh, in a worker) apart from building them (prepare_stats, in another).
+    """
+
+    def __init__(self):
+        self.total_tweets = 0
+        self.total_images = 0
+        self.total_videos = 0
+        self.longest_tweet = None
+        self.user_counts = collections.Counter()
+        self.year_counts = collections.Counter()  # "YYYY" -> tweets
+        self.month_counts = collections.Counter()  # "YYYY-MM" -> tweets
+        self.year_media = collections.defaultdict(lambda: [0, 0])  # "YYYY" -> [images, videos]
+        self.year_user_counts = collections.defaultdict(collections.Counter)  # "YYYY" -> handle -> tweets
+        self.user_media = collections.defaultdict(lambda: [0, 0])  # handle -> [images, videos]
+        self.user_year_counts = collections.defaultdict(collections.Counter)  # handle -> "YYYY" -> tweets
+        self._top_users = None
+        self._user_ranks = None
+        self._year_top_users = {}
+        self._lock = threading.RLock()
+
+    def add(self, tweets, columns=None, start=0):
+        """Count tweets in. With columns (holding the tweets from position start) it's done in a few array passes."""
+        with self._lock:
+            if columns is not None:
+                self.add_columns(tweets, columns, start)
+            else:
+                self.add_tweets(tweets)
+            self._top_users = None
+            self._user_ranks = None
+            self._year_top_users = {}
+
+    def add_tweets(self, tweets):
         for tweet in tweets:
-            if parse_tweet_date(tweet):
-                valid_tweets.append(tweet)
-        
-        TWEET_CACHE = valid_tweets
-        CACHE_TIMESTAMP = datetime.datetime.now()
-        print(f"Loaded {len(TWEET_CACHE)} tweets.")
-        return TWEET_CACHE
+            handle = tweet.user_handle
+            tweet_dt = tweet.created_dt
+            year, month = str(tweet_dt.year), f"{tweet_dt.year}-{str(tweet_dt.month).zfill(2)}"
+            images = sum(1 for media in tweet.media if media.endswith(IMAGE_SUFFIXES))
+            videos = sum(1 for media in tweet.media if media.endswith('.mp4'))
+
+            self.total_tweets += 1
+            self.total_images += images
+            self.total_videos += videos
+            if self.longest_tweet is None or len(tweet.text) > len(self.longest_tweet.text):
+                self.longest_tweet = tweet
+
+            self.user_counts[handle] += 1
+            self.year_counts[year] += 1
+            self.month_counts[month] += 1
+            self.year_user_counts[year][handle] += 1
+            self.user_year_counts[handle][year] += 1
+            for totals in (self.year_media[year], self.user_media[handle]):
+                totals[0] += images
+                totals[1] += videos
+
+    def add_columns(self, tweets, columns, start):
+        """add() over TweetColumns, updating every counter in the same order the loop would."""
+        count = len(tweets)
+        if not count:
+            return
+        end = start + count
+        lo, hi = columns.media_offsets[start], columns.media_offsets[end]
+        kinds, owners = columns.url_kind[lo:hi], columns.url_position[lo:hi] - start
+        images = np.bincount(owners[kinds == columns.IMAGE], minlength=count)
+        videos = np.bincount(owners[kinds == columns.VIDEO], minlength=count)
+        codes = columns.handle_code[start:end].astype(np.int64)
+        years = columns.year[start:end].astype(np.int64)
+
+        self.total_tweets += count
+        self.total_images += int(images.sum())
+        self.total_videos += int(videos.sum())
+        longest = int(np.argmax(columns.text_length[start:end]))  # First of the longest, like the loop
+        if self.longest_tweet is None or columns.text_length[start + longest] > len(self.longest_tweet.text):
+            self.longest_tweet = tweets[longest]
+
+        handles = columns.handles
+        for code, tweet_count, image_count, video_count in zip(*grouped_counts(codes, images, videos)):
+            handle = handles[code]
+            self.user_counts[handle] += tweet_count
+            totals = self.user_media[handle]
+            totals[0] += image_count
+            totals[1] += video_count
+        for year, tweet_count, image_count, video_count in zip(*grouped_counts(years, images, videos)):
+            self.year_counts[str(year)] += tweet_count
+            totals = self.year_media[str(year)]
+            totals[0] += image_count
+            totals[1] += video_count
+        for key, tweet_count in zip(*grouped_counts(years * 100 + columns.month[start:end])):
+            self.month_counts[f"{key // 100}-{key % 100:02d}"] += tweet_count
+        for key, tweet_count in zip(*grouped_counts(years << 32 | codes)):
+            year, handle = str(key >> 32), handles[key & 0xFFFFFFFF]
+            self.year_user_counts[year][handle] += tweet_count
+            self.user_year_counts[handle][year] += tweet_count
+
+    @property
+    def total_media(self):
+        return self.total_images + self.total_videos
+
+    def top_users(self):
+        """All handles as (handle, count), most liked first."""
+        with self._lock:
+            if self._top_users is None:
+                self._top_users = self.user_counts.most_common()
+            return self._top_users
+
+    def user_rank(self, handle):
+        with self._lock:
+            if self._user_ranks is None:
+                self._user_ranks = {user: rank for rank, (user, _) in enumerate(self.top_users(), 1)}
+            return self._user_ranks.get(handle)
+
+    def year_top_users(self, year):
+        with self._lock:
+            if year not in self._year_top_users:
+                self._year_top_users[year] = self.year_user_counts[year].most_common() if year in self.year_user_counts else []
+            return self._year_top_users[year]
+
+    def find_user(self, query):
+        """Resolve a handle case-insensitively. Returns the stored handle or None."""
+        with self._lock:  # add() may be counting new handles in at the same time
+            if query in self.user_counts:
+                return query
+            query = query.lower()
+            return next((handle for handle in self.user_counts if handle.lower() == query), None)
+
+class GameRotation:
+    """Draws indices 0..size-1 in random order without repeats until all have been used,
+    then starts a new cycle. A lazy Fisher-Yates shuffle: each draw is O(1) and only the
+    swapped slots are stored, so a huge pool costs nothing up front."""
+
+    def __init__(self, size):
+        self.size = size
+        self.remaining = size
+        self.swaps = {}  # virtual slot -> index, for slots that differ from identity
+
+    def draw(self):
+        if not self.remaining:
+            self.remaining = self.size
+            self.swaps.clear()
+        slot = random.randrange(self.remaining)
+        last = self.remaining - 1
+        picked = self.swaps.get(slot, slot)
+        if slot != last:
+            self.swaps[slot] = self.swaps.pop(last, last)
+        else:
+            self.swaps.pop(last, None)
+        self.remaining -= 1
+        return picked
+
+    def state(self):
+        """The rotation as JSON-able data, for GameRotation.from_state()."""
+        return {"size": self.size, "remaining": self.remaining, "swaps": list(self.swaps.items())}
+
+    @classmethod
+    def from_state(cls, state):
+        rotation = cls(state["size"])
+        rotation.remaining = state["remaining"]
+        rotation.swaps = {slot: index for slot, index in state["swaps"]}
+        return rotation
+
+    def grow(self, new_size):
+        """Add indices size..new_size-1 to the current cycle."""
+        for index in range(self.size, new_size):
+            # Move the used slot at `remaining` to the new slot and put the new index in its place
+            used = self.swaps.get(self.remaining, self.remaining)
+            if used != index:
+                self.swaps[index] = used
+            self.swaps[self.remaining] = index
+            self.remaining += 1
+        self.size = new_size
+
+class GamePool:
+    """The images .game draws from, built once per profile and shared by every game.
+
+    Entry i is image media_indices[i] of tweet positions[i]. Each channel gets its own
+    GameRotation, so an image doesn't come up again there until the pool is used up.
+    _lock keeps add() (a refresh, in a worker) apart from draws (on the event loop).
+    """
+
+    WEIGHTED_RETRIES = 20
+
+    def __init__(self, tweets, columns=None):
+        self.tweets = tweets
+        self.columns = columns  # TweetColumns of tweets, to find the images with array operations
+        self.positions = array.array("i")
+        self.media_indices = array.array("B")
+        self.rotations = {}  # channel id -> GameRotation
+        self.weighted_seen = {}  # channel id -> entries drawn this cycle in weighted games
+        self._cumulative_weights = None
+        self._lock = threading.RLock()
+        self.add(tweets)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def add(self, new_tweets, start=0):
+        positions, media_indices = array.array("i"), array.array("B")
+        columns = self.columns
+        if columns is not None:
+            lo, hi = columns.media_offsets[start], columns.media_offsets[start + len(new_tweets)]
+            urls = np.flatnonzero(columns.url_kind[lo:hi] == columns.IMAGE) + lo
+            owners = columns.url_position[urls]
+            positions.frombytes(owners.astype(np.int32).tobytes())
+            media_indices.frombytes((urls - columns.media_offsets[owners]).astype(np.uint8).tobytes())
+        else:
+            for position, tweet in enumerate(new_tweets, start):
+                for media_index, url in enumerate(tweet.media):
+                    if url.endswith(IMAGE_SUFFIXES):
+                        positions.append(position)
+                        media_indices.append(media_index)
+        with self._lock:
+            self.positions.extend(positions)
+            self.media_indices.extend(media_indices)
+            for rotation in self.rotations.values():
+                rotation.grow(len(self))
+            self._cumulative_weights = None
+
+    def entry(self, index):
+        """(Tweet, image URL) for a pool entry."""
+        tweet = self.tweets[self.positions[index]]
+        return tweet, tweet.media[self.media_indices[index]]
+
+    def resume(self, channel_id, state):
+        """Carry on a channel's rotation from a saved GameRotation.state(), unless the
+        channel already has one here or the pool has shrunk since (the file was rewritten)."""
+        with self._lock:
+            if channel_id not in self.rotations and state and state["size"] <= len(self):
+                rotation = self.rotations[channel_id] = GameRotation.from_state(state)
+                rotation.grow(len(self))
+
+    def draw(self, channel_id):
+        with self._lock:
+            rotation = self.rotations.get(channel_id)
+            if rotation is None:
+                rotation = self.rotations[channel_id] = GameRotation(len(self))
+            return self.entry(rotation.draw())
+
+    def rotation_state(self, channel_id):
+        """GameRotation.state() of a channel's rotation, for saving."""
+        with self._lock:
+            return self.rotations[channel_id].state()
+
+    def weights(self, positions, user_counts):
+        """Cumulative handle weights of the entries at positions."""
+        columns = self.columns
+        if columns is not None:
+            handle_weights = np.array([user_counts[handle] for handle in columns.handles], np.int64)
+            return np.cumsum(handle_weights[columns.arrays.handle_code[np.array(positions, np.int32)]])
+        return list(itertools.accumulate(user_counts[self.tweets[position].user_handle] for position in positions))
+
+    def draw_weighted(self, channel_id, user_counts):
+        """Draw with each image weighted by how often its handle was liked, so favourite
+        accounts come up more. Images already shown in the channel this cycle are
+        skipped (best effort, a few retries)."""
+        cumulative = self._cumulative_weights
+        if cumulative is None:
+            # Built outside the lock so plain draws don't wait for it. The pool only grows, so
+            # these weights stay usable for the entries they cover even if add() runs meanwhile.
+            with self._lock:
+                positions = self.positions[:]
+            cumulative = self.weights(positions, user_counts)
+
+        with self._lock:
+            if self._cumulative_weights is None and len(cumulative) == len(self):
+                self._cumulative_weights = cumulative
+            seen = self.weighted_seen.setdefault(channel_id, {})
+            if len(seen) >= len(cumulative):
+                seen.clear()
+            for _ in range(self.WEIGHTED_RETRIES):
+                index = bisect.bisect_right(cumulative, random.randrange(cumulative[-1]))
+                if index not in seen:
+                    break
+            seen[index] = True
+            return self.entry(index)
+
+_URL_PATTERN = re.compile(r"https?://\S+")
+_WORD_PATTERN = re.compile(r"\w+")
+_SEARCH_TERM_PATTERN = re.compile(r'"([^"]*)"?|(\S+)')
+
+def tokenize(text):
+    """Lowercased words of a tweet's text, ignoring links."""
+    return _WORD_PATTERN.findall(_URL_PATTERN.sub(" ", text).casefold())
+
+def parse_search_query(query):
+    """Split a .search query into OR-groups of AND-ed clauses.
+
+    Each clause is a tuple of tokens; more than one token means a phrase that has to
+    appear in that order. `cat dog OR "red fox"` -> [[("cat",), ("dog",)], [("red", "fox")]].
+    Words are AND-ed anyway, so an explicit AND or & is skipped.
+    """
+    groups = [[]]
+    for match in _SEARCH_TERM_PATTERN.finditer(query):
+        phrase, word = match.groups()
+        if word in ("OR", "|"):
+            groups.append([])
+            continue
+        if word in ("AND", "&"):
+            continue
+        tokens = tuple(tokenize(phrase if phrase is not None else word))
+        if tokens:
+            groups[-1].append(tokens)
+    return [group for group in groups if group]
+
+class MappedPostings:
+    """token -> slice of a flat array, over TextIndex.stored_sections() in a mapped file.
+
+    Tokens are found by bisecting their sorted UTF-8 bytes, so the process builds nothing
+    per token. Recent lookups are remembered, since scoring looks the same tokens up
+    for every match.
+    """
+
+    LOOKUP_CACHE = 1024
+
+    def __init__(self, token_offsets, token_data, offsets, values):
+        self.token_offsets = token_offsets
+        self.token_data = token_data
+        self.offsets = offsets
+        self.values_array = values
+        self.recent = {}  # token -> slot, or -1 for tokens not in the index
+
+    def slot(self, token):
+        slot = self.recent.get(token)
+        if slot is None:
+            key = token.encode("utf-8", "surrogatepass")
+            token_offsets, token_data = self.token_offsets, self.token_data
+            lo, hi = 0, len(token_offsets) - 1
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if bytes(token_data[token_offsets[mid]:token_offsets[mid + 1]]) < key:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            found = lo < len(token_offsets) - 1 and bytes(token_data[token_offsets[lo]:token_offsets[lo + 1]]) == key
+            slot = lo if found else -1
+            if len(self.recent) >= self.LOOKUP_CACHE:
+                self.recent.clear()
+            self.recent[token] = slot
+        return slot
+
+    def __contains__(self, token):
+        return self.slot(token) >= 0
+
+    def __getitem__(self, token):
+        slot = self.slot(token)
+        if slot < 0:
+            raise KeyError(token)
+        return self.values_array[self.offsets[slot]:self.offsets[slot + 1]]
+
+    def get(self, token, default=None):
+        return self[token] if token in self else default
+
+    def values(self):
+        offsets = self.offsets
+        return (self.values_array[offsets[slot]:offsets[slot + 1]] for slot in range(len(offsets) - 1))
+
+class TextIndex:
+    """Inverted index over tweet text for .search and search: filters.
+
+    postings[token] lists the positions of the tweets containing token in ascending
+    order, with frequencies[token] holding how often it occurs in each. Matches are
+    ranked with BM25.
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, tweets):
+        self.tweets = tweets
+        self.postings = {}
+        self.frequencies = {}
+        self.lengths = array.array("H")  # Token count of each tweet
+        self.total_length = 0
+        self.add(tweets)
+
+    def add(self, new_tweets, start=0):
+        for position, tweet in enumerate(new_tweets, start):
+            tokens = tokenize(tweet.text)
+            self.lengths.append(min(len(tokens), 0xFFFF))
+            self.total_length += len(tokens)
+            for token, count in collections.Counter(tokens).items():
+                postings = self.postings.get(token)
+                if postings is None:
+                    postings = self.postings[token] = array.array("i")
+                    self.frequencies[token] = array.array("H")
+                postings.append(position)
+                self.frequencies[token].append(min(count, 0xFFFF))
+
+    @classmethod
+    def mapped(cls, tweets, column):
+        """The index stored_sections() wrote to a snapshot, used in place (see SharedStore)."""
+        index = cls(())
+        index.tweets = tweets
+        index.lengths = column("text.lengths")
+        index.total_length = column("text.total_length")[0]
+        tokens = (column("text.tokens.offsets"), column("text.tokens.data"), column("text.postings.offsets"))
+        index.postings = MappedPostings(*tokens, column("text.postings"))
+        index.frequencies = MappedPostings(*tokens, column("text.frequencies"))
+        return index
+
+    @classmethod
+    def stored(cls, tweets, column):
+        """The index stored_sections() wrote to a snapshot, copied out so tweets can still be added."""
+        index = cls(())
+        index.tweets = tweets
+        index.lengths = array.array("H", column("text.lengths").tobytes())
+        index.total_length = column("text.total_length")[0]
+        offsets = column("text.postings.offsets").tolist()
+        postings, frequencies = column("text.postings"), column("text.frequencies")
+        for token, start, end in zip(MappedStrings(column, "text.tokens"), offsets, offsets[1:]):
+            index.postings[token] = array.array("i", postings[start:end].tobytes())
+            index.frequencies[token] = array.array("H", frequencies[start:end].tobytes())
+        return index
+
+    def stored_sections(self):
+        """The index as flat arrays, tokens sorted by their UTF-8 bytes, for write_snapshot(extra=...)."""
+        tokens = sorted(self.postings, key=lambda token: token.encode("utf-8", "surrogatepass"))
+        token_offsets, token_data = _pack_strings(tokens, byte_offsets=True)
+        postings, frequencies = array.array("i"), array.array("H")
+        for token in tokens:
+            postings.extend(self.postings[token])
+            frequencies.extend(self.frequencies[token])
+        return {
+            "text.lengths": self.lengths,
+            "text.total_length": array.array("q", [self.total_length]),
+            "text.tokens.offsets": token_offsets,
+            "text.tokens.data": array.array("B", token_data),
+            "text.postings.offsets": array.array("q", itertools.accumulate((len(self.postings[token]) for token in tokens), initial=0)),
+            "text.postings": postings,
+            "text.frequencies": frequencies,
+        }
+
+    def entry_count(self):
+        return sum(len(postings) for postings in list(self.postings.values()))  # A copy, a refresh may be adding tokens
+
+    def has_phrase(self, position, pattern):
+        return pattern.search(_URL_PATTERN.sub(" ", self.tweets[position].text).casefold()) is not None
+
+    def score(self, position, terms):
+        """BM25 relevance of a tweet for the given query tokens."""
+        tweet_count = len(self.lengths)
+        average_length = self.total_length / tweet_count or 1
+        length_norm = self.K1 * (1 - self.B + self.B * self.lengths[position] / average_length)
+        score = 0.0
+        for token in terms:
+            postings = self.postings[token]
+            frequency = self.frequencies[token][bisect.bisect_left(postings, position)]
+            idf = math.log(1 + (tweet_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            score += idf * frequency * (self.K1 + 1) / (frequency + length_norm)
+        return score
+
+    def search(self, query):
+        """Score every tweet matching the query: {position: relevance}."""
+        scores = {}
+        for group in parse_search_query(query):
+            check_cancelled()
+            terms = list(dict.fromkeys(token for clause in group for token in clause))
+            if not all(token in self.postings for token in terms):
+                continue
+            # Consecutive tokens are word runs separated only by non-word characters
+            phrases = [re.compile(r"\b" + r"\W+".join(map(re.escape, clause)) + r"\b") for clause in group if len(clause) > 1]
+            matches = QueryResult(self.tweets, [self.postings[token] for token in terms], "all")
+            for position in matches.positions():
+                if all(self.has_phrase(position, pattern) for pattern in phrases):
+                    scores[position] = max(scores.get(position, 0.0), self.score(position, terms))
+        return scores
+
+    def ranked(self, query):
+        """Matching positions, most relevant first."""
+        scores = self.search(query)
+        return sorted(scores, key=lambda position: (-scores[position], position))
+
+    def matching_positions(self, query):
+        """Matching positions in cache order, for use as a filter_tweets candidate list."""
+        return sorted(self.search(query))
+
+STREAM_CHUNK_SIZE = 1024 * 1024  # Bytes read per chunk while streaming liked_tweets.json
+PROGRESS_MIN_BYTES = 50 * 1024 * 1024  # Only report load progress for files at least this big
+_JSON_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+def iter_json_array(path, chunk_size=STREAM_CHUNK_SIZE, progress=None, start_offset=0, state=None):
+    """Yield the elements of a file's top-level JSON array one at a time.
+
+    Only the current chunk and the element being decoded are held in memory, so huge
+    exports never exist as a full object graph. progress, if given, is called with the
+    number of bytes read so far after every chunk.
+
+    A non-zero start_offset resumes right after a previously read element (see
+    source_tail), so only elements appended since then are decoded. If state is given,
+    state["close_offset"] is set to the byte offset of the closing "]".
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+
+    with open(path, "rb") as f:
+        f.seek(start_offset)
+        buffer, pos, bytes_read, eof = "", 0, start_offset, False
+
+        def read_chunk():
+            nonlocal buffer, pos, bytes_read, eof
+            if eof:
+                return False
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            bytes_read += len(chunk)
+            buffer = buffer[pos:] + utf8.decode(chunk, final=eof)
+            pos = 0
+            if progress and chunk:
+                progress(bytes_read)
+            return not eof
+
+        def skip_whitespace():
+            """Advance to the next significant character. Returns False at end of file."""
+            nonlocal pos
+            while True:
+                pos = _JSON_WHITESPACE.match(buffer, pos).end()
+                if pos < len(buffer):
+                    return True
+                if not read_chunk():
+                    return False
+
+        first = True
+        if not start_offset:
+            if not skip_whitespace() or buffer[pos] != "[":
+                raise ValueError("expected a top-level JSON array")
+            pos += 1
+
+        while True:
+            if not skip_whitespace():
+                raise ValueError("unterminated JSON array")
+            if buffer[pos] == "]":
+                if state is not None:
+                    unread = len(buffer[pos:].encode("utf-8", "surrogatepass")) + len(utf8.getstate()[0])
+                    state["close_offset"] = bytes_read - unread
+                return
+            if start_offset and first:
+                # Resuming: a comma follows the previous element, unless that was the "["
+                if buffer[pos] == ",":
+                    pos += 1
+                    if not skip_whitespace():
+                        raise ValueError("unterminated JSON array")
+            elif not first:
+                if buffer[pos] != ",":
+                    raise ValueError(f"expected ',' between array elements near byte {bytes_read}")
+                pos += 1
+                if not skip_whitespace():
+                    raise ValueError("unterminated JSON array")
+            first = False
+
+            while True:
+                try:
+                    element, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    # Element straddles the chunk boundary (or the file really is broken)
+                    if not read_chunk():
+                        raise
+                    continue
+                # A scalar cut off at the chunk boundary (e.g. "2.5" of "2.5e3") still decodes,
+                # so only accept the element once its delimiter has been seen
+                after = _JSON_WHITESPACE.match(buffer, end).end()
+                if (after == len(buffer) or buffer[after] not in ",]") and read_chunk():
+                    continue
+                break
+            pos = end
+            yield element
+
+def make_progress_printer(total_bytes, step_percent=10):
+    """Return a progress callback that prints every step_percent of total_bytes."""
+    next_report = [step_percent]
+
+    def report(bytes_read):
+        percent = bytes_read * 100 // total_bytes if total_bytes else 100
+        if percent >= next_report[0]:
+            print(f"  ...{percent}% ({bytes_read // (1024 * 1024)} / {total_bytes // (1024 * 1024)} MB)")
+            next_report[0] = (percent // step_percent + 1) * step_percent
+
+    return report
+
+def parse_tweets_file(json_path, start_offset=0, parallel=True):
+    """Stream a liked_tweets.json file into Tweet records.
+
+    Returns (tweets, memory report, offset of the closing bracket). With start_offset,
+    only the elements after that offset are parsed (see iter_json_array). Full parses of
+    big files go to the process pool when there is one (see parse_tweets_parallel).
+    """
+    file_size = os.path.getsize(json_path)
+    if parallel and PARSE_POOL and not start_offset and file_size >= PARALLEL_PARSE_MB * 1024 * 1024:
+        parsed = parse_tweets_parallel(json_path)
+        if parsed:
+            return parsed
+    progress = make_progress_printer(file_size) if file_size - start_offset >= PROGRESS_MIN_BYTES else None
+
+    # Stream the array straight into compact records; tweets with invalid dates are
+    # skipped as they go by and each raw dict is dropped right after conversion
+    tweets = []
+    raw_sample = []
+    state = {}
+    for raw_tweet in iter_json_array(json_path, progress=progress, start_offset=start_offset, state=state):
+        if len(raw_sample) < MEMORY_REPORT_SAMPLE:
+            # json.load shares key strings across dicts; intern them so the report does too
+            raw_sample.append({sys.intern(key): value for key, value in raw_tweet.items()})
+        tweet = make_tweet(raw_tweet)
+        if tweet:
+            tweets.append(tweet)
+
+    return tweets, build_memory_report(raw_sample, tweets), state["close_offset"]
+
+# Parallel parsing: a big file is cut into byte ranges that start at element boundaries
+# and the ranges are parsed by a pool of processes (JSON decoding holds the GIL, so
+# threads wouldn't help).
+PARSE_PROCESSES = config.get("PARSE_PROCESSES") or os.cpu_count() or 1  # 1 keeps parsing in this process; null means one per core
+PARALLEL_PARSE_MB = config.get("PARALLEL_PARSE_MB", 64)  # Files at least this big are parsed in parallel
+PARSE_PARTS_PER_PROCESS = 4
+_BOUNDARY_WINDOW = 1024 * 1024
+
+def _find_boundary(f, offset, limit, pattern):
+    """Byte offset of the first element start matched by pattern in [offset, limit), or None."""
+    overlap = 4096
+    while offset < limit:
+        f.seek(offset)
+        window = f.read(min(_BOUNDARY_WINDOW, limit - offset + overlap))
+        match = pattern.search(window)
+        if match and offset + match.start(1) < limit:
+            return offset + match.start(1)
+        if len(window) <= overlap:
+            return None
+        offset += len(window) - overlap
+    return None
+
+def part_boundaries(json_path, file_size, parts):
+    """Byte offsets cutting a file's array into up to `parts` runs of whole elements:
+    the first starts after the "[" and each other one at an element start, with
+    file_size at the end. None if the file doesn't look splittable.
+
+    A boundary is a comma followed by "{" and the first element's first key, which can't
+    appear inside a JSON string (its quotes would be escaped). It could still be a nested
+    object with that key, so workers check that every part parses as whole elements.
+    """
+    elements = iter_json_array(json_path)
+    try:
+        first = next(elements, None)
+    finally:
+        elements.close()
+    if not isinstance(first, dict) or not first:
+        return None
+    key = json.dumps(next(iter(first)), ensure_ascii=False).encode("utf-8")
+    pattern = re.compile(rb",[ \t\n\r]*(\{[ \t\n\r]*" + re.escape(key) + rb"[ \t\n\r]*:)")
+
+    with open(json_path, "rb") as f:
+        head = f.read(_BOUNDARY_WINDOW)
+        start = head.find(b"[") + 1
+        boundaries = [start]
+        for index in range(1, parts):
+            offset = max(boundaries[-1] + 1, file_size * index // parts)
+            boundary = _find_boundary(f, offset, file_size, pattern)
+            if boundary is None:
+                break
+            if boundary > boundaries[-1]:
+                boundaries.append(boundary)
+    boundaries.append(file_size)
+    return boundaries
+
+def _parse_part(json_path, start, end, last, sample):
+    """Process pool job: parse the elements in bytes [start, end) of json_path, which must
+    be whole elements each followed by a comma (by the closing "]" in the last part).
+
+    Returns (Tweet fields as tuples, raw sample for the memory report, byte offset of the
+    closing "]" or None). Raises ValueError if the part doesn't line up with elements.
+    """
+    with open(json_path, "rb") as f:
+        f.seek(start)
+        text = f.read(end - start).decode("utf-8")
+    decoder = json.JSONDecoder()
+    rows, raw_sample, close_offset = [], [], None
+    pos = _JSON_WHITESPACE.match(text).end()
+    while pos < len(text):
+        if last and text[pos] == "]":
+            close_offset = start + len(text[:pos].encode("utf-8", "surrogatepass"))
+            break
+        raw_tweet, pos = decoder.raw_decode(text, pos)
+        if sample and len(raw_sample) < MEMORY_REPORT_SAMPLE:
+            raw_sample.append({sys.intern(key): value for key, value in raw_tweet.items()})
+        tweet = make_tweet(raw_tweet)
+        if tweet:
+            rows.append((tweet.tweet_id, tweet.user_handle, tweet.text, tweet.timestamp,
+                         tweet.utc_offset, tweet.media, tweet.media_types))
+        pos = _JSON_WHITESPACE.match(text, pos).end()
+        if text.startswith(",", pos):
+            pos = _JSON_WHITESPACE.match(text, pos + 1).end()
+        elif not (last and text.startswith("]", pos)):
+            raise ValueError(f"part ending at byte {end} doesn't end between elements")
+    if last and close_offset is None:
+        raise ValueError("unterminated JSON array")
+    return rows, raw_sample, close_offset
+
+def parse_tweets_parallel(json_path, pool=None, parts=max(PARSE_PROCESSES, 2) * PARSE_PARTS_PER_PROCESS):
+    """parse_tweets_file's full parse, split into parts run on a process pool (PARSE_POOL
+    by default). Returns None if the file couldn't be split, so the caller parses it in
+    one process."""
+    pool = pool or PARSE_POOL
+    file_size = os.path.getsize(json_path)
+    boundaries = part_boundaries(json_path, file_size, parts)
+    if not boundaries or len(boundaries) < 3:
+        return None
+    parts = list(zip(boundaries, boundaries[1:]))
+    futures = [pool.submit(_parse_part, json_path, start, end, index == len(parts) - 1, index == 0)
+               for index, (start, end) in enumerate(parts)]
+    progress = make_progress_printer(file_size) if file_size >= PROGRESS_MIN_BYTES else None
+    tweets, raw_sample, close_offset = [], [], None
+    try:
+        # Parts are turned into Tweets in order as they finish, and each one's rows are let
+        # go of right after, so they never all sit in memory next to the Tweets
+        for index, (start, end) in enumerate(parts):
+            rows, sample, part_close = futures[index].result()
+            futures[index] = None
+            raw_sample.extend(sample)
+            tweets.extend(Tweet(tweet_id, sys.intern(handle), text, timestamp, utc_offset, media, media_types)
+                          for tweet_id, handle, text, timestamp, utc_offset, media, media_types in rows)
+            del rows
+            close_offset = part_close if part_close is not None else close_offset
+            if progress:
+                progress(end)
+    except Exception as e:  # A part that isn't whole elements, a broken pool, or a bug in a worker
+        for future in futures:
+            if future is not None:
+                future.cancel()
+        print(f"Couldn't parse {json_path} in parallel ({e!r}), using one process")
+        return None
+    return tweets, build_memory_report(raw_sample, tweets), close_offset
+
+def start_parse_pool(processes=PARSE_PROCESSES):
+    """A process pool for parse_tweets_parallel with its workers already running, or None
+    with fewer than two processes or where fork isn't available.
+
+    Call it while the process has a single thread and every function the workers call is
+    defined (the bot does so at the end of its import): a fork pool starts all its workers
+    at the first job, and forking once other threads run could copy a lock one of them holds.
+    """
+    if processes < 2 or "fork" not in multiprocessing.get_all_start_methods():
+        return None
+    pool = concurrent.futures.ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("fork"))
+    pool.submit(int).result()
+    return pool
+
+_parallel_parse_bytes = PARALLEL_PARSE_MB * 1024 * 1024
+SHARED_STORE_DIR = config.get("SHARED_STORE_DIR")  # Folder (ideally tmpfs, e.g. /dev/shm/tweetfetch) shared by bot processes
+ATTACH_SHARED = bool(SHARED_STORE_DIR) and not STARTUP_ARGS.loader  # Map profiles from the SharedStore instead of parsing them
+
+PARSE_POOL = None  # Started at the end of the module (see there)
+
+# Snapshots: a binary sidecar of the parsed records next to each liked_tweets.json.
+# Layout: magic, 8-byte metadata length, JSON metadata, then 8-byte aligned column
+# sections (native arrays, or UTF-8 blobs plus character offsets for string columns).
+# Profile snapshots also hold the text index (TextIndex.stored_sections()).
+SNAPSHOT_MAGIC = b"TWFSNAP1"
+SNAPSHOT_VERSION = 2
+SNAPSHOT_SUFFIX = ".snapshot"
+SNAPSHOTS_ENABLED = config.get("SNAPSHOTS", True)
+SNAPSHOT_HASH_BLOCK = 256 * 1024
+SNAPSHOT_HASH_BLOCKS = 16
+PREFIX_CHUNK = 1024 * 1024  # Bytes per source_tail chunk digest
+_MEDIA_TYPE_NAMES = (None,) + MEDIA_TYPES
+_MEDIA_TYPE_CODES = {media_type: code for code, media_type in enumerate(_MEDIA_TYPE_NAMES)}
+
+def snapshot_path_for(json_path):
+    """liked_tweets.json -> liked_tweets.snapshot in the same folder."""
+    return os.path.splitext(json_path)[0] + SNAPSHOT_SUFFIX
+
+def content_hash(json_path, length, sampled=True):
+    """Hash of the first length bytes of a file.
+
+    Up to SNAPSHOT_HASH_BLOCKS * SNAPSHOT_HASH_BLOCK bytes are hashed whole; longer
+    ranges hash evenly spaced blocks (always including the first and last) so checking
+    a multi-GB export stays cheap. sampled=False hashes every byte regardless.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(json_path, "rb") as f:
+        if length <= SNAPSHOT_HASH_BLOCK * SNAPSHOT_HASH_BLOCKS:
+            digest.update(f.read(length))
+        elif not sampled:
+            while length > 0:
+                block = f.read(min(length, 1024 * 1024))
+                if not block:
+                    break
+                digest.update(block)
+                length -= len(block)
+        else:
+            last_block = length - SNAPSHOT_HASH_BLOCK
+            for i in range(SNAPSHOT_HASH_BLOCKS):
+                f.seek(last_block * i // (SNAPSHOT_HASH_BLOCKS - 1))
+                digest.update(f.read(SNAPSHOT_HASH_BLOCK))
+    return digest.hexdigest()
+
+def source_fingerprint(json_path):
+    """Size, mtime and content hash a snapshot is keyed on."""
+    stat = os.stat(json_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": content_hash(json_path, stat.st_size)}
+
+def chunk_digests(json_path, start, end):
+    """Digests of the PREFIX_CHUNK-sized chunks of bytes [start, end) of a file, start being
+    a chunk boundary. The last one may be shorter."""
+    digests = []
+    with open(json_path, "rb") as f:
+        f.seek(start)
+        while start < end:
+            block = f.read(min(PREFIX_CHUNK, end - start))
+            if not block:
+                break
+            digests.append(hashlib.blake2b(block, digest_size=8).hexdigest())
+            start += len(block)
+    return digests
+
+def source_tail(json_path, close_offset, previous=None):
+    """Where the last array element ended when a file was read, plus hashes of
+    everything up to that point.
+
+    If a later version of the file still matches them, it only had elements appended
+    (the whitespace and "]" after the old last element may differ) and can be read
+    incrementally from append_offset. prefix_chunks holds a digest per PREFIX_CHUNK and
+    prefix_hash one over all of them. previous is the source of the version this one
+    only had elements appended to: its whole chunks are kept, so only the appended bytes
+    (and at most one old chunk) are read.
+    """
+    with open(json_path, "rb") as f:
+        window = min(close_offset, 4096)
+        f.seek(close_offset - window)
+        append_offset = close_offset - window + len(f.read(window).rstrip(b" \t\r\n"))
+    kept = []
+    if previous and "prefix_chunks" in previous:
+        kept = previous["prefix_chunks"][:previous["append_offset"] // PREFIX_CHUNK]
+    digests = kept + chunk_digests(json_path, len(kept) * PREFIX_CHUNK, append_offset)
+    prefix_hash = hashlib.blake2b("".join(digests).encode("ascii"), digest_size=16).hexdigest()
+    return {"append_offset": append_offset, "prefix_hash": prefix_hash, "prefix_chunks": digests}
+
+def prefix_source(source):
+    """The source_tail part of a source, for a file found unchanged since."""
+    return {key: source[key] for key in ("append_offset", "prefix_hash", "prefix_chunks") if key in source}
+
+def prefix_intact(json_path, source):
+    """Whether the file still starts with the bytes source_tail hashed. Every chunk is
+    compared, stopping at the first that differs."""
+    append_offset = source.get("append_offset")
+    if not append_offset:
+        return False
+    digests = source.get("prefix_chunks")
+    if digests is None:  # Recorded before prefix_chunks: prefix_hash is a hash of every byte
+        return content_hash(json_path, append_offset, sampled=False) == source.get("prefix_hash")
+    for index in range(len(digests)):
+        start = index * PREFIX_CHUNK
+        if chunk_digests(json_path, start, min(start + PREFIX_CHUNK, append_offset)) != [digests[index]]:
+            return False
+    return True
+
+def detect_change(json_path, source):
+    """Compare a file against the source info it was loaded from.
+
+    Returns "unchanged", "appended" (old content intact, new elements after it) or "changed".
+    """
+    stat = os.stat(json_path)
+    if stat.st_size == source["size"]:
+        if stat.st_mtime_ns == source["mtime_ns"]:
+            return "unchanged" if content_hash(json_path, stat.st_size) == source["hash"] else "changed"
+        # Rewritten in place: the sampled hash could miss an edit, so compare every byte up to
+        # the last element (only whitespace and "]" follow it). A touched but identical file is unchanged.
+        return "unchanged" if prefix_intact(json_path, source) else "changed"
+
+    # Only new elements are parsed after this, so an edit anywhere in the old content (not
+    # just where "]" became ",") has to send it down the full reload instead
+    if stat.st_size > source["size"] and prefix_intact(json_path, source):
+        return "appended"
+    return "changed"
+
+def _align8(n):
+    return (n + 7) & ~7
+
+def _pack_strings(strings, byte_offsets=False):
+    """String column -> (character offsets, UTF-8 blob). surrogatepass keeps lone \\ud800 escapes.
+
+    byte_offsets gives offsets into the blob instead, so one string can be decoded on its own (MappedStrings).
+    """
+    if byte_offsets:
+        encoded = [string.encode("utf-8", "surrogatepass") for string in strings]
+        return array.array("q", itertools.accumulate(map(len, encoded), initial=0)), b"".join(encoded)
+    offsets = array.array("q", itertools.accumulate(map(len, strings), initial=0))
+    return offsets, "".join(strings).encode("utf-8", "surrogatepass")
+
+def _unpack_strings(offsets, blob):
+    text = bytes(blob).decode("utf-8", "surrogatepass")
+    offsets = offsets.tolist()
+    return [text[start:end] for start, end in zip(offsets, offsets[1:])]
+
+def write_snapshot(snapshot_path, source, tweets, memory_report=None, extra=None, random_access=False):
+    """Write tweets to snapshot_path atomically (temp file + rename).
+
+    extra maps more section names to arrays to store after the tweets. random_access
+    stores string offsets in bytes, for MappedTweets.
+    """
+    handle_codes = {}
+    media_offsets = array.array("q", [0])
+    media_urls = []
+    media_types = array.array("b")
+    for tweet in tweets:
+        media_urls.extend(tweet.media)
+        media_types.extend(_MEDIA_TYPE_CODES[media_type] for media_type in tweet.media_types)
+        media_offsets.append(len(media_urls))
+
+    columns = {
+        "timestamp": array.array("q", (tweet.timestamp for tweet in tweets)),
+        "utc_offset": array.array("i", (tweet.utc_offset for tweet in tweets)),
+        "handle_code": array.array("i", (handle_codes.setdefault(tweet.user_handle, len(handle_codes)) for tweet in tweets)),
+        "media_offset": media_offsets,
+        "media_type": media_types,
+    }
+    for name, strings in (("tweet_id", [tweet.tweet_id for tweet in tweets]),
+                          ("text", [tweet.text for tweet in tweets]),
+                          ("handle", list(handle_codes)),
+                          ("media_url", media_urls)):
+        offsets, blob = _pack_strings(strings, byte_offsets=random_access)
+        columns[f"{name}.offsets"] = offsets
+        columns[f"{name}.data"] = array.array("B", blob)
+    columns.update(extra or {})
+
+    sections, position = {}, 0
+    for name, column in columns.items():
+        nbytes = len(column) * column.itemsize
+        sections[name] = [column.typecode, position, nbytes]
+        position = _align8(position + nbytes)
+
+    meta = json.dumps({
+        "version": SNAPSHOT_VERSION,
+        "byteorder": sys.byteorder,
+        "source": source,
+        "count": len(tweets),
+        "sections": sections,
+        "string_offsets": "bytes" if random_access else "characters",
+        "memory_report": memory_report or {},
+    }).encode("utf-8")
+
+    temp_path = f"{snapshot_path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(SNAPSHOT_MAGIC + len(meta).to_bytes(8, "little") + meta)
+        f.write(b"\0" * (_align8(f.tell()) - f.tell()))
+        for column in columns.values():
+            column.tofile(f)
+            f.write(b"\0" * (_align8(f.tell()) - f.tell()))
+    os.replace(temp_path, snapshot_path)
+
+def open_snapshot(snapshot_path, mapped=False):
+    """Return (metadata, raw bytes) of a snapshot, or None if it is missing or unusable here.
+
+    mapped maps the file read-only instead of reading it in, so its pages are shared
+    with every other process mapping it.
+    """
+    try:
+        with open(snapshot_path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if mapped else f.read()
+    except (OSError, ValueError):  # ValueError: mapping an empty file
+        return None
+
+    if data[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+        return None
+    header_end = len(SNAPSHOT_MAGIC) + 8
+    meta_length = int.from_bytes(data[len(SNAPSHOT_MAGIC):header_end], "little")
+    meta = json.loads(data[header_end:header_end + meta_length])
+    if meta["version"] != SNAPSHOT_VERSION or meta["byteorder"] != sys.byteorder:
+        return None
+    meta["base"] = _align8(header_end + meta_length)
+    return meta, data
+
+def snapshot_columns(meta, data):
+    """column(name): a snapshot section as a memoryview of its type, without copying it."""
+    view = memoryview(data)
+    base = meta["base"]
+
+    def column(name):
+        typecode, offset, nbytes = meta["sections"][name]
+        return view[base + offset:base + offset + nbytes].cast(typecode)
+    return column
+
+def snapshot_tweets(meta, data):
+    """Rebuild the Tweet records stored in a snapshot."""
+    column = snapshot_columns(meta, data)
+
+    def strings(name):
+        return _unpack_strings(column(f"{name}.offsets"), column(f"{name}.data"))
+
+    handles = [sys.intern(handle) for handle in strings("handle")]
+    media_urls = strings("media_url")
+    media_types = [_MEDIA_TYPE_NAMES[code] for code in column("media_type").tolist()]
+    media_offsets = column("media_offset").tolist()
+
+    return [
+        Tweet(tweet_id, handles[handle_code], text, timestamp, utc_offset,
+              tuple(media_urls[start:end]), tuple(media_types[start:end]))
+        for tweet_id, handle_code, text, timestamp, utc_offset, start, end in zip(
+            strings("tweet_id"), column("handle_code").tolist(), strings("text"),
+            column("timestamp").tolist(), column("utc_offset").tolist(),
+            media_offsets, media_offsets[1:])
+    ]
+
+class MappedStrings:
+    """Random access to a string column written with byte offsets, decoding one string at a time."""
+
+    def __init__(self, column, name):
+        self.offsets = column(f"{name}.offsets")
+        self.data = column(f"{name}.data")
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return str(self.data[self.offsets[i]:self.offsets[i + 1]], "utf-8", "surrogatepass")
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+class MappedTweets:
+    """The Tweets of a mapped SharedStore file as a read-only sequence.
+
+    A Tweet is built each time one is accessed, so the process holds nothing per tweet
+    and the file's pages are shared with every other process that maps it.
+    """
+
+    def __init__(self, column, count):
+        self.count = count
+        self.handles = [sys.intern(handle) for handle in MappedStrings(column, "handle")]
+        self.tweet_ids = MappedStrings(column, "tweet_id")
+        self.texts = MappedStrings(column, "text")
+        self.media_urls = MappedStrings(column, "media_url")
+        self.handle_codes = column("handle_code")
+        self.timestamps = column("timestamp")
+        self.utc_offsets = column("utc_offset")
+        self.media_offsets = column("media_offset")
+        self.media_types = column("media_type")
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, position):
+        if position < 0:
+            position += self.count
+        if not 0 <= position < self.count:
+            raise IndexError("tweet position out of range")
+        start, end = self.media_offsets[position], self.media_offsets[position + 1]
+        return Tweet(self.tweet_ids[position], self.handles[self.handle_codes[position]], self.texts[position],
+                     self.timestamps[position], self.utc_offsets[position],
+                     tuple(self.media_urls[i] for i in range(start, end)),
+                     tuple(_MEDIA_TYPE_NAMES[code] for code in self.media_types[start:end]))
+
+    def __iter__(self):
+        return (self[position] for position in range(self.count))
+
+def load_profile_tweets(json_path):
+    """Load a profile's tweets and text index, from its snapshot when valid or by parsing the JSON.
+
+    A snapshot of an older version of an append-only file is still used: only the
+    tweets appended since it was written are parsed (and indexed), and the snapshot is
+    refreshed. Returns (tweets, memory report, source, text index), source being the
+    source_fingerprint and source_tail of the file as read.
+    """
+    source = source_fingerprint(json_path)
+    snapshot_path = snapshot_path_for(json_path)
+    snapshot, change = None, "changed"
+    if SNAPSHOTS_ENABLED:
+        try:
+            snapshot = open_snapshot(snapshot_path)
+            if snapshot:
+                change = detect_change(json_path, snapshot[0]["source"])
+        except Exception as e:
+            print(f"Ignoring unreadable snapshot {snapshot_path}: {e}")
+            snapshot, change = None, "changed"
+
+    if change in ("unchanged", "appended"):
+        meta, data = snapshot
+        tweets = snapshot_tweets(meta, data)
+        memory_report = meta["memory_report"]
+        text_index = None
+        if "text.postings" in meta["sections"]:  # Snapshots written before it was stored don't have it
+            text_index = TextIndex.stored(tweets, snapshot_columns(meta, data))
+        del data, snapshot
+        if change == "unchanged":
+            print(f"Using snapshot {snapshot_path}")
+            source.update(prefix_source(meta["source"]))
+            # Touched since the snapshot was written: it's rewritten below with the new mtime,
+            # so the next load doesn't compare the whole file again
+            if text_index is not None and source["mtime_ns"] == meta["source"]["mtime_ns"]:
+                return tweets, memory_report, source, text_index
+        else:
+            new_tweets, _, close_offset = parse_tweets_file(json_path, start_offset=meta["source"]["append_offset"])
+            if text_index is not None:
+                text_index.add(new_tweets, len(tweets))
+            tweets.extend(new_tweets)
+            source.update(source_tail(json_path, close_offset, meta["source"]))
+            print(f"Using snapshot {snapshot_path} plus {len(new_tweets)} appended tweets")
+    else:
+        tweets, memory_report, close_offset = parse_tweets_file(json_path)
+        source.update(source_tail(json_path, close_offset))
+        text_index = None
+
+    if text_index is None:
+        with METRICS.timer("tweetfetch_profile_build_seconds", part="text_index"):
+            text_index = TextIndex(tweets)
+    if SNAPSHOTS_ENABLED:
+        try:
+            write_snapshot(snapshot_path, source, tweets, memory_report, extra=text_index.stored_sections())
+        except Exception as e:  # The tweets are loaded either way; a missing snapshot only costs the next start
+            print(f"Could not write snapshot {snapshot_path}: {e}")
+    return tweets, memory_report, source, text_index
+
+SHARED_STORE_SUFFIX = ".tweetstore"
+SHARED_STORE_KEEP = 2  # Versions kept per profile, so a process that just read the pointer can still open its file
+SHARED_STORE_ATTACH_ATTEMPTS = 3
+LOADER_INTERVAL = 30  # Seconds between checks for changed files in --loader, unless WATCH_INTERVAL is set
+
+class SharedStore:
+    """Processed profiles published by one loader process (`bot.py --loader`) and mapped
+    read-only by any number of bot or shard processes.
+
+    A version of a profile is <name>.<version>.tweetstore: a snapshot with byte string
+    offsets plus the TweetColumns and TextIndex arrays. <name>.current names the newest
+    version and is swapped atomically, so a reader sees one version or the next, never
+    a mix. Files are mapped, not read, so their pages are shared by every process and a
+    process already using an older version keeps it until it reloads, even once removed.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def pointer_path(self, name):
+        return os.path.join(self.root, f"{name}.current")
+
+    def current(self, name):
+        """What <name>.current says ({"version", "file", "source", "count"}), or None if nothing is published."""
+        try:
+            with open(self.pointer_path(name), "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def is_stale(self, name, version):
+        current = self.current(name)
+        return current is not None and current["version"] != version
+
+    def publish(self, data):
+        """Write a loaded profile as a new version and point <name>.current at it. Returns the version."""
+        os.makedirs(self.root, exist_ok=True)
+        current = self.current(data.name)
+        version = current["version"] + 1 if current else 1
+        file_name = f"{data.name}.{version}{SHARED_STORE_SUFFIX}"
+        write_snapshot(os.path.join(self.root, file_name), data.source, data.tweets, data.memory_report,
+                       extra=data.stored_sections(), random_access=True)
+
+        self.write_pointer(data.name, {"version": version, "file": file_name, "source": data.source, "count": len(data.tweets)})
+        self.remove_old(data.name, version)
+        return version
+
+    def write_pointer(self, name, pointer):
+        pointer_path = self.pointer_path(name)
+        with open(f"{pointer_path}.tmp", "w") as f:
+            json.dump(pointer, f)
+        os.replace(f"{pointer_path}.tmp", pointer_path)
+
+    def remove_old(self, name, version):
+        for file_name in os.listdir(self.root):
+            old_version = file_name[len(name) + 1:-len(SHARED_STORE_SUFFIX)]
+            if (file_name.startswith(f"{name}.") and file_name.endswith(SHARED_STORE_SUFFIX)
+                    and old_version.isdigit() and int(old_version) <= version - SHARED_STORE_KEEP):
+                try:
+                    os.remove(os.path.join(self.root, file_name))
+                except OSError:
+                    pass  # Still open somewhere (Windows); the next publish tries again
+
+    def attach(self, name):
+        """Map the current version of a profile. Returns (pointer, metadata, mapping)."""
+        for _ in range(SHARED_STORE_ATTACH_ATTEMPTS):
+            pointer = self.current(name)
+            if pointer is None:
+                raise FileNotFoundError(f"Profile '{name}' isn't published in {self.root} yet (is `bot.py --loader` running?)")
+            snapshot = open_snapshot(os.path.join(self.root, pointer["file"]), mapped=True)
+            if snapshot is not None:
+                return (pointer, *snapshot)
+            # Replaced and removed since the pointer was read; read it again
+        raise OSError(f"Could not open the current version of '{name}' in {self.root}")
+
+SHARED_STORE = SharedStore(SHARED_STORE_DIR) if SHARED_STORE_DIR else None
+
+COLUMNAR = config.get("COLUMNAR", True) and np is not None  # Filters and aggregates over NumPy columns
+
+class ProfileData:
+    """A loaded profile: its tweets plus everything derived from them.
+
+    With COLUMNAR, filters run over TweetColumns and the Python index and time index
+    (index, time_index) aren't built; without it, columns is None. A profile mapped from
+    the SharedStore gets its tweets, columns and text index ready-made and has the
+    store_version it came from.
+    """
+
+    def __init__(self, name, json_path, tweets, memory_report, source, columns=None, text_index=None, store_version=None):
+        self.name = name
+        self.json_path = json_path
+        self.tweets = tweets
+        self.columns, self.index, self.time_index = columns, None, None
+        self.store_version = store_version
+        if columns is None and COLUMNAR:
+            with METRICS.timer("tweetfetch_profile_build_seconds", part="columns"):
+                self.columns = TweetColumns(tweets)
+        if self.columns is None:
+            with METRICS.timer("tweetfetch_profile_build_seconds", part="index"):
+                self.index = build_tweet_index(tweets)
+        with METRICS.timer("tweetfetch_profile_build_seconds", part="stats"):
+            self.stats = TweetStats()
+            self.stats.add(tweets, self.columns)
+        with METRICS.timer("tweetfetch_profile_build_seconds", part="game_pool"):
+            self.game_pool = GamePool(tweets, self.columns)
+        self.text_index = text_index
+        if text_index is None:
+            with METRICS.timer("tweetfetch_profile_build_seconds", part="text_index"):
+                self.text_index = TextIndex(tweets)
+        with METRICS.timer("tweetfetch_profile_build_seconds", part="handles"):
+            self.handles = HandleIndex()
+            self.handles.add_handles(self.columns.handles if self.columns is not None else (tweet.user_handle for tweet in tweets))
+        if self.columns is None:
+            with METRICS.timer("tweetfetch_profile_build_seconds", part="time_index"):
+                self.time_index = TimeIndex(tweets)
+        self.memory_report = memory_report or {}
+        self.source = source
+        self.loaded_at = datetime.datetime.now()
+
+    def file_touched(self):
+        """Cheap check (size and mtime only) for whether the JSON file changed since it was read,
+        or for a mapped profile, whether the loader has published a newer version."""
+        if self.store_version is not None:
+            return SHARED_STORE.is_stale(self.name, self.store_version)
+        stat = os.stat(self.json_path)
+        return stat.st_size != self.source["size"] or stat.st_mtime_ns != self.source["mtime_ns"]
+
+    def refresh(self):
+        """Pull in tweets appended to the file since it was read, without a full rebuild.
+
+        Returns the number of tweets added, or None if the file changed in some other
+        way and needs a full reload. A mapped profile is never extended, only replaced by
+        the newer version.
+        """
+        if self.store_version is not None:
+            return None if self.file_touched() else 0
+        change = detect_change(self.json_path, self.source)
+        if change == "changed":
+            return None
+
+        source = source_fingerprint(self.json_path)
+        new_tweets = []
+        if change == "appended":
+            new_tweets, _, close_offset = parse_tweets_file(self.json_path, start_offset=self.source["append_offset"])
+            self.extend(new_tweets)
+            source.update(source_tail(self.json_path, close_offset, self.source))
+        else:
+            source.update(prefix_source(self.source))
+        self.source = source
+        self.loaded_at = datetime.datetime.now()
+        return len(new_tweets)
+
+    def extend(self, new_tweets):
+        """Append tweets to the cache and every derived structure."""
+        start = len(self.tweets)
+        self.tweets.extend(new_tweets)
+        if self.columns is not None:
+            self.columns.add(new_tweets)
+        else:
+            index_tweets(self.index, new_tweets, start)
+            self.time_index.add(new_tweets, start)
+        self.stats.add(new_tweets, self.columns, start)
+        self.game_pool.add(new_tweets, start)
+        self.text_index.add(new_tweets, start)
+        self.handles.add(new_tweets)
+
+    def stored_sections(self):
+        """What a SharedStore file holds besides the tweets: the columns and text index."""
+        sections = self.text_index.stored_sections()
+        if self.columns is not None:
+            for name in TweetColumns.STORED:
+                column = getattr(self.columns, name)
+                sections[f"columns.{name}"] = array.array(column.dtype.char, column.tobytes())
+        return sections
+
+    def estimated_bytes(self):
+        """Rough resident size: the records, the columns (or one pointer per index entry and
+        20 bytes per time index slot) and 6 bytes per text posting.
+
+        For a mapped profile those are shared pages, so only the game pool and the stats
+        counters (about 200 bytes per handle) count.
+        """
+        if self.store_version is not None:
+            return len(self.game_pool) * 5 + len(self.stats.user_counts) * 200
+        per_tweet = self.memory_report.get("compact_bytes_per_tweet") or 600
+        if self.columns is not None:
+            derived = self.columns.nbytes()
+        else:
+            index_entries = sum(len(positions) for bucket in self.index.values() for positions in bucket.values())
+            derived = index_entries * 8 + len(self.tweets) * 20
+        return per_tweet * len(self.tweets) + derived + self.text_index.entry_count() * 6
+
+class ProfileCache:
+    """Keeps several loaded profiles resident, evicting the least recently used ones
+    once their combined estimated size goes over the memory budget. The profile being
+    requested is never evicted, even if it alone is over budget."""
+
+    def __init__(self, budget_mb):
+        self.budget_bytes = budget_mb * 1024 * 1024
+        self.profiles = collections.OrderedDict()  # name -> ProfileData, least recently used first
+
+    def __contains__(self, name):
+        return name in self.profiles
+
+    def get(self, name):
+        """Return a resident profile (marking it most recently used), or None."""
+        data = self.profiles.get(name)
+        if data is not None:
+            self.profiles.move_to_end(name)
+        return data
+
+    def put(self, data):
+        self.profiles[data.name] = data
+        self.profiles.move_to_end(data.name)
+        self.evict(keep=data.name)
+
+    def evict(self, keep=None):
+        total = sum(profile.estimated_bytes() for profile in self.profiles.values())
+        for name in list(self.profiles):
+            if total <= self.budget_bytes:
+                break
+            if name == keep:
+                continue
+            total -= self.profiles.pop(name).estimated_bytes()
+            QUERY_CACHE.invalidate(name)
+            print(f"Evicted profile '{name}' from the cache.")
+
+    def discard(self, name):
+        self.profiles.pop(name, None)
+        QUERY_CACHE.invalidate(name)
+
+PROFILE_CACHE = ProfileCache(PROFILE_CACHE_MB)
+
+class QueryCache:
+    """LRU cache of filter_tweets results keyed by (profile, media preference, username, year, month, day).
+
+    Results are lazy (QueryResults or ColumnarResults), so an entry is small and keeps its
+    match counts once they have been computed. Entries for a profile are dropped whenever its tweets change.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.results = collections.OrderedDict()  # key -> QueryResult, least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()  # Queries run in worker threads, invalidation on the event loop
+
+    def get(self, key):
+        with self.lock:
+            result = self.results.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.results.move_to_end(key)
+            return result
+
+    def put(self, key, result):
+        if self.max_entries <= 0:
+            return
+        with self.lock:
+            self.results[key] = result
+            self.results.move_to_end(key)
+            while len(self.results) > self.max_entries:
+                self.results.popitem(last=False)
+
+    def invalidate(self, profile_name=None):
+        """Drop the entries of one profile, or everything."""
+        with self.lock:
+            for key in list(self.results):
+                if profile_name is None or key[0] == profile_name:
+                    del self.results[key]
+
+    def summary(self):
+        lookups = self.hits + self.misses
+        rate = f"{self.hits / lookups:.0%}" if lookups else "n/a"
+        return f"{self.hits} hits / {self.misses} misses ({rate}), {len(self.results)}/{self.max_entries} entries"
+
+QUERY_CACHE = QueryCache(config.get("QUERY_CACHE_SIZE", 128))
+METRICS.collect("tweetfetch_query_cache_hits_total", "counter", "Query cache hits", lambda: QUERY_CACHE.hits)
+METRICS.collect("tweetfetch_query_cache_misses_total", "counter", "Query cache misses", lambda: QUERY_CACHE.misses)
+METRICS.collect("tweetfetch_query_cache_entries", "gauge", "Query cache entries", lambda: len(QUERY_CACHE.results))
+METRICS.collect("tweetfetch_profiles_loaded", "gauge", "Profiles resident in the profile cache", lambda: len(PROFILE_CACHE.profiles))
+METRICS.collect("tweetfetch_profile_cache_bytes", "gauge", "Estimated size of the resident profiles",
+                lambda: sum(data.estimated_bytes() for data in PROFILE_CACHE.profiles.values()))
+
+# Seconds between profile file checks (or, for mapped profiles, checks for a newer version), 0 disables the watcher
+WATCH_INTERVAL = config.get("WATCH_INTERVAL", LOADER_INTERVAL if ATTACH_SHARED else 0)
+watcher_task = None
+
+async def watch_profiles():
+    """Poll the files of resident profiles and pull in appended likes automatically."""
+    while True:
+        await asyncio.sleep(WATCH_INTERVAL)
+        for name, data in list(PROFILE_CACHE.profiles.items()):
+            try:
+                if data.file_touched():
+                    await load_tweets_async(name, force_reload=True)
+            except Exception as e:
+                print(f"Error watching profile '{name}': {e}")
+
+def refresh_profiles():
+    """Pick up profile folders added since startup."""
+    for name, json_path in discover_user_folders().items():
+        PROFILES.setdefault(name, json_path)
+
+def profile_scope(ctx):
+    """Key the active profile is tracked under: the guild, or the user in DMs."""
+    return f"guild:{ctx.guild.id}" if ctx.guild else f"user:{ctx.author.id}"
+
+def profile_for(ctx):
+    """Name of the profile active for this command's guild (or DM)."""
+    profile_name = active_profiles.get(profile_scope(ctx), DEFAULT_PROFILE)
+    return profile_name if profile_name in PROFILES else DEFAULT_PROFILE  # Saved before its folder went away
+
+def refresh_resident(data):
+    """Pull tweets appended to a resident profile's file into it.
+
+    Returns False when the file was rewritten and the profile needs a full reload.
+    """
+    started, previous_size = time.perf_counter(), data.source["size"]
+    try:
+        added = data.refresh()
+    except Exception as e:
+        # Most likely the exporter is still writing the file; keep what we have
+        print(f"Error reading new tweets for '{data.name}': {e}")
+        return True
+    return record_refresh(data, added, started, previous_size)
+
+def record_refresh(data, added, started, previous_size):
+    """Metrics and query cache upkeep after data.refresh() returned added. Returns what refresh_resident does."""
+    if added is None:
+        return False
+
+    METRICS.observe("tweetfetch_profile_load_seconds", time.perf_counter() - started, profile=data.name, kind="refresh")
+    METRICS.inc("tweetfetch_tweets_loaded_total", added, profile=data.name)
+    METRICS.inc("tweetfetch_bytes_loaded_total", max(0, data.source["size"] - previous_size), profile=data.name)
+    if added:
+        QUERY_CACHE.invalidate(data.name)
+        print(f"Added {added} new tweets to '{data.name}'.")
+    return True
+
+def attach_profile(profile_name):
+    """ProfileData over the version of a profile currently published in the SharedStore."""
+    pointer, meta, mapping = SHARED_STORE.attach(profile_name)
+    column = snapshot_columns(meta, mapping)
+    tweets = MappedTweets(column, meta["count"])
+    columns = None
+    if np is not None and "columns.local_time" in meta["sections"]:
+        arrays = {name: np.asarray(column(f"columns.{name}")) for name in TweetColumns.STORED}
+        arrays.update(handle_code=np.asarray(column("handle_code")), media_offsets=np.asarray(column("media_offset")))
+        columns = TweetColumns.mapped(tweets.handles, arrays)
+    return ProfileData(profile_name, PROFILES.get(profile_name), tweets, meta["memory_report"], meta["source"],
+                       columns=columns, text_index=TextIndex.mapped(tweets, column), store_version=pointer["version"])
+
+def read_profile(profile_name):
+    """Read a profile's file and build its ProfileData, without touching the caches.
+
+    This is the slow part of a load, and it's safe to run in a worker thread. With a
+    SharedStore the profile is mapped from there instead, which never parses JSON.
+    """
+    if ATTACH_SHARED:
+        started = time.perf_counter()
+        data = attach_profile(profile_name)
+        METRICS.observe("tweetfetch_profile_load_seconds", time.perf_counter() - started, profile=profile_name, kind="attach")
+        print(f"Mapped {len(data.tweets)} tweets of '{profile_name}' (version {data.store_version}) "
+              f"from {SHARED_STORE.root} in {time.perf_counter() - started:.2f}s.")
+        return data
+
+    json_path = PROFILES.get(profile_name)
+    print(f"Loading tweets from {json_path}...")
+    started = time.perf_counter()
+    tweets, memory_report, source, text_index = load_profile_tweets(json_path)
+    data = ProfileData(profile_name, json_path, tweets, memory_report, source, text_index=text_index)
+    METRICS.observe("tweetfetch_profile_load_seconds", time.perf_counter() - started, profile=profile_name, kind="full")
+    METRICS.inc("tweetfetch_tweets_loaded_total", len(tweets), profile=profile_name)
+    METRICS.inc("tweetfetch_bytes_loaded_total", source["size"], profile=profile_name)
+
+    print(f"Loaded {len(tweets)} tweets in {time.perf_counter() - started:.2f}s.")
+    if data.memory_report:
+        print(f"Memory: ~{data.memory_report['raw_bytes_per_tweet']} B/tweet as raw JSON, "
+              f"~{data.memory_report['compact_bytes_per_tweet']} B/tweet compact "
+              f"(~{data.memory_report['estimated_cache_mb']} MB cache).")
+    return data
+
+def install_profile(data):
+    """Make a freshly read profile the resident copy."""
+    PROFILE_CACHE.put(data)
+    QUERY_CACHE.invalidate(data.name)
+
+def load_tweets(profile_name, force_reload=False):
+    """Return the loaded ProfileData for a profile, loading it into the cache if needed.
+
+    force_reload on a resident profile only parses tweets appended since it was read,
+    falling back to a full reload when the file was rewritten. This blocks while it
+    reads; commands use load_tweets_async to keep the bot responsive.
+    """
+    data = PROFILE_CACHE.get(profile_name)
+    METRICS.inc("tweetfetch_profile_cache_requests_total", result="hit" if data is not None else "miss")
+    if data is not None and (not force_reload or refresh_resident(data)):
+        return data
+
+    try:
+        data = read_profile(profile_name)
     except Exception as e:
         print(f"Error loading JSON: {e}")
-        return []
+        return None
+    install_profile(data)
+    return data
+
+warmups = {}  # profile name -> task reading it in a worker thread
+warmup_errors = {}  # profile name -> why its last background load failed
+
+async def _warm_profile(profile_name):
+    try:
+        data = await run_in_worker(read_profile, profile_name, label="load")
+    except Exception as e:
+        print(f"Error loading JSON: {e}")
+        warmup_errors[profile_name] = str(e)
+        return None
+    finally:
+        warmups.pop(profile_name, None)
+    warmup_errors.pop(profile_name, None)
+    install_profile(data)
+    return data
+
+def start_warmup(profile_name):
+    """Start reading a profile in a worker thread, unless that's already happening.
+    Returns the task, whose result is the ProfileData (or None if loading failed)."""
+    task = warmups.get(profile_name)
+    if task is None:
+        task = warmups[profile_name] = asyncio.ensure_future(_warm_profile(profile_name))
+    return task
+
+refreshes = {}  # profile name -> task pulling appended tweets into it in a worker thread
+
+async def _refresh_profile(data):
+    started, previous_size = time.perf_counter(), data.source["size"]
+    try:
+        added = await run_in_worker(data.refresh, label="refresh")
+    except Exception as e:
+        print(f"Error reading new tweets for '{data.name}': {e}")
+        return True
+    finally:
+        refreshes.pop(data.name, None)
+    return record_refresh(data, added, started, previous_size)
+
+def refresh_resident_async(data):
+    """refresh_resident with the file reading in a worker thread and the bookkeeping back
+    on the loop. Concurrent refreshes of a profile share one."""
+    task = refreshes.get(data.name)
+    if task is None:
+        task = refreshes[data.name] = asyncio.ensure_future(_refresh_profile(data))
+    return asyncio.shield(task)
+
+async def load_tweets_async(profile_name, force_reload=False):
+    """load_tweets for use on the event loop: full loads and refreshes run in a worker
+    thread, and everyone asking for the same profile meanwhile waits on that one load."""
+    data = PROFILE_CACHE.get(profile_name)
+    METRICS.inc("tweetfetch_profile_cache_requests_total", result="hit" if data is not None else "miss")
+    if data is not None and (not force_reload or await refresh_resident_async(data)):
+        return data
+    # Shielded so a cancelled command doesn't abort a load other commands are waiting on
+    return await asyncio.shield(start_warmup(profile_name))
+
+def publish_profile(profile_name):
+    """Load a profile (only reading what was appended, once resident) and publish it if
+    the store doesn't have this version of the file yet. A file that hasn't changed since
+    it was published isn't loaded at all."""
+    published = SHARED_STORE.current(profile_name)
+    if published and detect_change(PROFILES[profile_name], published["source"]) == "unchanged":
+        mtime_ns = os.stat(PROFILES[profile_name]).st_mtime_ns
+        if published["source"]["mtime_ns"] != mtime_ns:
+            # Touched but identical: note the new mtime, so the next check doesn't hash the whole file again
+            published["source"]["mtime_ns"] = mtime_ns
+            SHARED_STORE.write_pointer(profile_name, published)
+        return
+    data = load_tweets(profile_name, force_reload=True)
+    if data is None:
+        return
+    if published and all(published["source"].get(key) == data.source[key] for key in ("size", "mtime_ns", "hash", "prefix_hash")):
+        return
+    started = time.perf_counter()
+    version = SHARED_STORE.publish(data)
+    print(f"📦 Published '{profile_name}' version {version} ({len(data.tweets)} tweets) in {time.perf_counter() - started:.2f}s.")
+
+def run_loader():
+    """`bot.py --loader`: keep every profile published in the SharedStore, republishing
+    whenever its file changes, for bot processes to map."""
+    if SHARED_STORE is None:
+        print("❌ --loader needs SHARED_STORE_DIR in config.json.")
+        exit()
+    interval = WATCH_INTERVAL or LOADER_INTERVAL
+    print(f"📦 Publishing profiles to {SHARED_STORE.root}, checking for changes every {interval}s")
+    while True:
+        refresh_profiles()
+        for profile_name in list(PROFILES):
+            try:
+                publish_profile(profile_name)
+            except Exception as e:
+                print(f"Error publishing profile '{profile_name}': {e}")
+        time.sleep(interval)
 
 def clean_media_url(url):
     """Remove query parameters (like ?tag=12) from media URLs."""
@@ -229,47 +2787,537 @@ def parse_date_filters(args):
     username = " ".join(remaining_args) if remaining_args else None
     return username, year, month, day
 
-def filter_tweets(ctx, username=None, year=None, month=None, day=None):
-    """Filter tweets based on username and/or date (year, month, day), respecting user media preferences."""
-    tweets = load_tweets()
-    filtered_tweets = []
+_DATE_BOUND_PATTERN = re.compile(r"^(\d{4})(?:-(\d{1,2}))?(?:-(\d{1,2}))?$")
+_RELATIVE_SPAN_PATTERN = re.compile(r"^(\d+)([dwmy])$")
+RELATIVE_UNIT_DAYS = {"d": 1, "w": 7, "m": 30, "y": 365}
+ORDER_WORDS = ("newest", "oldest")
 
+def date_bound(text, end=False):
+    """Local-time seconds at the start of a YYYY[-MM[-DD]] period, or right after it with end=True.
+    None if text isn't such a date."""
+    match = _DATE_BOUND_PATTERN.match(text)
+    if not match:
+        return None
+    year, month, day = match.groups()
+    try:
+        bound = datetime.datetime(int(year), int(month or 1), int(day or 1))
+        if end:
+            if day:
+                bound += datetime.timedelta(days=1)
+            elif month:
+                bound = (bound.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+            else:
+                bound = bound.replace(year=bound.year + 1)
+    except ValueError:
+        return None
+    return calendar.timegm(bound.timetuple())
+
+def parse_time_filters(args):
+    """Pull date ranges and ordering out of command args.
+
+    Understands `2024-01..2024-03` (either end may be left off), `since 2023-06-01`,
+    `until 2024`, `last 30d` (d/w/m/y) and `newest`/`oldest`. Returns (remaining args,
+    (start, end) in local-time seconds or None, "newest"/"oldest" or None).
+    """
+    start = end = order = None
+    remaining_args = []
+    args = list(args)
+    i = 0
+    while i < len(args):
+        arg = args[i].lower()
+        following = args[i + 1].lower() if i + 1 < len(args) else ""
+        if arg in ORDER_WORDS:
+            order = arg
+        elif ".." in arg:
+            low, high = arg.split("..", 1)
+            low_bound = date_bound(low) if low else None
+            high_bound = date_bound(high, end=True) if high else None
+            if (low and low_bound is None) or (high and high_bound is None):
+                remaining_args.append(args[i])
+            else:
+                start, end = low_bound if low else start, high_bound if high else end
+        elif arg == "since" and date_bound(following) is not None:
+            start = date_bound(following)
+            i += 1
+        elif arg == "until" and date_bound(following) is not None:
+            end = date_bound(following, end=True)
+            i += 1
+        elif arg == "last" and _RELATIVE_SPAN_PATTERN.match(following):
+            count, unit = _RELATIVE_SPAN_PATTERN.match(following).groups()
+            # Whole days, so the same query keeps hitting the query cache during the day
+            today = datetime.datetime.now(datetime.timezone.utc).date()
+            since = today - datetime.timedelta(days=int(count) * RELATIVE_UNIT_DAYS[unit])
+            start = calendar.timegm(since.timetuple())
+            i += 1
+        else:
+            remaining_args.append(args[i])
+        i += 1
+
+    time_range = (start, end) if start is not None or end is not None else None
+    return remaining_args, time_range, order
+
+def split_search_query(args):
+    """Split command args at a `search:` marker into (filter args, search query or None).
+
+    Discord strips the quotes from quoted args, so args containing spaces are quoted
+    again to keep them as phrases.
+    """
+    for i, arg in enumerate(args):
+        if arg.lower().startswith("search:"):
+            terms = [arg[len("search:"):]] + list(args[i + 1:])
+            query = " ".join(f'"{term}"' if " " in term else term for term in terms if term)
+            return args[:i], query or None
+    return args, None
+
+def _has_position(positions, position):
+    """Membership test on an ascending position list."""
+    i = bisect.bisect_left(positions, position)
+    return i < len(positions) and positions[i] == position
+
+def no_match_message(data, text, username, exact=False):
+    """text, plus "did you mean" suggestions when username doesn't match any handle of data.
+
+    exact: the command looked username up as a whole handle rather than as part of one.
+    """
+    if not username or not data:
+        return text
+    if exact:
+        if username.lower() in data.handles.names:
+            return text
+    elif data.handles.containing(username):
+        return text
+    suggestions = data.handles.suggestions(username)
+    if not suggestions:
+        return text
+    return f"{text} Did you mean {', '.join(f'`{handle}`' for handle in suggestions)}?"
+
+def _merge_positions(position_lists):
+    """Union of index buckets. Buckets from the same index level never overlap."""
+    if len(position_lists) == 1:
+        return position_lists[0]
+    return sorted(position for positions in position_lists for position in positions)
+
+class QueryResult:
+    """Lazy result of filter_tweets: matches are found on demand instead of collected up front.
+
+    A match is a position present in every candidate list. The shortest list drives the walk
+    and the others are probed by bisection, so the result only holds references to index
+    buckets and never copies them. Iterating yields (Tweet, media) pairs like the old list did.
+    """
+
+    def __init__(self, tweets, candidates, preference, ordered=False):
+        # ordered: the first candidate sets the order of the results (e.g. a TimeSlice), so it drives
+        if not ordered:
+            candidates = sorted(candidates, key=len)
+        self.tweets = tweets
+        self.driver = candidates[0]
+        self.others = candidates[1:]
+        # Buckets only ever grow at the end on an incremental reload; stick to what existed now
+        self.limit = len(self.driver)
+        self.preference = preference
+        self._count = None
+        self._media_count = None
+
+    def is_match(self, i):
+        position = self.driver[i]
+        return all(_has_position(other, position) for other in self.others)
+
+    def pair(self, i):
+        tweet = self.tweets[self.driver[i]]
+        return tweet, tweet.media_for(self.preference)
+
+    def positions(self):
+        for i in range(self.limit):
+            if not i & 0x3FF:
+                check_cancelled()
+            if not self.others or self.is_match(i):
+                yield self.driver[i]
+
+    def __iter__(self):
+        for position in self.positions():
+            tweet = self.tweets[position]
+            yield tweet, tweet.media_for(self.preference)
+
+    def __len__(self):
+        if self._count is None:
+            if not self.others:
+                self._count = self.limit
+            else:
+                self._count = sum(1 for _ in self.positions())
+        return self._count
+
+    def media_count(self):
+        """Total media across all matches, counted without keeping the matches."""
+        if self._media_count is None:
+            self._media_count = sum(len(media) for _, media in self)
+        return self._media_count
+
+    def cursor(self):
+        return ResultCursor(self)
+
+class ResultCursor:
+    """Random access into a QueryResult for slideshows, walking from the nearest known match."""
+
+    def __init__(self, result):
+        self.result = result
+        self.number = -1  # Match number the cursor is on
+        self.i = -1       # Its slot in the driver list
+
+    def seek(self, number):
+        """Return the (Tweet, media) pair of the given match number."""
+        result = self.result
+        if not result.others:  # Every slot matches, no walking needed
+            return result.pair(number)
+
+        total = len(result)
+        # Start from whichever of the beginning, the current match or the end is closest
+        if number + 1 < abs(number - self.number):
+            self.number, self.i = -1, -1
+        if total - number < abs(number - self.number):
+            self.number, self.i = total, result.limit
+
+        while self.number < number:
+            self.i += 1
+            if result.is_match(self.i):
+                self.number += 1
+        while self.number > number:
+            self.i -= 1
+            if result.is_match(self.i):
+                self.number -= 1
+        return result.pair(self.i)
+
+class ColumnarResult:
+    """Lazy result of a columnar query, used like a QueryResult.
+
+    It keeps the columns as they were (a ColumnArrays), the resolved ColumnFilter and the
+    span of slots to walk: positions in cache order, or slots of time_order for order
+    "newest"/"oldest", narrowed to the time range by bisection. Matches are found BLOCK
+    slots at a time and only the number per block is kept, so a cached result stays
+    small however many tweets match.
+    """
+
+    BLOCK = 1 << 16
+
+    def __init__(self, tweets, arrays, match, preference, time_range=None, order=None):
+        self.tweets = tweets
+        self.arrays = arrays
+        self.match = match
+        self.preference = preference
+        self.order = order
+        self.start, self.end = 0, len(arrays.local_time)
+        if order and time_range:
+            times, time_order = arrays.local_time, arrays.time_order
+            slots = range(self.end)
+            start, end = time_range
+            if start is not None:
+                self.start = bisect.bisect_left(slots, start, key=lambda slot: times[time_order[slot]])
+            if end is not None:
+                self.end = max(self.start, bisect.bisect_left(slots, end, key=lambda slot: times[time_order[slot]]))
+        self.blocks = -(-(self.end - self.start) // self.BLOCK)
+        self._offsets = None
+        self._media_count = None
+
+    def block(self, b):
+        """Matching positions of block b (counted in result order), in result order."""
+        if self.order == "newest":
+            b = self.blocks - 1 - b
+        lo = self.start + b * self.BLOCK
+        hi = min(lo + self.BLOCK, self.end)
+        if not self.order:
+            return lo + np.flatnonzero(self.match.mask(self.arrays, slice(lo, hi)))
+        positions = self.arrays.time_order[lo:hi]
+        positions = positions[self.match.mask(self.arrays, positions)]
+        return positions[::-1] if self.order == "newest" else positions
+
+    def offsets(self):
+        """Match number each block starts at, plus the total at the end."""
+        if self._offsets is None:
+            offsets = [0]
+            for b in range(self.blocks):
+                check_cancelled()
+                offsets.append(offsets[-1] + len(self.block(b)))
+            self._offsets = offsets
+        return self._offsets
+
+    def positions(self):
+        for b in range(self.blocks):
+            check_cancelled()
+            yield from self.block(b).tolist()
+
+    def __iter__(self):
+        for position in self.positions():
+            tweet = self.tweets[position]
+            yield tweet, tweet.media_for(self.preference)
+
+    def __len__(self):
+        return self.offsets()[-1]
+
+    def media_count(self):
+        """Total media across all matches, counted without keeping the matches."""
+        if self._media_count is None:
+            self._media_count = sum(len(media) for _, media in self)
+        return self._media_count
+
+    def cursor(self):
+        return ColumnarCursor(self)
+
+class ColumnarCursor:
+    """Random access into a ColumnarResult, holding the matches of one block at a time."""
+
+    def __init__(self, result):
+        self.result = result
+        self.first = 0     # Match number of matches[0]
+        self.matches = ()  # Matching positions of the current block
+
+    def seek(self, number):
+        """Return the (Tweet, media) pair of the given match number."""
+        result = self.result
+        if not self.first <= number < self.first + len(self.matches):
+            offsets = result.offsets()
+            b = bisect.bisect_right(offsets, number) - 1
+            self.first, self.matches = offsets[b], result.block(b)
+        tweet = result.tweets[int(self.matches[number - self.first])]
+        return tweet, tweet.media_for(result.preference)
+
+def _date_positions(index, year=None, month=None, day=None):
+    """Resolve a (possibly partial) date filter to cache positions."""
+    if year and month and day:
+        return index["day"].get(f"{year}-{month}-{day}", [])
+    if year and month:
+        return index["month"].get(f"{year}-{month}", [])
+    if year and not day:
+        return index["year"].get(year, [])
+
+    # Month and/or day without the enclosing year/month: union the matching day buckets
+    matching = []
+    for key, positions in index["day"].items():
+        key_year, key_month, key_day = key.split("-")
+        if (not year or year == key_year) and (not month or month == key_month) and (not day or day == key_day):
+            matching.append(positions)
+    return _merge_positions(matching) if matching else []
+
+def filter_tweets(ctx, username=None, year=None, month=None, day=None, search=None, time_range=None, order=None, data=None):
+    """Filter tweets based on username, date (year, month, day), a time range and/or a text search, respecting user media preferences.
+
+    Returns a lazy QueryResult (or ColumnarResult) of (Tweet, media) pairs, where media only holds URLs matching the preference.
+    They come in cache order, or by time when order is "newest" or "oldest". Commands pass the
+    profile's data, loaded on the event loop; without it the profile is loaded here (blocking).
+    """
+    if data is None:
+        data = load_tweets(profile_for(ctx))
+    if not data:
+        return QueryResult([], [[]], "all")
+    with METRICS.timer("tweetfetch_filter_seconds", kind="filter"):
+        return _filter_tweets(ctx, data.name, data, username, year, month, day, search, time_range, order)
+
+def _filter_tweets(ctx, profile_name, data, username, year, month, day, search, time_range, order):
     # Get user preference (default to "all")
     user_preference = user_media_preferences.get(str(ctx.author.id), "all") # Ensure ID is string for JSON compatibility
 
-    for tweet in tweets:
-        tweet_username = tweet.get("user_handle", "")
-        tweet_text = tweet.get("tweet_content", "")
-        
-        # Use pre-parsed dates
-        tweet_year = tweet.get("parsed_year")
-        tweet_month = tweet.get("parsed_month")
-        tweet_day = tweet.get("parsed_day")
-
-        # Filter media based on user preference
-        if user_preference != "all":
-            media = [clean_media_url(url) for url in tweet.get("tweet_media_urls", []) if url.lower().startswith("https") and url.lower().split("?")[0].endswith(user_preference)]
+    cache_key = (profile_name, user_preference, username and username.lower(), year, month, day, search, time_range, order)
+    cached = QUERY_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+
+    if data.columns is not None:
+        result = _columnar_query(data, user_preference, username, year, month, day, search, time_range, order)
+    else:
+        result = _indexed_query(data, user_preference, username, year, month, day, search, time_range, order)
+    QUERY_CACHE.put(cache_key, result)
+    return result
+
+def _columnar_query(data, user_preference, username, year, month, day, search, time_range, order):
+    """The query as array masks, applied a block at a time as the ColumnarResult is read."""
+    handle_keys = data.handles.containing(username) if username else None
+    search_positions = data.text_index.matching_positions(search) if search else None
+    columns = data.columns
+    match = ColumnFilter(columns, user_preference, handle_keys, year, month, day, search_positions, time_range)
+    return ColumnarResult(data.tweets, columns.arrays, match, user_preference, time_range, order)
+
+def _indexed_query(data, user_preference, username, year, month, day, search, time_range, order):
+    """The query as intersected index buckets, walked lazily by the QueryResult."""
+    tweets, index = data.tweets, data.index
+    candidates = [index["media"].get(user_preference, [])]
+
+    if username:
+        handle_matches = [index["handle"][handle] for handle in data.handles.containing(username)]
+        candidates.append(_merge_positions(handle_matches) if handle_matches else [])
+
+    if year or month or day:
+        candidates.append(_date_positions(index, year, month, day))
+
+    if search:
+        candidates.append(data.text_index.matching_positions(search))
+
+    if order:
+        newest_first = order == "newest"
+        timeline = data.time_index.ordered(time_range, newest_first)
+        smallest = min(len(positions) for positions in candidates)
+        if smallest * 8 < len(timeline):
+            # Few matches: sort those by time instead of walking the whole timeline
+            time_index = data.time_index
+            matches = [position for position in QueryResult(tweets, candidates, user_preference).positions()
+                       if time_index.in_range(position, time_range)]
+            matches.sort(key=lambda position: (time_index.times[position], position), reverse=newest_first)
+            candidates = [matches]
         else:
-            media = [clean_media_url(url) for url in tweet.get("tweet_media_urls", [])]
-
-        tweet_id = tweet.get("tweet_id", "")
-
-        if media and (
-            (not username or username.lower() in tweet_username.lower()) and
-            (not year or year == tweet_year) and
-            (not month or month == tweet_month) and
-            (not day or day == tweet_day)
-        ):
-            filtered_tweets.append({
-                "username": tweet_username,
-                "created_at": tweet.get("tweet_created_at", ""),
-                "text": tweet_text,
-                "media": media,
-                "tweet_id": tweet_id
-            })
+            candidates.insert(0, timeline)
+    elif time_range:
+        candidates.append(data.time_index.positions_between(time_range))
+
+    # Media is already cleaned and tagged, so a match is just (tweet, media for this preference)
+    return QueryResult(tweets, candidates, user_preference, ordered=bool(order))
+
+
+METRICS_PORT = config.get("METRICS_PORT", 0)  # Local port serving /metrics, 0 disables it
+METRICS_FILE = config.get("METRICS_FILE")  # Prometheus text file (e.g. for node_exporter's textfile collector)
+METRICS_FILE_INTERVAL = 15
+metrics_runner = None
+metrics_file_task = None
+
+async def handle_metrics(request):
+    return web.Response(text=METRICS.render_prometheus(), content_type="text/plain", charset="utf-8")
+
+async def start_metrics_server():
+    """Serve /metrics on localhost for Prometheus to scrape."""
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", METRICS_PORT).start()
+    return runner
+
+def write_metrics_file():
+    temp_path = METRICS_FILE + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(METRICS.render_prometheus())
+    os.replace(temp_path, METRICS_FILE)  # Atomic, so a scrape never reads half a file
+
+async def write_metrics_periodically():
+    while True:
+        try:
+            write_metrics_file()
+        except OSError as e:
+            print(f"Error writing metrics file: {e}")
+        await asyncio.sleep(METRICS_FILE_INTERVAL)
 
-    return filtered_tweets
+# Commands that read a profile's tweets; the rest work while profiles are still loading
+DATA_COMMANDS = frozenset(("compile", "richcompile", "search", "stats", "game"))
 
+class WarmingUp(commands.CheckFailure):
+    """Raised by profile_ready once it has told the user why the command can't run yet."""
+
+@bot.check
+async def profile_ready(ctx):
+    """Reply "warming up" instead of blocking the bot while a command's profile loads."""
+    if ctx.command.name not in DATA_COMMANDS:
+        return True
+    profile_name = profile_for(ctx)
+    if profile_name in PROFILE_CACHE:
+        return True
+    if profile_name in warmup_errors and profile_name not in warmups:
+        # Report the failure once; the next command tries loading again
+        await ctx.send(f"❌ Could not load profile `{profile_name}`: {warmup_errors.pop(profile_name)}")
+        raise WarmingUp()
+    start_warmup(profile_name)
+    await ctx.send(f"⏳ Warming up: profile `{profile_name}` is still loading. Try again in a few seconds!")
+    raise WarmingUp()
+
+@bot.event
+async def on_command_error(ctx, error):
+    if isinstance(error, WarmingUp):
+        return
+    await commands.Bot.on_command_error(bot, ctx, error)  # Default handling (log it)
+
+async def warm_up_default_profile():
+    """Runs before the gateway connects: start loading the default profile in the
+    background, so going online doesn't wait for it however big the archive is."""
+    global lag_monitor_task
+    start_warmup(DEFAULT_PROFILE)
+    if lag_monitor_task is None:
+        lag_monitor_task = asyncio.create_task(monitor_event_loop_lag())
+
+bot.setup_hook = warm_up_default_profile
+
+LAG_CHECK_INTERVAL = 0.25  # Seconds between event loop lag probes
+LAG_WARN_SECONDS = config.get("LAG_WARN_SECONDS", 0.5)  # Log when the loop was blocked at least this long
+active_commands = {}  # id(ctx) -> (description, started)
+recent_commands = collections.deque(maxlen=50)  # (description, started, finished)
+lag_monitor_task = None
+
+def describe_command(ctx):
+    return f".{ctx.command.qualified_name} by {ctx.author} in #{getattr(ctx.channel, 'name', ctx.channel.id)}"
+
+def commands_between(started, finished):
+    """Commands that were running at some point between two perf_counter times."""
+    running = [(description, since, None) for description, since in active_commands.values()]
+    return [description for description, since, until in list(recent_commands) + running
+            if since <= finished and (until is None or until >= started)]
+
+async def monitor_event_loop_lag():
+    """Probe how late the loop wakes up; a late wake-up means something blocked it."""
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(LAG_CHECK_INTERVAL)
+        finished = time.perf_counter()
+        lag = max(0.0, finished - started - LAG_CHECK_INTERVAL)
+        METRICS.observe("tweetfetch_event_loop_lag_seconds", lag)
+        if lag >= LAG_WARN_SECONDS:
+            culprits = commands_between(started, finished)
+            print(f"⚠️ Event loop blocked for {lag:.2f}s, during: {', '.join(culprits) if culprits else 'no command (background task or button)'}")
+
+@bot.before_invoke
+async def start_command_timer(ctx):
+    ctx.perf_started = time.perf_counter()
+    active_commands[id(ctx)] = (describe_command(ctx), ctx.perf_started)
+
+@bot.after_invoke
+async def record_command_time(ctx):
+    started = getattr(ctx, "perf_started", None)
+    if started is not None:
+        finished = time.perf_counter()
+        METRICS.observe("tweetfetch_command_seconds", finished - started,
+                        command=ctx.command.qualified_name, outcome="error" if ctx.command_failed else "ok")
+        description, _ = active_commands.pop(id(ctx), (describe_command(ctx), started))
+        recent_commands.append((description, started, finished))
+
+def prepared_query(ctx, data, username, year, month, day, search, time_range, order, count_media):
+    """filter_tweets plus the counting passes the menu needs, so all of it runs in the worker."""
+    result = filter_tweets(ctx, username, year, month, day, search=search, time_range=time_range, order=order, data=data)
+    len(result)
+    if count_media:
+        result.media_count()
+    return result
+
+@bot.event
+async def on_ready():
+    global watcher_task, metrics_runner, metrics_file_task, link_cache_task, media_index_task, state_task
+    print(f"✅ Logged in as {bot.user}")
+    if state_task is None:
+        state_task = asyncio.create_task(STATE.flush_periodically(STATE_FLUSH_INTERVAL))
+    if WATCH_INTERVAL and watcher_task is None:
+        watcher_task = asyncio.create_task(watch_profiles())
+        print(f"👀 Watching profile files every {WATCH_INTERVAL}s")
+    if METRICS_PORT and metrics_runner is None:
+        try:
+            metrics_runner = await start_metrics_server()
+            print(f"📈 Serving metrics on http://127.0.0.1:{METRICS_PORT}/metrics")
+        except OSError as e:
+            print(f"Error starting metrics server: {e}")
+    if METRICS_FILE and metrics_file_task is None:
+        metrics_file_task = asyncio.create_task(write_metrics_periodically())
+        print(f"📈 Writing metrics to {METRICS_FILE} every {METRICS_FILE_INTERVAL}s")
+    if LINKS.enabled and link_cache_task is None:
+        link_cache_task = asyncio.create_task(LINKS.save_periodically())
+        print(f"🔗 Checking media links ({len(LINKS.results)} cached in {LINKS.cache_file})")
+    if MEDIA_STORE.enabled and media_index_task is None:
+        media_index_task = asyncio.create_task(MEDIA_STORE.save_periodically())
+        print(f"🗄️ Caching media in {MEDIA_STORE.root} ({MEDIA_STORE.summary()})")
+
+async def shutdown():
+    """Close the HTTP sessions opened outside discord.py. Runs from TweetFetchBot.close."""
+    for client in (OUTBOUND, LINKS, MEDIA_STORE):
+        await client.close()
 
 @bot.command()
 async def set(ctx, media_type: str = None):
@@ -280,64 +3328,165 @@ async def set(ctx, media_type: str = None):
         await ctx.send("Invalid media type. Choose from: `all`, `mp4`, `jpg`, `png`.")
         return
 
-    user_media_preferences[str(ctx.author.id)] = media_type.lower() # Store as string key
-    save_user_prefs()
+    STATE.put("user_prefs", str(ctx.author.id), media_type.lower()) # Store as string key
     await ctx.send(f"✅ **Preference set!** Now only fetching `{media_type.upper()}` files for `.compile` and `.richcompile`.")
 
 @bot.command()
 async def reload(ctx):
     """Reloads the tweets from the JSON file."""
-    load_tweets(force_reload=True)
-    await ctx.send(f"✅ **Reloaded!** Currently using profile: `{ACTIVE_PROFILE}` ({len(TWEET_CACHE)} tweets).")
+    profile_name = profile_for(ctx)
+    resident = PROFILE_CACHE.get(profile_name)
+    previous_count = len(resident.tweets) if resident else None
+
+    if profile_name in warmups:
+        await ctx.send(f"⏳ Profile `{profile_name}` is still warming up, it will be current once it's loaded.")
+        return
+
+    data = await load_tweets_async(profile_name, force_reload=True)
+    tweet_count = len(data.tweets) if data else 0
+    if data is resident and previous_count is not None:
+        await ctx.send(f"✅ **Reloaded!** Currently using profile: `{profile_name}` ({tweet_count} tweets, {tweet_count - previous_count} new).")
+    else:
+        await ctx.send(f"✅ **Reloaded!** Currently using profile: `{profile_name}` ({tweet_count} tweets).")
 
 @bot.command()
 async def profile(ctx, profile_name: str = None):
-    """Switches the active tweet profile (JSON file)."""
-    global CURRENT_JSON_PATH, ACTIVE_PROFILE
-    
+    """Switches the tweet profile (JSON file) used in this server."""
+    current = profile_for(ctx)
+
     if not profile_name:
-        await ctx.send(f"Current profile: `{ACTIVE_PROFILE}`\nPath: `{CURRENT_JSON_PATH}`\nAvailable profiles: {', '.join(PROFILES.keys())}")
+        available = ", ".join(f"{name} (loaded)" if name in PROFILE_CACHE else name for name in PROFILES)
+        await ctx.send(f"Current profile: `{current}`\nPath: `{PROFILES.get(current)}`\nAvailable profiles: {available}")
         return
 
+    if profile_name not in PROFILES:
+        refresh_profiles()
     if profile_name not in PROFILES:
         await ctx.send(f"❌ Profile `{profile_name}` not found. Available: {', '.join(PROFILES.keys())}")
         return
 
-    ACTIVE_PROFILE = profile_name
-    CURRENT_JSON_PATH = PROFILES[profile_name]
-    load_tweets(force_reload=True)
-    await ctx.send(f"✅ Switched to profile `{profile_name}`! Loaded {len(TWEET_CACHE)} tweets.")
+    was_loaded = profile_name in PROFILE_CACHE
+    if not was_loaded:
+        await ctx.send(f"⏳ Loading profile `{profile_name}`...")
+    data = await load_tweets_async(profile_name)
+    if not data:
+        await ctx.send(f"❌ Could not load profile `{profile_name}`.")
+        return
+
+    STATE.put("profiles", profile_scope(ctx), profile_name)
+    if was_loaded:
+        await ctx.send(f"✅ Switched to profile `{profile_name}`! ({len(data.tweets)} tweets, already loaded)")
+    else:
+        await ctx.send(f"✅ Switched to profile `{profile_name}`! Loaded {len(data.tweets)} tweets.")
 
 
 @bot.command()
 async def stop(ctx):
     """Allows the user to manually stop ongoing processes like .compile and .game."""
-    if ctx.author.id in abort_flag:
-        abort_flag[ctx.author.id] = True
+    # Background link checks and downloads for what's being stopped
+    LINKS.cancel_user(ctx.author.id)
+    MEDIA_STORE.cancel_user(ctx.author.id)
+    # Deliveries, plus any query of theirs still running in the worker pool
+    if DELIVERIES.cancel_user(ctx.author.id) + cancel_user_work(ctx.author.id):
         await ctx.send("⛔ **Process aborted.**")
     else:
         await ctx.send("⚠ No active process to stop.")
 
 
+@bot.command()
+async def queue(ctx):
+    """Shows the caller's pending "All at once" deliveries."""
+    jobs = DELIVERIES.user_jobs(ctx.author.id)
+    if not jobs:
+        await ctx.send("You have no deliveries in progress.")
+        return
+
+    lines = []
+    for number, job in enumerate(jobs, start=1):
+        position = DELIVERIES.queue_position(job)
+        status = "sending" if not position else f"waiting (position {position})"
+        lines.append(f"{number}. <#{job.channel_id}> - {status}, {job.sent} messages sent")
+    await ctx.send("\n".join(lines))
+
+
 @bot.command()
 async def ping(ctx):
     """Responds with Pong! and the bot's latency."""
     latency = round(bot.latency * 1000)  # Convert to milliseconds
     await ctx.send(f"Pong! 🏓 {latency}ms")
 
+def format_latency(seconds):
+    if seconds is None:
+        return "-"
+    if seconds == math.inf:
+        return f">{LATENCY_BUCKETS[-1]}s"
+    return f"≤{seconds * 1000:g}ms" if seconds < 1 else f"≤{seconds:g}s"
+
+def latency_summary(name, label):
+    """One line per label value: count, p50 and p95 (bucket upper bounds) and mean."""
+    lines = []
+    for labels, histogram in sorted(METRICS.histograms.get(name, {}).items()):
+        value = dict(labels).get(label, "all")
+        lines.append(f"`{value}` ×{histogram.count}: p50 {format_latency(histogram.quantile(0.5))}, "
+                     f"p95 {format_latency(histogram.quantile(0.95))}, avg {histogram.sum / histogram.count * 1000:.0f}ms")
+    return "\n".join(lines[:15]) or "No data yet."
+
+@bot.command()
+@commands.is_owner()
+async def perf(ctx):
+    """Owner-only: latency histograms, load volumes, queue depth and cache hit rates."""
+    embed = discord.Embed(title="📈 Performance", color=discord.Color.blue())
+    embed.add_field(name="Commands", value=latency_summary("tweetfetch_command_seconds", "command"), inline=False)
+    embed.add_field(name="Profile loads", value=latency_summary("tweetfetch_profile_load_seconds", "kind"), inline=False)
+    embed.add_field(name="Filtering", value=latency_summary("tweetfetch_filter_seconds", "kind"), inline=False)
+    embed.add_field(name="Sends", value=latency_summary("tweetfetch_send_seconds", "none"), inline=False)
+    embed.add_field(name="Worker pool", value=latency_summary("tweetfetch_worker_seconds", "job"), inline=False)
+    embed.add_field(name="Event loop lag", value=latency_summary("tweetfetch_event_loop_lag_seconds", "none"), inline=False)
+
+    tweets_loaded = sum(METRICS.counters["tweetfetch_tweets_loaded_total"].values())
+    bytes_loaded = sum(METRICS.counters["tweetfetch_bytes_loaded_total"].values())
+    profile_requests = METRICS.counters["tweetfetch_profile_cache_requests_total"]
+    profile_hits = profile_requests[(("result", "hit"),)]
+    profile_total = profile_hits + profile_requests[(("result", "miss"),)]
+    profile_rate = f"{profile_hits / profile_total:.0%}" if profile_total else "n/a"
+    embed.add_field(name="Loaded", value=f"{tweets_loaded:,.0f} tweets, {bytes_loaded / 1e6:,.1f} MB", inline=True)
+    embed.add_field(name="Send queue", value=f"{OUTBOUND.pending} messages, {DELIVERIES.active} sending / {len(DELIVERIES.waiting)} waiting, "
+                                             f"{METRICS.counters['tweetfetch_rate_limited_total'][()]:.0f} rate limited", inline=True)
+    caches = f"Profiles: {profile_rate} hits, {len(PROFILE_CACHE.profiles)} loaded\nQueries: {QUERY_CACHE.summary()}"
+    if LINKS.enabled:
+        caches += f"\nMedia links: {len(LINKS.results)} checked, {LINKS.dead_count()} dead"
+    if MEDIA_STORE.enabled:
+        caches += f"\nMedia files: {MEDIA_STORE.summary()}"
+    embed.add_field(name="Caches", value=caches, inline=False)
+    await ctx.send(embed=embed)
+
+@perf.error
+async def perf_error(ctx, error):
+    if isinstance(error, commands.NotOwner):
+        await ctx.send("⛔ `.perf` is only available to the bot owner.")
+    else:
+        raise error
+
 @bot.command()
 async def compile(ctx, *args):
-    """Fetch tweets by username and/or date (year, month, day)."""
-    abort_flag[ctx.author.id] = False
+    """Fetch tweets by username and/or date (year, month, day), optionally narrowed with `search: <query>`."""
 
+    args, search_query = split_search_query(args)
+    args, time_range, order = parse_time_filters(args)
     username, year, month, day = parse_date_filters(args)
-    filtered_tweets = filter_tweets(ctx, username, year, month, day)
+    data = await load_tweets_async(profile_for(ctx))
+    try:
+        filtered_tweets = await run_in_worker(prepared_query, ctx, data, username, year, month, day, search_query, time_range, order, True,
+                                              owner=ctx.author.id, timeout=WORKER_TIMEOUT)
+    except asyncio.TimeoutError:
+        await ctx.send("⌛ That query took too long, try narrowing it down.")
+        return
 
     if not filtered_tweets:
-        await ctx.send("No matching media found.")
+        await ctx.send(no_match_message(data, "No matching media found.", username))
         return
 
-    total_results = sum(len(tweet["media"]) for tweet in filtered_tweets)
+    total_results = filtered_tweets.media_count()
     
     view = MenuView(ctx, filtered_tweets, mode="normal")
     await ctx.send(f"Found **{total_results}** media results. Choose an option:", view=view)
@@ -398,7 +3547,11 @@ class PaginationView(discord.ui.View):
 
     async def update_view(self, interaction):
         embed = self.embed_factory(self.current_page)
-        await interaction.response.edit_message(embed=embed, view=self)
+        if MEDIA_STORE.enabled:
+            files = await attach_media([embed], wait=MEDIA_SLIDESHOW_WAIT)
+            await interaction.response.edit_message(embed=embed, attachments=discord_files(files), view=self)
+        else:
+            await interaction.response.edit_message(embed=embed, view=self)
 
     @discord.ui.button(label="<<", style=discord.ButtonStyle.grey)
     async def first_page(self, interaction: discord.Interaction, button: discord.ui.Button):
@@ -435,172 +3588,1006 @@ class PaginationView(discord.ui.View):
 
 
 
-async def send_all(ctx, filtered_tweets):
-    """Sends all media results at once."""
-    for tweet in filtered_tweets:
-        if abort_flag[ctx.author.id]:
-            await ctx.send("Processing stopped.")
+DISCORD_API_BASE = config.get("DISCORD_API_BASE", "https://discord.com/api/v10")
+MAX_EMBEDS_PER_MESSAGE = 10  # Discord's limits for a single message
+MAX_EMBED_CHARS_PER_MESSAGE = 6000
+
+class RateLimitedSender:
+    """Posts messages through the REST API for the "All at once" modes.
+
+    Each channel is paced by the X-RateLimit-* headers Discord returns (and retry_after
+    on a 429) rather than fixed sleeps, and consecutive embeds are packed up to
+    Discord's per-message limits. A server error is retried SERVER_ERROR_RETRIES times,
+    with a growing wait, before the message is given up on. api_base can point at a
+    local mock API for testing.
+    """
+
+    SERVER_ERROR_RETRIES = 3
+    SERVER_ERROR_BACKOFF = 1.0  # Seconds before the first retry, doubling after each
+
+    def __init__(self, token, api_base=DISCORD_API_BASE):
+        self.token = token
+        self.api_base = api_base.rstrip("/")
+        self.session = None
+        self.buckets = {}  # channel id -> (remaining, monotonic time the bucket resets)
+        self.locks = {}  # channel id -> asyncio.Lock, keeps a channel's messages in order
+        self.global_reset = 0.0
+        self.pending = 0  # Messages waiting for their turn
+
+    async def _get_session(self):
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(headers={
+                "Authorization": f"Bot {self.token}",
+                "User-Agent": "DiscordBot (TweetFetch, 1.0)",
+            })
+        return self.session
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+    async def _wait_for_bucket(self, channel_id):
+        now = time.monotonic()
+        remaining, reset_at = self.buckets.get(channel_id, (1, 0.0))
+        wait = max(self.global_reset - now, reset_at - now if remaining <= 0 else 0)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def _update_bucket(self, channel_id, headers):
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset_after = headers.get("X-RateLimit-Reset-After")
+        if remaining is not None and reset_after is not None:
+            self.buckets[channel_id] = (int(remaining), time.monotonic() + float(reset_after))
+
+    @staticmethod
+    async def _json(response):
+        """The response body as a JSON object, or {} if it isn't one (e.g. a proxy's HTML error page)."""
+        try:
+            body = await response.json(content_type=None)
+        except ValueError:
+            return {}
+        return body if isinstance(body, dict) else {}
+
+    @staticmethod
+    def _retry_after(body, headers):
+        """Seconds a 429 asks to wait: retry_after from the body, else the Retry-After or
+        X-RateLimit-Reset-After header, else 1."""
+        for value in (body.get("retry_after"), headers.get("Retry-After"), headers.get("X-RateLimit-Reset-After")):
+            try:
+                return max(float(value), 0.0)
+            except (TypeError, ValueError):  # Missing, or an HTTP date
+                continue
+        return 1.0
+
+    @staticmethod
+    def _body(payload, files):
+        """Request arguments: plain JSON, or multipart when there are files to upload."""
+        if not files:
+            return {"json": payload}
+        form = aiohttp.FormData()
+        attachments = [{"id": index, "filename": filename} for index, (filename, _) in enumerate(files)]
+        form.add_field("payload_json", json.dumps(dict(payload, attachments=attachments)), content_type="application/json")
+        for index, (filename, data) in enumerate(files):
+            form.add_field(f"files[{index}]", data, filename=filename, content_type="application/octet-stream")
+        return {"data": form}
+
+    async def send(self, channel_id, content=None, embeds=None, files=None):
+        """Post one message (content and/or up to 10 embed dicts, plus (filename, bytes)
+        files to attach), waiting out rate limits. Returns None if Discord refused it."""
+        payload = {}
+        if content:
+            payload["content"] = content
+        if embeds:
+            payload["embeds"] = embeds
+
+        session = await self._get_session()
+        url = f"{self.api_base}/channels/{channel_id}/messages"
+        lock = self.locks.setdefault(channel_id, asyncio.Lock())
+        self.pending += 1
+        started = time.perf_counter()
+        server_errors = 0
+        try:
+            async with lock:
+                while True:
+                    await self._wait_for_bucket(channel_id)
+                    async with session.post(url, **self._body(payload, files)) as response:
+                        self._update_bucket(channel_id, response.headers)
+                        if response.status == 429:
+                            METRICS.inc("tweetfetch_rate_limited_total")
+                            body = await self._json(response)
+                            retry_after = self._retry_after(body, response.headers)
+                            if body.get("global") or response.headers.get("X-RateLimit-Global"):
+                                self.global_reset = time.monotonic() + retry_after
+                            else:
+                                self.buckets[channel_id] = (0, time.monotonic() + retry_after)
+                            continue
+                        if response.status >= 500 and server_errors < self.SERVER_ERROR_RETRIES:
+                            server_errors += 1
+                            retry_in = self.SERVER_ERROR_BACKOFF * 2 ** (server_errors - 1)
+                            print(f"Discord returned {response.status} for channel {channel_id}, retrying in {retry_in:.0f}s")
+                        elif response.status >= 400:
+                            # Something about this message (e.g. an embed or file Discord won't take), or a server
+                            # error that didn't go away: skip just it
+                            METRICS.inc("tweetfetch_messages_rejected_total")
+                            print(f"Message to channel {channel_id} refused ({response.status}): {(await response.text())[:200]}")
+                            return None
+                        else:
+                            METRICS.inc("tweetfetch_messages_sent_total")
+                            return await response.json(content_type=None)
+                    await asyncio.sleep(retry_in)
+        finally:
+            self.pending -= 1
+            METRICS.observe("tweetfetch_send_seconds", time.perf_counter() - started)
+
+def pack_messages(messages):
+    """Turn (content, embeds) messages into API payloads (content, embed dicts), packing
+    runs of embed-only messages into as few payloads as Discord's limits allow."""
+    batch, batch_chars = [], 0
+    for content, embeds in messages:
+        if content:
+            if batch:
+                yield None, batch
+                batch, batch_chars = [], 0
+            yield content, [embed.to_dict() for embed in embeds]
+            continue
+        for embed in embeds:
+            if batch and (len(batch) == MAX_EMBEDS_PER_MESSAGE or batch_chars + len(embed) > MAX_EMBED_CHARS_PER_MESSAGE):
+                yield None, batch
+                batch, batch_chars = [], 0
+            batch.append(embed.to_dict())
+            batch_chars += len(embed)
+    if batch:
+        yield None, batch
+
+class DeliveryJob:
+    """One "All at once" delivery, owned by the DeliveryScheduler."""
+
+    def __init__(self, ctx, messages, finished_text, seq):
+        self.ctx = ctx
+        self.user_id = ctx.author.id
+        self.channel_id = ctx.channel.id
+        self.payloads = pack_messages(messages)
+        self.finished_text = finished_text
+        self.seq = seq
+        self.sent = 0
+        self.rejected = 0
+        self.grant = None  # Future resolved when the job may send its next slice
+        self.task = None
+
+class DeliveryScheduler:
+    """Runs every long delivery as its own task, time-sliced over a few send slots.
+
+    A job sends slice_messages API calls per slot and then queues again, and a freed
+    slot goes to the waiting job whose user (then channel) was served least recently,
+    so a huge dump can't starve someone's small query. Cancelling a job cancels its
+    task, which stops it mid-send.
+    """
+
+    def __init__(self, sender, max_active, slice_messages):
+        self.sender = sender
+        self.max_active = max_active
+        self.slice_messages = slice_messages
+        self.jobs = []  # Every unfinished job, in submission order
+        self.waiting = []  # Jobs waiting for a slot
+        self.active = 0
+        self.user_served = {}  # user id -> tick of its last slot
+        self.channel_served = {}  # channel id -> tick of its last slot
+        self._ticks = itertools.count()
+        self._seqs = itertools.count()
+
+    def _priority(self, job):
+        return (self.user_served.get(job.user_id, -1), self.channel_served.get(job.channel_id, -1), job.seq)
+
+    def _grant(self, job):
+        self.active += 1
+        tick = next(self._ticks)
+        self.user_served[job.user_id] = tick
+        self.channel_served[job.channel_id] = tick
+
+    async def _acquire(self, job):
+        if self.active < self.max_active and not self.waiting:
+            self._grant(job)
+            return
+        job.grant = asyncio.get_running_loop().create_future()
+        self.waiting.append(job)
+        try:
+            await job.grant
+        except asyncio.CancelledError:
+            if job in self.waiting:
+                self.waiting.remove(job)
+            elif job.grant.done() and not job.grant.cancelled():
+                self._release()  # Granted just as it was cancelled
+            raise
+
+    def _release(self):
+        self.active -= 1
+        while self.waiting and self.active < self.max_active:
+            job = min(self.waiting, key=self._priority)
+            self.waiting.remove(job)
+            if job.grant.done():  # Cancelled while waiting, its task is unwinding and won't take the slot
+                continue
+            self._grant(job)
+            job.grant.set_result(None)
+
+    def queue_position(self, job):
+        """0 while the job is sending, otherwise its place in line."""
+        if job not in self.waiting:
+            return 0
+        priority = self._priority(job)
+        return 1 + sum(1 for other in self.waiting if self._priority(other) < priority)
+
+    def submit(self, ctx, messages, finished_text):
+        job = DeliveryJob(ctx, messages, finished_text, next(self._seqs))
+        self.jobs.append(job)
+        job.task = asyncio.create_task(self._run(job))
+        job.task.add_done_callback(lambda _: self.jobs.remove(job))
+        return job
+
+    def user_jobs(self, user_id):
+        return [job for job in self.jobs if job.user_id == user_id]
+
+    def cancel_user(self, user_id):
+        """Cancel all of a user's deliveries. Returns how many were cancelled."""
+        jobs = self.user_jobs(user_id)
+        for job in jobs:
+            job.task.cancel()
+        return len(jobs)
+
+    async def _run(self, job):
+        try:
+            finished = False
+            while not finished:
+                await self._acquire(job)
+                try:
+                    sent_in_slice = 0
+                    for content, embeds in itertools.islice(job.payloads, self.slice_messages):
+                        files = await attach_media(embeds)
+                        if await self.sender.send(job.channel_id, content, embeds, files) is None:
+                            job.rejected += 1
+                        else:
+                            job.sent += 1
+                        sent_in_slice += 1
+                    finished = sent_in_slice < self.slice_messages
+                finally:
+                    self._release()
+            if job.rejected:
+                await job.ctx.send(f"⚠️ {job.rejected} message(s) were refused by Discord and skipped.")
+            await job.ctx.send(job.finished_text)
+        except asyncio.CancelledError:
+            await job.ctx.send("Processing stopped.")
+        except Exception as e:  # Nothing else awaits this task, so an error must be reported here
+            print(f"Error delivering to channel {job.channel_id}: {e!r}")
+            await job.ctx.send("❌ Sending failed, please try again later.")
+
+OUTBOUND = RateLimitedSender(TOKEN)
+DELIVERIES = DeliveryScheduler(OUTBOUND, max_active=config.get("MAX_ACTIVE_DELIVERIES", 3), slice_messages=5)
+METRICS.collect("tweetfetch_send_queue_depth", "gauge", "Messages waiting in the outbound sender", lambda: OUTBOUND.pending)
+METRICS.collect("tweetfetch_deliveries", "gauge", "All at once deliveries by state",
+                lambda: {(("state", "sending"),): DELIVERIES.active, (("state", "waiting"),): len(DELIVERIES.waiting)})
+
+async def submit_delivery(ctx, messages, finished_text):
+    """Hand a delivery to the scheduler, telling the user if it has to wait its turn."""
+    job = DELIVERIES.submit(ctx, messages, finished_text)
+    await asyncio.sleep(0)  # Let the job try to claim a slot before reporting its position
+    position = DELIVERIES.queue_position(job)
+    if position:
+        await ctx.send(f"⏳ Queued! Your delivery is **#{position}** in line (`.queue` to check, `.stop` to cancel).")
+
+# Media link checking: old exports point at a lot of deleted media. With LINK_CHECK on,
+# media URLs are probed ahead of sending and the ones known to be dead are skipped.
+LINK_CHECK = config.get("LINK_CHECK", False)
+LINK_CHECK_CONCURRENCY = config.get("LINK_CHECK_CONCURRENCY", 16)  # Probes in flight at once
+LINK_CHECK_TIMEOUT = config.get("LINK_CHECK_TIMEOUT", 10)  # Seconds per probe
+LINK_CHECK_LEAD = 20  # URLs checked before a delivery or slideshow starts, the rest follow in the background
+LINK_CACHE_FILE = config.get("LINK_CACHE_FILE", "link_cache.json")
+LINK_CACHE_TTL = config.get("LINK_CACHE_TTL", 7 * 24 * 3600)  # Seconds a probe's answer is trusted
+LINK_CACHE_SAVE_INTERVAL = 60
+
+class LinkChecker:
+    """Probes media URLs and remembers which are alive, persisted to cache_file with a TTL.
+
+    Probes share one pooled session with at most `concurrency` in flight. Only definite
+    answers are recorded: 2xx/3xx is alive, 4xx (except 408/429) is dead. Timeouts and
+    server errors leave a URL unknown, so it is tried again next time. When disabled,
+    every URL counts as alive and nothing is probed.
+    """
+
+    RETRY_STATUSES = (408, 429)
+
+    def __init__(self, enabled=LINK_CHECK, cache_file=LINK_CACHE_FILE, ttl=LINK_CACHE_TTL,
+                 concurrency=LINK_CHECK_CONCURRENCY, timeout=LINK_CHECK_TIMEOUT):
+        self.enabled = enabled
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.results = {}  # url -> (alive, unix time it was checked)
+        self.probes = {}  # url -> task of a probe in flight
+        self.prefetches = {}  # background check_all task -> user id it runs for
+        self.session = None
+        self.slots = None
+        self.dirty = False
+        if enabled:
+            self.load()
+
+    def load(self):
+        try:
+            with open(self.cache_file, "r") as f:
+                saved = json.load(f)
+        except FileNotFoundError:
             return
+        except (OSError, ValueError) as e:
+            print(f"Error loading link cache: {e}")
+            return
+        now = time.time()
+        self.results = {url: (bool(alive), checked) for url, (alive, checked) in saved.items() if now - checked < self.ttl}
+
+    def _write(self, results):
+        temp_path = f"{self.cache_file}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(results, f)
+        os.replace(temp_path, self.cache_file)
+
+    async def save(self):
+        """Write unexpired results atomically (temp file + rename), off the event loop."""
+        if not self.dirty:
+            return
+        self.dirty = False
+        now = time.time()
+        results = {url: [alive, checked] for url, (alive, checked) in self.results.items() if now - checked < self.ttl}
+        try:
+            await run_in_worker(self._write, results, label="link_cache")
+        except OSError as e:
+            self.dirty = True
+            print(f"Error saving link cache: {e}")
+
+    async def save_periodically(self):
+        while True:
+            await asyncio.sleep(LINK_CACHE_SAVE_INTERVAL)
+            await self.save()
+
+    def status(self, url):
+        """True/False if url was checked within the TTL, otherwise None."""
+        result = self.results.get(url)
+        if result is None or time.time() - result[1] >= self.ttl:
+            return None
+        return result[0]
+
+    def alive_media(self, media):
+        """media without the URLs known to be dead."""
+        if not self.results:
+            return media
+        return [url for url in media if self.status(url) is not False]
+
+    def dead_count(self):
+        return sum(1 for alive, _ in self.results.values() if not alive)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+    async def _get_session(self):
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.concurrency),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={"User-Agent": "TweetFetch link checker"})
+            self.slots = asyncio.Semaphore(self.concurrency)
+        return self.session
+
+    async def _probe(self, url):
+        session = await self._get_session()
+        async with self.slots:
+            try:
+                async with session.head(url, allow_redirects=True) as response:
+                    status = response.status
+                if status in (405, 501):  # HEAD not supported, ask for one byte instead
+                    async with session.get(url, headers={"Range": "bytes=0-0"}) as response:
+                        status = response.status
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                status = None
+        if status is None or status >= 500 or status in self.RETRY_STATUSES:
+            METRICS.inc("tweetfetch_link_checks_total", result="unknown")
+            return None
+        alive = status < 400
+        self.record(url, alive)
+        METRICS.inc("tweetfetch_link_checks_total", result="alive" if alive else "dead")
+        return alive
+
+    def record(self, url, alive):
+        """Store an answer learned elsewhere (e.g. while downloading the file)."""
+        if self.enabled:
+            self.results[url] = (alive, time.time())
+            self.dirty = True
+
+    async def check(self, url):
+        """Whether url is alive (None if that couldn't be told), probing it unless the
+        answer is cached. Concurrent checks of one URL share a single probe."""
+        if not self.enabled:
+            return True
+        status = self.status(url)
+        if status is not None:
+            return status
+        probe = self.probes.get(url)
+        if probe is None:
+            probe = self.probes[url] = asyncio.create_task(self._probe(url))
+            probe.add_done_callback(lambda _: self.probes.pop(url, None))
+        return await asyncio.shield(probe)  # A cancelled caller mustn't cancel a shared probe
+
+    async def check_all(self, urls):
+        """Check every URL from an iterable, keeping up to `concurrency` probes going."""
+        if not self.enabled:
+            return
+        urls = iter(urls)
 
-        username_time = f"{tweet['username']}"  
+        async def prober():
+            for count, url in enumerate(urls, start=1):
+                if self.status(url) is None:
+                    await self.check(url)
+                elif count % 1024 == 0:
+                    await asyncio.sleep(0)  # Long runs of cached URLs mustn't block the loop
 
-        videos = [url for url in tweet["media"] if url.endswith('.mp4')]
-        images = [url for url in tweet["media"] if not url.endswith('.mp4')]
+        await asyncio.gather(*(prober() for _ in range(self.concurrency)))
+
+    def prefetch(self, urls, owner=None):
+        """check_all in the background. owner is the user id .stop cancels it for."""
+        if not self.enabled:
+            return
+        task = asyncio.create_task(self.check_all(urls))
+        self.prefetches[task] = owner
+        task.add_done_callback(lambda _: self.prefetches.pop(task, None))
+
+    def cancel_user(self, user_id):
+        tasks = [task for task, owner in self.prefetches.items() if owner == user_id]
+        for task in tasks:
+            task.cancel()
+        return len(tasks)
+
+LINKS = LinkChecker()
+link_cache_task = None
+METRICS.describe("tweetfetch_link_checks_total", "counter", "Media URL probes by result (alive/dead/unknown)")
+METRICS.collect("tweetfetch_dead_links", "gauge", "Media URLs currently known to be dead", LINKS.dead_count)
+DEAD_MEDIA_NOTE = "🚫 This media is no longer available."
+
+def media_urls(results):
+    """Every media URL of a result's (tweet, media) pairs, in order."""
+    for _, media in results:
+        yield from media
+
+async def check_links_ahead(ctx, urls):
+    """Check the first few URLs now and the rest in the background, in the order they'll be sent,
+    so known-dead media can be skipped when its turn comes."""
+    urls = iter(urls)
+    await LINKS.check_all(itertools.islice(urls, LINK_CHECK_LEAD))
+    LINKS.prefetch(urls, owner=ctx.author.id)
+
+def pages_to_check(cursor, checked_pages, index, tweet_count):
+    """Media URLs of the slideshow pages from index up to LINK_CHECK_LEAD ahead that haven't been
+    checked yet. Leaves the cursor anywhere, so seek the page to show afterwards."""
+    urls = []
+    if LINKS.enabled:
+        for number in range(index, min(index + LINK_CHECK_LEAD, tweet_count)):
+            if number not in checked_pages:
+                checked_pages[number] = True
+                urls.extend(cursor.seek(number)[1])
+    return urls
+
+# Local media cache: with MEDIA_CACHE_DIR set, media is downloaded once and uploaded as
+# attachments, so repeat views don't depend on (or refetch from) the original CDN link.
+MEDIA_CACHE_DIR = config.get("MEDIA_CACHE_DIR")  # Unset disables the cache
+MEDIA_CACHE_MB = config.get("MEDIA_CACHE_MB", 2048)
+MEDIA_FETCH_CONCURRENCY = config.get("MEDIA_FETCH_CONCURRENCY", 8)  # Downloads in flight at once
+MEDIA_FETCH_TIMEOUT = 60
+MEDIA_ATTACHMENT_MB = config.get("MEDIA_ATTACHMENT_MB", 10)  # Upload limit per message; bigger files stay links
+MEDIA_SLIDESHOW_WAIT = 2  # Seconds a slideshow page waits for a download before falling back to the link
+MEDIA_SLIDESHOW_AHEAD = 3  # Slideshow pages downloaded ahead of the one shown
+MEDIA_INDEX_SAVE_INTERVAL = 60
+
+class MediaStore:
+    """Content-addressed on-disk media cache, bounded to max_bytes with LRU eviction.
+
+    Files live at <root>/<digest[:2]>/<sha256 digest><ext>, so the same file fetched from
+    different URLs is stored once. index.json maps URLs to digests and keeps the files in
+    least-recently-used order. Downloads share one pooled session, at most `concurrency`
+    at a time, and concurrent requests for one URL share a download.
+    """
+
+    def __init__(self, root=MEDIA_CACHE_DIR, max_bytes=MEDIA_CACHE_MB * 1024 * 1024,
+                 max_file_bytes=MEDIA_ATTACHMENT_MB * 1024 * 1024, concurrency=MEDIA_FETCH_CONCURRENCY,
+                 timeout=MEDIA_FETCH_TIMEOUT):
+        self.enabled = bool(root)
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.urls = {}  # url -> digest
+        self.files = collections.OrderedDict()  # digest -> (size, ext), least recently used first
+        self.used_bytes = 0
+        self.downloads = {}  # url -> task of a download in flight
+        self.prefetches = {}  # background fetch_all task -> user id it runs for
+        self.session = None
+        self.slots = None
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+        if self.enabled:
+            os.makedirs(root, exist_ok=True)
+            self.load()
+
+    @property
+    def index_path(self):
+        return os.path.join(self.root, "index.json")
+
+    def path_for(self, digest):
+        return os.path.join(self.root, digest[:2], digest + self.files[digest][1])
+
+    def load(self):
+        """Read index.json, dropping entries whose file has gone missing."""
+        try:
+            with open(self.index_path, "r") as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"Error loading media cache index: {e}")
+            return
+        for digest, size, ext in saved.get("files", []):
+            self.files[digest] = (size, ext)
+            if os.path.exists(self.path_for(digest)):
+                self.used_bytes += size
+            else:
+                del self.files[digest]
+        self.urls = {url: digest for url, digest in saved.get("urls", {}).items() if digest in self.files}
+
+    def _write(self, saved):
+        temp_path = f"{self.index_path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(saved, f)
+        os.replace(temp_path, self.index_path)
+
+    async def save(self):
+        """Write the index atomically (temp file + rename), off the event loop."""
+        if not self.dirty:
+            return
+        self.dirty = False
+        saved = {
+            "files": [[digest, size, ext] for digest, (size, ext) in self.files.items()],
+            "urls": {url: digest for url, digest in self.urls.items() if digest in self.files},
+        }
+        try:
+            await run_in_worker(self._write, saved, label="media_index")
+        except OSError as e:
+            self.dirty = True
+            print(f"Error saving media cache index: {e}")
+
+    async def save_periodically(self):
+        while True:
+            await asyncio.sleep(MEDIA_INDEX_SAVE_INTERVAL)
+            await self.save()
+
+    def lookup(self, url):
+        """Local path of url's file if it's cached (marking it recently used), otherwise None."""
+        digest = self.urls.get(url)
+        if digest is None:
+            return None
+        if digest not in self.files:
+            del self.urls[url]  # Evicted
+            return None
+        self.files.move_to_end(digest)
+        self.dirty = True
+        return self.path_for(digest)
+
+    def _add(self, url, temp_path, digest, size, ext):
+        """Move a finished download into place (or drop it if the same file is already stored)."""
+        if digest in self.files:
+            os.remove(temp_path)
+            self.files.move_to_end(digest)
+        else:
+            self.files[digest] = (size, ext)
+            os.makedirs(os.path.dirname(self.path_for(digest)), exist_ok=True)
+            os.replace(temp_path, self.path_for(digest))
+            self.used_bytes += size
+            while self.used_bytes > self.max_bytes and len(self.files) > 1:
+                self._evict(next(iter(self.files)))
+        self.urls[url] = digest
+        self.dirty = True
+
+    def _evict(self, digest):
+        path = self.path_for(digest)
+        size, _ = self.files.pop(digest)
+        self.used_bytes -= size
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+    async def _get_session(self):
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.concurrency),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={"User-Agent": "TweetFetch media cache"})
+            self.slots = asyncio.Semaphore(self.concurrency)
+        return self.session
+
+    async def _download(self, url):
+        session = await self._get_session()
+        ext = os.path.splitext(urllib.parse.urlsplit(url).path)[1].lower()[:8]
+        temp_path = os.path.join(self.root, f"download-{hashlib.sha1(url.encode('utf-8')).hexdigest()}.tmp")
+        digest, size, complete = hashlib.sha256(), 0, False
+        async with self.slots:
+            try:
+                async with session.get(url) as response:
+                    if 400 <= response.status < 500 and response.status not in LinkChecker.RETRY_STATUSES:
+                        LINKS.record(url, False)
+                    if response.status == 200 and (response.content_length or 0) <= self.max_file_bytes:
+                        with open(temp_path, "wb") as f:
+                            async for chunk in response.content.iter_chunked(64 * 1024):
+                                size += len(chunk)
+                                if size > self.max_file_bytes:
+                                    break  # Too big to upload anyway
+                                digest.update(chunk)
+                                f.write(chunk)
+                            else:
+                                complete = True
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                print(f"Error downloading {url}: {e}")
+        if not complete:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(temp_path)
+            return None
+        METRICS.inc("tweetfetch_media_downloaded_bytes_total", size)
+        self._add(url, temp_path, digest.hexdigest(), size, ext)
+        return self.lookup(url)
+
+    async def fetch(self, url):
+        """Local path of url's file, downloading it unless it's cached. None if it can't be
+        downloaded (or is too big to upload)."""
+        path = self.lookup(url)
+        if path is not None:
+            self.hits += 1
+            return path
+        self.misses += 1
+        download = self.downloads.get(url)
+        if download is None:
+            download = self.downloads[url] = asyncio.create_task(self._download(url))
+            download.add_done_callback(lambda _: self.downloads.pop(url, None))
+        return await asyncio.shield(download)  # A cancelled caller mustn't cancel a shared download
+
+    async def fetch_all(self, urls):
+        """Fetch every URL from an iterable, keeping up to `concurrency` downloads going."""
+        if not self.enabled:
+            return
+        urls = iter(urls)
+
+        async def fetcher():
+            for url in urls:
+                await self.fetch(url)
+
+        await asyncio.gather(*(fetcher() for _ in range(self.concurrency)))
+
+    def prefetch(self, urls, owner=None):
+        """fetch_all in the background. owner is the user id .stop cancels it for."""
+        if not self.enabled:
+            return
+        task = asyncio.create_task(self.fetch_all(urls))
+        self.prefetches[task] = owner
+        task.add_done_callback(lambda _: self.prefetches.pop(task, None))
+
+    def cancel_user(self, user_id):
+        tasks = [task for task, owner in self.prefetches.items() if owner == user_id]
+        for task in tasks:
+            task.cancel()
+        return len(tasks)
+
+    def summary(self):
+        lookups = self.hits + self.misses
+        rate = f"{self.hits / lookups:.0%}" if lookups else "n/a"
+        return f"{len(self.files)} files, {self.used_bytes / 1e6:,.1f}/{self.max_bytes / 1e6:,.0f} MB, {rate} hits"
+
+MEDIA_STORE = MediaStore()
+media_index_task = None
+METRICS.describe("tweetfetch_media_downloaded_bytes_total", "counter", "Bytes downloaded into the local media cache")
+METRICS.collect("tweetfetch_media_cache_bytes", "gauge", "Bytes of media in the local media cache", lambda: MEDIA_STORE.used_bytes)
+METRICS.collect("tweetfetch_media_cache_requests", "gauge", "Local media cache lookups by result",
+                lambda: {(("result", "hit"),): MEDIA_STORE.hits, (("result", "miss"),): MEDIA_STORE.misses})
+
+def _embed_image(embed):
+    if isinstance(embed, discord.Embed):
+        return embed.image.url
+    return embed.get("image", {}).get("url")
+
+def _set_embed_image(embed, url):
+    if isinstance(embed, discord.Embed):
+        embed.set_image(url=url)
+    else:
+        embed["image"] = {"url": url}
+
+def _read_files(paths):
+    """{path: bytes} for the paths that could be read (a file may be evicted meanwhile)."""
+    contents = {}
+    for path in paths:
+        try:
+            with open(path, "rb") as f:
+                contents[path] = f.read()
+        except OSError:
+            pass
+    return contents
+
+async def attach_media(embeds, wait=None):
+    """Point embed images at attachments from the local media cache, downloading them
+    first if needed (giving up after `wait` seconds). Works on Embed objects or their
+    dicts. Returns the (filename, bytes) files to upload with the message; images that
+    aren't available or don't fit the message's upload limit keep their link."""
+    if not MEDIA_STORE.enabled:
+        return []
+    urls = [url for url in map(_embed_image, embeds) if url and not url.startswith("attachment://")]
+    if not urls:
+        return []
+    downloads = asyncio.gather(*(MEDIA_STORE.fetch(url) for url in urls))
+    try:
+        paths = dict(zip(urls, await asyncio.wait_for(asyncio.shield(downloads), wait)))
+    except asyncio.TimeoutError:
+        paths = {url: MEDIA_STORE.lookup(url) for url in urls}  # Slow downloads carry on, for next time
+    contents = await run_in_worker(_read_files, [path for path in paths.values() if path], label="media_read")
+
+    files, attached, total = [], {}, 0
+    for embed in embeds:
+        path = paths.get(_embed_image(embed))
+        if path not in contents:
+            continue
+        filename = os.path.basename(path)
+        if filename not in attached:
+            if total + len(contents[path]) > MEDIA_STORE.max_file_bytes:
+                continue
+            total += len(contents[path])
+            attached[filename] = True
+            files.append((filename, contents[path]))
+        _set_embed_image(embed, f"attachment://{filename}")
+    return files
+
+def discord_files(files):
+    return [discord.File(io.BytesIO(data), filename=filename) for filename, data in files]
+
+def upcoming_images(cursor, index, tweet_count):
+    """The image each of the MEDIA_SLIDESHOW_AHEAD slideshow pages after index shows.
+    Leaves the cursor anywhere, so seek the page to show afterwards."""
+    urls = []
+    if MEDIA_STORE.enabled:
+        for number in range(index + 1, min(index + 1 + MEDIA_SLIDESHOW_AHEAD, tweet_count)):
+            media = LINKS.alive_media(cursor.seek(number)[1])
+            if media:
+                urls.append(media[0])
+    return urls
+
+def media_messages(filtered_tweets):
+    """The messages .compile's "All at once" sends, as (content, embeds) pairs."""
+    for tweet, media in filtered_tweets:
+        media = LINKS.alive_media(media)
+        if not media:
+            continue  # Every file of this tweet is known to be dead
+        username_time = f"{tweet.user_handle}"  
+
+        videos = [url for url in media if url.endswith('.mp4')]
+        images = [url for url in media if not url.endswith('.mp4')]
 
         # Send video links separately
         if videos:
             for index, video_url in enumerate(videos, start=1):
                 if len(videos) > 1:
-                    await ctx.send(f"[{username_time} ({index}/{len(videos)})]({video_url})")
+                    yield f"[{username_time} ({index}/{len(videos)})]({video_url})", []
                 else:
-                    await ctx.send(f"[{username_time}]({video_url})")
+                    yield f"[{username_time}]({video_url})", []
 
             # Extra embed with just the username after videos
             video_embed = discord.Embed(color=discord.Color.blue())
             video_embed.set_footer(text=username_time)
-            await ctx.send(embed=video_embed)
+            yield None, [video_embed]
 
         # Send images
         for index, media_url in enumerate(images, start=1):
-            if abort_flag[ctx.author.id]:
-                await ctx.send("Processing stopped.")
-                return
-
             embed = discord.Embed(color=discord.Color.blue())
             embed.set_image(url=media_url)
 
             if len(images) > 1:
-                embed.set_footer(text=f"{tweet['username']} ({index}/{len(images)})")
+                embed.set_footer(text=f"{tweet.user_handle} ({index}/{len(images)})")
             else:
-                embed.set_footer(text=f"{tweet['username']}")
+                embed.set_footer(text=f"{tweet.user_handle}")
 
-            await ctx.send(embed=embed)
-            await asyncio.sleep(0.5)  # Prevent rate limit issues
+            yield None, [embed]
 
-    await ctx.send("Finished sending all media! ✅")
+async def send_all(ctx, filtered_tweets):
+    """Sends all media results at once."""
+    await check_links_ahead(ctx, media_urls(filtered_tweets))
+    await submit_delivery(ctx, media_messages(filtered_tweets), "Finished sending all media! ✅")
 
 
 async def send_slideshow(ctx, filtered_tweets):
     """Displays tweets in a slideshow format with button navigation."""
     tweet_count = len(filtered_tweets)
+    cursor = filtered_tweets.cursor()
+    checked_pages = {}
+    await LINKS.check_all(pages_to_check(cursor, checked_pages, 0, tweet_count))
 
     def generate_embed(index):
-        tweet = filtered_tweets[index]
-        username_time = f"{tweet['username']}"
+        LINKS.prefetch(pages_to_check(cursor, checked_pages, index, tweet_count), owner=ctx.author.id)
+        MEDIA_STORE.prefetch(upcoming_images(cursor, index, tweet_count), owner=ctx.author.id)
+        tweet, media = cursor.seek(index)
+        alive_media = LINKS.alive_media(media)
+        username_time = f"{tweet.user_handle}"
 
         embed = discord.Embed(color=discord.Color.blue())
-        if tweet["media"]:
-            embed.set_image(url=tweet["media"][0])
+        if alive_media:
+            embed.set_image(url=alive_media[0])
+        elif media:
+            embed.description = DEAD_MEDIA_NOTE
         embed.set_footer(text=f"{username_time} ({index + 1}/{tweet_count})")
         return embed
 
-    view = PaginationView(ctx, filtered_tweets, generate_embed, tweet_count)
-    view.message = await ctx.send(embed=generate_embed(0), view=view)
+    view = PaginationView(ctx, cursor, generate_embed, tweet_count)
+    embed = generate_embed(0)
+    files = await attach_media([embed], wait=MEDIA_SLIDESHOW_WAIT)
+    view.message = await ctx.send(embed=embed, files=discord_files(files), view=view)
 
 @bot.command()
 async def richcompile(ctx, *args):
-    """Fetch full tweets by username and/or date (year, month, day)."""
-    abort_flag[ctx.author.id] = False  
+    """Fetch full tweets by username and/or date (year, month, day), optionally narrowed with `search: <query>`."""
 
+    args, search_query = split_search_query(args)
+    args, time_range, order = parse_time_filters(args)
     username, year, month, day = parse_date_filters(args)
-    filtered_tweets = filter_tweets(ctx, username, year, month, day)
+    data = await load_tweets_async(profile_for(ctx))
+    try:
+        filtered_tweets = await run_in_worker(prepared_query, ctx, data, username, year, month, day, search_query, time_range, order, False,
+                                              owner=ctx.author.id, timeout=WORKER_TIMEOUT)
+    except asyncio.TimeoutError:
+        await ctx.send("⌛ That query took too long, try narrowing it down.")
+        return
 
     if not filtered_tweets:
-        await ctx.send("No matching tweets found.")
+        await ctx.send(no_match_message(data, "No matching tweets found.", username))
         return
 
     await ctx.send(f"Found **{len(filtered_tweets)}** tweets. Choose an option:", view=MenuView(ctx, filtered_tweets, mode="rich"))
 
-async def send_rich_all(ctx, filtered_tweets):
-    """Displays all tweets with full details at once."""
-    for tweet in filtered_tweets:
-        if abort_flag[ctx.author.id]:
-            await ctx.send("Processing stopped.")
-            return
+def search_tweets(ctx, query, data=None):
+    """Ranked .search results for the caller's profile (data, if loaded already) and media preference, as a QueryResult."""
+    if data is None:
+        data = load_tweets(profile_for(ctx))
+    if not data:
+        return QueryResult([], [[]], "all")
+
+    user_preference = user_media_preferences.get(str(ctx.author.id), "all")
+    cache_key = (data.name, user_preference, "search", query)
+    results = QUERY_CACHE.get(cache_key)
+    if results is None:
+        with METRICS.timer("tweetfetch_filter_seconds", kind="search"):
+            # Keep the ranking, only dropping tweets without media of the preferred type
+            ranked = data.text_index.ranked(query)
+            if data.columns is not None:
+                ranked = data.columns.with_media(ranked, user_preference)
+            else:
+                media_positions = data.index["media"].get(user_preference, [])
+                ranked = [position for position in ranked if _has_position(media_positions, position)]
+            results = QueryResult(data.tweets, [ranked], user_preference)
+        QUERY_CACHE.put(cache_key, results)
+    len(results)
+    return results
 
-        try:
-            timestamp_dt = datetime.datetime.strptime(tweet["created_at"], "%a %b %d %H:%M:%S %z %Y")
-            formatted_timestamp = timestamp_dt.strftime("%m/%d/%Y %I:%M %p").replace(" 0", " ")
-            username_time = f"{tweet['username']} {formatted_timestamp}"
+@bot.command()
+async def search(ctx, *, query: str = None):
+    """Search liked tweets' text, most relevant first. Supports AND, OR and "exact phrases"."""
+    if not query:
+        await ctx.send('Usage: `.search <words>` - e.g. `.search cat dog` (or `cat AND dog`), `.search cat OR dog`, `.search "red fox"`')
+        return
+
+    data = await load_tweets_async(profile_for(ctx))
+    try:
+        results = await run_in_worker(search_tweets, ctx, query, data, owner=ctx.author.id, timeout=WORKER_TIMEOUT)
+    except asyncio.TimeoutError:
+        await ctx.send("⌛ That search took too long, try narrowing it down.")
+        return
+    if not results:
+        await ctx.send("No matching tweets found.")
+        return
 
-            # Tweet Embed
-            embed = discord.Embed(description=tweet["text"], color=discord.Color.blue())
-            embed.set_author(name=tweet["username"], url=f"https://twitter.com/{tweet['username']}/status/{tweet['tweet_id']}")
-            embed.set_footer(text=username_time)
+    await ctx.send(f"Found **{len(results)}** tweets, most relevant first. Choose an option:", view=MenuView(ctx, results, mode="rich"))
 
-            if len(tweet["media"]) == 1:  # One image, embed inside tweet
-                embed.set_image(url=tweet["media"][0])
+def rich_messages(filtered_tweets):
+    """The messages .richcompile's "All at once" sends, as (content, embeds) pairs."""
+    for tweet, media in filtered_tweets:
+        media = LINKS.alive_media(media)
+        formatted_timestamp = tweet.created_dt.strftime("%m/%d/%Y %I:%M %p").replace(" 0", " ")
+        username_time = f"{tweet.user_handle} {formatted_timestamp}"
 
-            await ctx.send(embed=embed)
+        # Tweet Embed
+        embed = discord.Embed(description=tweet.text, color=discord.Color.blue())
+        embed.set_author(name=tweet.user_handle, url=f"https://twitter.com/{tweet.user_handle}/status/{tweet.tweet_id}")
+        embed.set_footer(text=username_time)
 
-            # Multiple images (if any)
-            if len(tweet["media"]) > 1:
-                for index, media_url in enumerate(tweet["media"], start=1):
-                    media_embed = discord.Embed(color=discord.Color.blue())
-                    media_embed.set_image(url=media_url)
-                    media_embed.set_footer(text=f"{username_time} ({index}/{len(tweet['media'])})")
-                    await ctx.send(embed=media_embed)
-                    await asyncio.sleep(0.5)
-
-            # Videos
-            videos = [url for url in tweet["media"] if url.endswith('.mp4')]
-            if videos:
-                for index, video_url in enumerate(videos, start=1):
-                    if len(videos) > 1:
-                        await ctx.send(f"[{username_time} ({index}/{len(videos)})]({video_url})")
-                    else:
-                        await ctx.send(f"[{username_time}]({video_url})")
-
-            await asyncio.sleep(1)
+        if len(media) == 1:  # One image, embed inside tweet
+            embed.set_image(url=media[0])
 
-        except Exception as e:
-            print(f"Error processing tweet: {e}")
+        yield None, [embed]
+
+        # Multiple images (if any)
+        if len(media) > 1:
+            for index, media_url in enumerate(media, start=1):
+                media_embed = discord.Embed(color=discord.Color.blue())
+                media_embed.set_image(url=media_url)
+                media_embed.set_footer(text=f"{username_time} ({index}/{len(media)})")
+                yield None, [media_embed]
+
+        # Videos
+        videos = [url for url in media if url.endswith('.mp4')]
+        if videos:
+            for index, video_url in enumerate(videos, start=1):
+                if len(videos) > 1:
+                    yield f"[{username_time} ({index}/{len(videos)})]({video_url})", []
+                else:
+                    yield f"[{username_time}]({video_url})", []
 
-    await ctx.send("Finished sending all tweets! ✅")
+async def send_rich_all(ctx, filtered_tweets):
+    """Displays all tweets with full details at once."""
+    await check_links_ahead(ctx, media_urls(filtered_tweets))
+    await submit_delivery(ctx, rich_messages(filtered_tweets), "Finished sending all tweets! ✅")
 
 async def send_rich_slideshow(ctx, filtered_tweets):
     """Displays tweets in a rich slideshow format with button navigation."""
     tweet_count = len(filtered_tweets)
+    cursor = filtered_tweets.cursor()
+    checked_pages = {}
+    await LINKS.check_all(pages_to_check(cursor, checked_pages, 0, tweet_count))
 
     def generate_embed(index):
-        tweet = filtered_tweets[index]
-        timestamp_dt = datetime.datetime.strptime(tweet["created_at"], "%a %b %d %H:%M:%S %z %Y")
-        formatted_timestamp = timestamp_dt.strftime("%m/%d/%Y %I:%M %p").replace(" 0", " ")
-        username_time = f"{tweet['username']} {formatted_timestamp}"
-
-        embed = discord.Embed(description=tweet["text"], color=discord.Color.blue())
-        embed.set_author(name=tweet["username"], url=f"https://twitter.com/{tweet['username']}/status/{tweet['tweet_id']}")
+        LINKS.prefetch(pages_to_check(cursor, checked_pages, index, tweet_count), owner=ctx.author.id)
+        MEDIA_STORE.prefetch(upcoming_images(cursor, index, tweet_count), owner=ctx.author.id)
+        tweet, media = cursor.seek(index)
+        alive_media = LINKS.alive_media(media)
+        formatted_timestamp = tweet.created_dt.strftime("%m/%d/%Y %I:%M %p").replace(" 0", " ")
+        username_time = f"{tweet.user_handle} {formatted_timestamp}"
+
+        embed = discord.Embed(description=tweet.text, color=discord.Color.blue())
+        embed.set_author(name=tweet.user_handle, url=f"https://twitter.com/{tweet.user_handle}/status/{tweet.tweet_id}")
         embed.set_footer(text=f"{username_time} ({index + 1}/{tweet_count})")
 
-        if tweet["media"]:
-            embed.set_image(url=tweet["media"][0])  # First image/video in slideshow
+        if alive_media:
+            embed.set_image(url=alive_media[0])  # First image/video in slideshow
+        elif media:
+            embed.add_field(name="Media", value=DEAD_MEDIA_NOTE)
 
         return embed
 
-    view = PaginationView(ctx, filtered_tweets, generate_embed, tweet_count)
-    view.message = await ctx.send(embed=generate_embed(0), view=view)
+    view = PaginationView(ctx, cursor, generate_embed, tweet_count)
+    embed = generate_embed(0)
+    files = await attach_media([embed], wait=MEDIA_SLIDESHOW_WAIT)
+    view.message = await ctx.send(embed=embed, files=discord_files(files), view=view)
 
 
+def prepare_stats(tweet_stats, args):
+    """Compute (and cache) the rankings a .stats request needs, so it runs in the worker."""
+    tweet_stats.top_users()
+    if args and args[0].isdigit():
+        tweet_stats.year_top_users(args[0])
+    elif len(args) > 1 and args[0].lower() == "user":
+        tweet_stats.user_rank(tweet_stats.find_user(" ".join(args[1:])))
+
 @bot.command()
 async def stats(ctx, *args):
     """Fetches statistics from liked tweets and displays them in an embed."""
-    tweets = load_tweets()
-    if not tweets:
+    data = await load_tweets_async(profile_for(ctx))
+    if not data or not data.tweets:
         await ctx.send("No data available.")
         return
+    await run_in_worker(prepare_stats, data.stats, args, owner=ctx.author.id)
 
-    # Count total tweets & media
-    total_tweets = len(tweets)
-    total_images = sum(1 for tweet in tweets for media in tweet["tweet_media_urls"] if media.endswith(('.jpg', '.png', '.jpeg')))
-    total_videos = sum(1 for tweet in tweets for media in tweet["tweet_media_urls"] if media.endswith('.mp4'))
-    total_media = total_images + total_videos
-
-    # Most liked users
-    user_counts = collections.Counter(tweet["user_handle"] for tweet in tweets)
-    top_users = user_counts.most_common()
-
-    # Longest Tweet Liked
-    longest_tweet = max(tweets, key=lambda t: len(t.get("tweet_content", "")), default=None)
+    # Everything below is precomputed at load time (see TweetStats) or by prepare_stats
+    tweet_stats = data.stats
+    top_users = tweet_stats.top_users()
+    longest_tweet = tweet_stats.longest_tweet
 
     # If a specific stat is requested
     if args:
@@ -634,28 +4621,72 @@ async def stats(ctx, *args):
 
         elif stat_type == "media":
             embed = discord.Embed(title="📊 Media Breakdown", color=discord.Color.blue())
-            embed.add_field(name="📸 Images", value=f"{total_images}", inline=True)
-            embed.add_field(name="🎥 Videos", value=f"{total_videos}", inline=True)
+            embed.add_field(name="📸 Images", value=f"{tweet_stats.total_images}", inline=True)
+            embed.add_field(name="🎥 Videos", value=f"{tweet_stats.total_videos}", inline=True)
             await ctx.send(embed=embed)
             return
 
         elif stat_type == "longest":
-            embed = discord.Embed(title="📜 Longest Tweet Liked", description=longest_tweet.get("tweet_content", ""), color=discord.Color.blue())
-            embed.set_author(name=longest_tweet["user_handle"], url=f"https://twitter.com/{longest_tweet['user_handle']}/status/{longest_tweet['tweet_id']}")
-            embed.set_footer(text=f"Length: {len(longest_tweet.get('tweet_content', ''))} characters")
+            embed = discord.Embed(title="📜 Longest Tweet Liked", description=longest_tweet.text, color=discord.Color.blue())
+            embed.set_author(name=longest_tweet.user_handle, url=f"https://twitter.com/{longest_tweet.user_handle}/status/{longest_tweet.tweet_id}")
+            embed.set_footer(text=f"Length: {len(longest_tweet.text)} characters")
+            await ctx.send(embed=embed)
+            return
+
+        elif stat_type.isdigit() and len(stat_type) == 4:
+            year = stat_type
+            if year not in tweet_stats.year_counts:
+                await ctx.send(f"No liked tweets from {year}.")
+                return
+
+            images, videos = tweet_stats.year_media[year]
+            embed = discord.Embed(title=f"📊 Tweet Stats for {year}", color=discord.Color.blue())
+            embed.add_field(name="📝 Total Tweets", value=f"{tweet_stats.year_counts[year]}", inline=True)
+            embed.add_field(name="📸 Images", value=f"{images}", inline=True)
+            embed.add_field(name="🎥 Videos", value=f"{videos}", inline=True)
+
+            months_text = "\n".join(
+                f"{calendar.month_abbr[month]}: {tweet_stats.month_counts[f'{year}-{str(month).zfill(2)}']}"
+                for month in range(1, 13) if f"{year}-{str(month).zfill(2)}" in tweet_stats.month_counts
+            )
+            embed.add_field(name="🗓️ By Month", value=months_text, inline=True)
+
+            top_users_text = "\n".join([f"``{user}`` ({count})" for user, count in tweet_stats.year_top_users(year)[:10]])
+            embed.add_field(name="🏆 Most Liked Users", value=top_users_text, inline=True)
+            await ctx.send(embed=embed)
+            return
+
+        elif stat_type == "user":
+            if len(args) < 2:
+                await ctx.send("Usage: `.stats user <handle>`")
+                return
+
+            handle = tweet_stats.find_user(" ".join(args[1:]))
+            if not handle:
+                await ctx.send(no_match_message(data, f"No liked tweets from `{' '.join(args[1:])}`.", " ".join(args[1:]), exact=True))
+                return
+
+            images, videos = tweet_stats.user_media[handle]
+            years = tweet_stats.user_year_counts[handle]
+            embed = discord.Embed(title=f"📊 Stats for {handle}", color=discord.Color.blue())
+            embed.add_field(name="📝 Liked Tweets", value=f"{tweet_stats.user_counts[handle]}", inline=True)
+            embed.add_field(name="🏆 Rank", value=f"#{tweet_stats.user_rank(handle)} of {len(top_users)}", inline=True)
+            embed.add_field(name="📸 Images", value=f"{images}", inline=True)
+            embed.add_field(name="🎥 Videos", value=f"{videos}", inline=True)
+            embed.add_field(name="🗓️ By Year", value="\n".join(f"{year}: {years[year]}" for year in sorted(years)), inline=False)
             await ctx.send(embed=embed)
             return
 
         else:
-            await ctx.send("Invalid stats type. Available: `top_users`, `media`, `longest`")
+            await ctx.send("Invalid stats type. Available: `top_users`, `media`, `longest`, `<year>`, `user <handle>`")
             return
 
     # Full stats embed
     embed = discord.Embed(title="📊 Tweet Stats", color=discord.Color.blue())
-    embed.add_field(name="📝 Total Tweets", value=f"{total_tweets}", inline=True)
-    embed.add_field(name="📸 Total Media", value=f"{total_media}", inline=True)
-    embed.add_field(name="📸 Images", value=f"{total_images}", inline=True)
-    embed.add_field(name="🎥 Videos", value=f"{total_videos}", inline=True)
+    embed.add_field(name="📝 Total Tweets", value=f"{tweet_stats.total_tweets}", inline=True)
+    embed.add_field(name="📸 Total Media", value=f"{tweet_stats.total_media}", inline=True)
+    embed.add_field(name="📸 Images", value=f"{tweet_stats.total_images}", inline=True)
+    embed.add_field(name="🎥 Videos", value=f"{tweet_stats.total_videos}", inline=True)
 
     # Top Users (embedded in .stats)
     top_users_text = "\n".join([f"``{user}`` ({count})" for user, count in top_users[:10]])
@@ -665,37 +4696,59 @@ async def stats(ctx, *args):
 
 
 game_in_progress = {}
+GAME_DRAW_ATTEMPTS = 10  # Draws before .game gives up on finding an image whose link works
+
 @bot.command()
-async def game(ctx):
-    """Starts a game where users guess the Tweeter from a random liked tweet image."""
+async def game(ctx, mode: str = None):
+    """Starts a game where users guess the Tweeter from a random liked tweet image.
+
+    `.game favorites` picks images from often-liked accounts more often.
+    """
     if game_in_progress.get(ctx.channel.id, False):
         await ctx.send("⚠ **Game already in progress!** Please wait for it to finish.")
         return
 
     game_in_progress[ctx.channel.id] = True
+    try:
+        await play_game(ctx, mode)
+    finally:
+        game_in_progress[ctx.channel.id] = False  # However the game ended, cancelled or failed included
 
-    tweets = load_tweets()
-    if not tweets:
+async def play_game(ctx, mode):
+    """One round of .game; the caller holds the channel's game_in_progress flag."""
+    data = await load_tweets_async(profile_for(ctx))
+    if not data or not data.tweets:
         await ctx.send("No data available.")
-        game_in_progress[ctx.channel.id] = False
         return
 
-    # Choose a random tweet with media
-    valid_tweets = [tweet for tweet in tweets if tweet["tweet_media_urls"]]
-    if not valid_tweets:
-        await ctx.send("No media found in liked tweets.")
-        game_in_progress[ctx.channel.id] = False
+    # Draw from the prebuilt image pool, without repeats in this channel
+    if not len(data.game_pool):
+        await ctx.send("No images found in liked tweets.")
         return
 
-    tweet = random.choice(valid_tweets)
-    username = tweet["user_handle"]
-    image_url = random.choice(tweet["tweet_media_urls"])
+    # Images shown here before a restart or reload don't come up again this cycle
+    rotation_key = f"{data.name}:{ctx.channel.id}"
+    data.game_pool.resume(ctx.channel.id, game_rotations.get(rotation_key))
+    for _ in range(GAME_DRAW_ATTEMPTS):
+        if mode and mode.lower() in ("favorites", "favourites"):
+            # The first weighted draw builds the pool's weights, so keep it off the event loop
+            tweet, image_url = await run_in_worker(data.game_pool.draw_weighted, ctx.channel.id, data.stats.user_counts, owner=ctx.author.id)
+        else:
+            tweet, image_url = data.game_pool.draw(ctx.channel.id)
+            STATE.put("game_rotations", rotation_key, data.game_pool.rotation_state(ctx.channel.id))
+        if await LINKS.check(image_url) is not False:
+            break  # Alive, or couldn't tell
+    else:
+        await ctx.send("⚠ Couldn't find an image that still loads, please try again.")
+        return
+    username = tweet.user_handle
     game_starter = ctx.author
 
     # Send the tweet image (No username, No timestamp)
     embed = discord.Embed(title="Guess the Tweeter!", description="Who posted this image?")
     embed.set_image(url=image_url)
-    msg = await ctx.send(embed=embed)
+    files = await attach_media([embed])
+    msg = await ctx.send(embed=embed, files=discord_files(files))
 
     # Add the shrug emoji reaction
     shrug_emoji = "🤷"
@@ -727,7 +4780,6 @@ async def game(ctx):
 
             if reaction_task in done:
                 await ctx.send(f"🤷 **Game ended!** The correct answer was **{username}**.\n-# Type `.game` to play again!")
-                game_in_progress[ctx.channel.id] = False
                 return
 
             if hint_1_task in done and not hint_1_given:
@@ -742,7 +4794,7 @@ async def game(ctx):
                     hint = "".join(revealed)
                     await ctx.send(f"**Hint:** ``{hint}``")  # Uses backticks to prevent markdown issues
                 else:
-                    like_count = sum(1 for t in tweets if t["user_handle"] == username)
+                    like_count = data.stats.user_counts[username]
                     await ctx.send(f"**Hint:** You have liked this Tweeter **{like_count} times**.")
                 continue  # Keep waiting for a guess
 
@@ -754,16 +4806,15 @@ async def game(ctx):
 
             if timeout_task in done:
                 await ctx.send(f"⏳ **Time's up!** The correct answer was **{username}**.\n-# Type `.game` to play again!")
-                game_in_progress[ctx.channel.id] = False
                 return
 
             if message_task in done:
                 guess_msg = message_task.result()
                 guess = guess_msg.content.lower()
 
-                if guess == correct_answer:
+                # Forgive small typos, as long as the guess isn't closer to some other handle
+                if guess == correct_answer or data.handles.resolve(guess) == correct_answer:
                     await ctx.send(f"✅ **Correct!** The Tweeter was **{username}**! 🎉\n-# Type `.game` to play again!")
-                    game_in_progress[ctx.channel.id] = False
                     return  # Stop the game if the guess is correct
 
                 # Reset the message task to wait for another guess
@@ -771,8 +4822,6 @@ async def game(ctx):
 
     except asyncio.TimeoutError:
         await ctx.send(f"⏳ **Time's up!** The correct answer was **{username}**.\n -# Type `.game` to play again!")
-    finally:
-        game_in_progress[ctx.channel.id] = False  # Ensure game flag is reset if anything goes wrong
 
 @bot.command(name="help")
 async def help_command(ctx):
@@ -785,7 +4834,9 @@ async def help_command(ctx):
         value=(
             "`.compile [user] [date]` - Fetch media (slideshow/all).\n"
             "`.richcompile [user] [date]` - Fetch full tweets with text.\n"
-            "`.stats [type]` - View stats (`top_users`, `media`, `longest`)."
+            "Dates: `2024`, `2024-01..2024-03`, `since 2023-06-01`, `last 30d`; add `newest`/`oldest` to sort.\n"
+            "`.search <words>` - Search tweet text (`AND`, `OR`, `\"phrases\"`). Add `search: <words>` to compile commands to filter.\n"
+            "`.stats [type]` - View stats (`top_users`, `media`, `longest`, `<year>`, `user <handle>`)."
         ),
         inline=False
     )
@@ -805,8 +4856,10 @@ async def help_command(ctx):
     embed.add_field(
         name="🎲 Fun & Misc",
         value=(
-            "`.game` - Guess the Tweeter from an image.\n"
+            "`.game [favorites]` - Guess the Tweeter from an image.\n"
             "`.ping` - Check bot latency.\n"
+            "`.queue` - Show your pending deliveries.\n"
+            "`.perf` - Performance stats (owner only).\n"
             "`.stop` - Stop the current process."
         ),
         inline=False
@@ -815,4 +4868,14 @@ async def help_command(ctx):
     embed.set_footer(text="Use .compile without args to see everything!")
     await ctx.send(embed=embed)
 
-bot.run(TOKEN)
+# Forked workers get a copy of the module as it is now, so this has to come after
+# everything they call (make_tweet needs clean_media_url, defined far below it), yet
+# before any thread starts
+if not ATTACH_SHARED and any(os.path.exists(path) and os.path.getsize(path) >= _parallel_parse_bytes for path in PROFILES.values()):
+    PARSE_POOL = start_parse_pool()
+
+if __name__ == "__main__":
+    if STARTUP_ARGS.loader:
+        run_loader()
+    else:
+        bot.run(TOKEN)
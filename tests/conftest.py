@@ -0,0 +1,27 @@
+"""Shared fixtures: bot.py imported against a small generated archive (see bench.py)."""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import bench
+
+ARCHIVE_SIZE = 3000
+
+@pytest.fixture(scope="session")
+def data_dir(tmp_path_factory):
+    data_dir = str(tmp_path_factory.mktemp("tweetfetch"))
+    bench.prepare_archives(data_dir, [ARCHIVE_SIZE], bench.DEFAULT_SEED)
+    return data_dir
+
+@pytest.fixture(scope="session")
+def archive(data_dir):
+    """Path of the generated liked_tweets.json."""
+    return os.path.join(data_dir, "users", bench.profile_name_for(ARCHIVE_SIZE, bench.DEFAULT_SEED), "liked_tweets.json")
+
+@pytest.fixture(scope="session")
+def bot(data_dir):
+    """bot.py, imported once (it reads config.json and the profile at import)."""
+    return bench.import_bot(data_dir, bench.profile_name_for(ARCHIVE_SIZE, bench.DEFAULT_SEED))
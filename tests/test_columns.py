@@ -0,0 +1,74 @@
+"""The NumPy columns against the Python indexes: same filter results, order, stats and .game pool."""
+
+import random
+import threading
+
+import pytest
+
+import bench
+
+@pytest.fixture(scope="module")
+def profiles(bot, archive):
+    if bot.np is None:
+        pytest.skip("needs numpy")
+    return bench.column_profiles(bot, archive)
+
+def test_filters_match(bot, profiles):
+    queries = [query[:-1] + (None,) for query in bench.column_queries(bot, bench.DEFAULT_SEED)]
+    assert bench.column_mismatches(bot, profiles, queries) == []
+
+@pytest.mark.parametrize("order", ["newest", "oldest"])
+def test_ordering_matches(bot, profiles, order):
+    queries = [query[:-1] + (order,) for query in bench.column_queries(bot, bench.DEFAULT_SEED, 200)]
+    assert bench.column_mismatches(bot, profiles, queries) == []
+
+@pytest.mark.parametrize("order", [None, "newest", "oldest"])
+def test_result_reads_a_block_at_a_time(bot, profiles, monkeypatch, order):
+    monkeypatch.setattr(bot.ColumnarResult, "BLOCK", 64)
+    rng = random.Random(bench.DEFAULT_SEED)
+    for query in bench.column_queries(bot, bench.DEFAULT_SEED, 100):
+        query = query[:-1] + (order,)
+        expected = list(bot._indexed_query(profiles[0], *query))
+        for data in profiles[2:]:
+            result = bot._columnar_query(data, *query)
+            assert len(result) == len(expected)
+            assert result.media_count() == sum(len(media) for _, media in expected)
+            cursor = result.cursor()
+            for number in rng.sample(range(len(expected)), min(len(expected), 20)):
+                assert cursor.seek(number) == expected[number]
+                assert len(cursor.matches) <= 64
+
+def test_stats_match(profiles):
+    expected = bench.stats_state(profiles[0].stats)
+    for data in profiles[2:]:
+        assert bench.stats_state(data.stats) == expected
+
+def test_game_pool_matches(profiles):
+    indexed = profiles[0]
+    user_counts = indexed.stats.user_counts
+    expected_draws = bench.game_draws(indexed.game_pool, user_counts, bench.DEFAULT_SEED)
+    for data in profiles[2:]:
+        assert bench.same_game_pool(data.game_pool, indexed.game_pool, expected_draws, user_counts, bench.DEFAULT_SEED)
+
+def test_select_during_add(bot, profiles):
+    tweets = list(profiles[0].tweets)
+    columns = bot.TweetColumns(tweets[:1000])
+    errors = []
+
+    def query():
+        while not done.is_set():
+            try:
+                positions = columns.select("all", ["user_1"], "2023", time_range=(None, None), order="newest")
+                assert all(0 <= position < len(tweets) for position in positions)
+            except Exception as e:
+                errors.append(e)
+
+    done = threading.Event()
+    thread = threading.Thread(target=query)
+    thread.start()
+    for start in range(1000, len(tweets), 5):
+        columns.add(tweets[start:start + 5])
+    done.set()
+    thread.join()
+    assert errors == []
+    assert list(columns.select("all", order="oldest")) == list(bot.TweetColumns(tweets).select("all", order="oldest"))
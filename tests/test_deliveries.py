@@ -0,0 +1,65 @@
+"""DeliveryScheduler with a stub sender: slots taken in turns across channels, and .stop cancelling queued work."""
+
+import asyncio
+
+import bench
+
+class StubSender:
+    """Records (channel id, content) per send. While gate is set and cleared, sends wait on it."""
+
+    def __init__(self):
+        self.sent = []
+        self.gate = None
+
+    async def send(self, channel_id, content=None, embeds=None, files=None):
+        if self.gate is not None:
+            await self.gate.wait()
+        await asyncio.sleep(0)
+        self.sent.append((channel_id, content))
+        return {"id": str(len(self.sent))}
+
+def messages(prefix, count):
+    return [(f"{prefix}{i}", []) for i in range(count)]
+
+def test_slots_go_round_robin_across_channels(bot):
+    async def run():
+        sender = StubSender()
+        scheduler = bot.DeliveryScheduler(sender, max_active=1, slice_messages=2)
+        contexts = [bench.FakeContext(user_id=user, channel_id=10 * user) for user in (1, 2, 3)]
+        jobs = [scheduler.submit(ctx, messages(prefix, count), "done")
+                for ctx, prefix, count in zip(contexts, "abc", (6, 4, 2))]
+        await asyncio.gather(*(job.task for job in jobs))
+        return sender.sent, contexts
+
+    sent, contexts = asyncio.run(run())
+    assert [content for _, content in sent] == ["a0", "a1", "b0", "b1", "c0", "c1", "a2", "a3", "b2", "b3", "a4", "a5"]
+    assert all(channel_id == {"a": 10, "b": 20, "c": 30}[content[0]] for channel_id, content in sent)
+    assert all(ctx.sent[-1][0] == "done" for ctx in contexts)
+
+def test_stop_cancels_queued_and_running_work(bot):
+    async def run():
+        sender = StubSender()
+        sender.gate = asyncio.Event()
+        scheduler = bot.DeliveryScheduler(sender, max_active=1, slice_messages=2)
+        running, queued = bench.FakeContext(user_id=1, channel_id=10), bench.FakeContext(user_id=2, channel_id=20)
+        first = scheduler.submit(running, messages("a", 4), "done")
+        second = scheduler.submit(queued, messages("b", 4), "done")
+        await asyncio.sleep(0.01)
+        assert scheduler.queue_position(first) == 0 and scheduler.queue_position(second) == 1
+
+        assert scheduler.cancel_user(2) == 1
+        await asyncio.gather(second.task, return_exceptions=True)
+        assert scheduler.waiting == []
+        assert scheduler.cancel_user(1) == 1
+        await asyncio.gather(first.task, return_exceptions=True)
+        assert scheduler.active == 0 and scheduler.jobs == []
+
+        sender.gate.set()  # A later delivery still gets a slot
+        third = scheduler.submit(queued, messages("c", 1), "done")
+        await third.task
+        return sender.sent, running, queued
+
+    sent, running, queued = asyncio.run(run())
+    assert sent == [(20, "c0")]
+    assert running.sent[-1][0] == "Processing stopped."
+    assert [content for content, _ in queued.sent] == ["Processing stopped.", "done"]
@@ -0,0 +1,52 @@
+"""The .game pool and per-channel rotations, including draws while a refresh grows the pool."""
+
+import asyncio
+import threading
+
+import pytest
+
+import bench
+
+def test_rotation_has_no_repeats_within_a_cycle(bot):
+    rotation = bot.GameRotation(50)
+    first = [rotation.draw() for _ in range(30)]
+    rotation.grow(80)
+    rest = [rotation.draw() for _ in range(50)]
+    assert sorted(first + rest) == list(range(80))
+
+def test_draws_during_add(bot, archive):
+    tweets = bench.verification_tweets(bot, archive)
+    cache = tweets[:100]
+    pool = bot.GamePool(cache, None)
+    for channel_id in range(4):
+        pool.draw(channel_id)
+
+    def grow():
+        for start in range(100, len(tweets), 50):
+            cache.extend(tweets[start:start + 50])  # As ProfileData.extend does, before the pool
+            pool.add(tweets[start:start + 50], start)
+
+    thread = threading.Thread(target=grow)
+    thread.start()
+    drawn = []
+    while thread.is_alive():
+        for channel_id in range(4):
+            drawn.append(pool.draw(channel_id))
+        drawn.append(pool.draw_weighted(0, {tweet.user_handle: 1 for tweet in tweets}))
+    thread.join()
+
+    assert len(pool.positions) == len(pool.media_indices) == len(bot.GamePool(tweets, None))
+    assert all(url in tweet.media for tweet, url in drawn)
+    for rotation in pool.rotations.values():
+        assert rotation.size == len(pool)
+        left = [rotation.draw() for _ in range(rotation.remaining)]
+        assert len(set(left)) == len(left) and all(0 <= index < len(pool) for index in left)
+
+def test_failed_game_frees_the_channel(bot, monkeypatch):
+    async def failing_load(*args, **kwargs):
+        raise RuntimeError("load failed")
+
+    monkeypatch.setattr(bot, "load_tweets_async", failing_load)
+    with pytest.raises(RuntimeError):
+        asyncio.run(bot.game.callback(bench.FakeContext(channel_id=42)))
+    assert not bot.game_in_progress[42]
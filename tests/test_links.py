@@ -0,0 +1,86 @@
+"""LinkChecker against a local server: cached answers, TTL expiry and which statuses count."""
+
+import asyncio
+import collections
+import time
+
+from aiohttp import web
+
+def run_checker(bot, cache_file, check, ttl=3600):
+    """Run check(checker, url_for) against a local media server. Returns (check's result,
+    requests received per path)."""
+    requests = collections.Counter()
+
+    def answer(status):
+        async def handler(request):
+            requests[request.path] += 1
+            return web.Response(status=status)
+        return handler
+
+    async def slow(request):
+        requests[request.path] += 1
+        await asyncio.sleep(1)
+        return web.Response()
+
+    async def run():
+        app = web.Application()
+        for path, status in (("/ok.jpg", 200), ("/gone.jpg", 404), ("/busy.jpg", 429), ("/broken.jpg", 500)):
+            app.router.add_get(path, answer(status))
+        app.router.add_route("HEAD", "/nohead.mp4", answer(405))
+        app.router.add_get("/nohead.mp4", answer(206), allow_head=False)
+        app.router.add_get("/slow.jpg", slow)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", 0).start()
+        port = runner.addresses[0][1]
+        checker = bot.LinkChecker(enabled=True, cache_file=cache_file, ttl=ttl, concurrency=4, timeout=0.3)
+        try:
+            return await check(checker, lambda path: f"http://127.0.0.1:{port}{path}")
+        finally:
+            await checker.close()
+            await runner.cleanup()
+
+    return asyncio.run(run()), requests
+
+def test_answers_are_classified(bot, tmp_path):
+    async def check(checker, url_for):
+        paths = ("/ok.jpg", "/gone.jpg", "/busy.jpg", "/broken.jpg", "/nohead.mp4", "/slow.jpg")
+        return {path: await checker.check(url_for(path)) for path in paths}
+
+    result, requests = run_checker(bot, str(tmp_path / "links.json"), check)
+    assert result == {"/ok.jpg": True, "/gone.jpg": False, "/busy.jpg": None, "/broken.jpg": None,
+                      "/nohead.mp4": True, "/slow.jpg": None}
+    assert requests["/nohead.mp4"] == 2  # HEAD, then a one-byte GET
+
+def test_cached_answers_are_not_probed_again(bot, tmp_path):
+    async def check(checker, url_for):
+        ok, gone, busy = url_for("/ok.jpg"), url_for("/gone.jpg"), url_for("/busy.jpg")
+        await asyncio.gather(*(checker.check(url) for url in (ok, ok, ok, gone)))  # One probe for the three
+        await checker.check_all([ok, gone, busy])
+        await checker.check(busy)
+        return checker.alive_media([ok, gone, busy])
+
+    result, requests = run_checker(bot, str(tmp_path / "links.json"), check)
+    assert result[0].endswith("/ok.jpg") and result[1].endswith("/busy.jpg") and len(result) == 2
+    assert requests["/ok.jpg"] == 1 and requests["/gone.jpg"] == 1
+    assert requests["/busy.jpg"] == 2  # Unknown answers aren't cached
+
+def test_expired_answers_are_probed_again(bot, tmp_path):
+    cache_file = str(tmp_path / "links.json")
+
+    async def check(checker, url_for):
+        ok, gone = url_for("/ok.jpg"), url_for("/gone.jpg")
+        await checker.check(ok)
+        await checker.check(gone)
+        checker.results[ok] = (True, time.time() - 120)  # Checked before the TTL
+        assert checker.status(ok) is None and checker.status(gone) is False
+        assert await checker.check(ok) is True
+        checker.results[gone] = (False, time.time() - 120)
+        await checker.save()
+        return ok, gone
+
+    (ok, gone), requests = run_checker(bot, cache_file, check, ttl=60)
+    assert requests["/ok.jpg"] == 2 and requests["/gone.jpg"] == 1
+    reloaded = bot.LinkChecker(enabled=True, cache_file=cache_file, ttl=60)
+    assert reloaded.status(ok) is True
+    assert gone not in reloaded.results  # Expired entries aren't saved
@@ -0,0 +1,81 @@
+"""MediaStore against a local server: files stored once per hash, the byte budget and failed downloads."""
+
+import asyncio
+import collections
+import os
+
+from aiohttp import web
+
+FILES = {"/a.jpg": b"a" * 400, "/a-again.jpg": b"a" * 400, "/b.jpg": b"b" * 400, "/c.png": b"c" * 400,
+         "/big.mp4": b"v" * 5000}
+
+def run_store(bot, root, fetch, max_bytes=1000):
+    """Run fetch(store, url_for) against a local media server. Returns (fetch's result,
+    requests received per path)."""
+    requests = collections.Counter()
+
+    async def media(request):
+        requests[request.path] += 1
+        if request.path in FILES:
+            return web.Response(body=FILES[request.path])
+        return web.Response(status=int(request.path.strip("/").split(".")[0]))
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/{name}", media)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", 0).start()
+        port = runner.addresses[0][1]
+        store = bot.MediaStore(root=root, max_bytes=max_bytes, max_file_bytes=1000, concurrency=2, timeout=5)
+        try:
+            return await fetch(store, lambda path: f"http://127.0.0.1:{port}{path}")
+        finally:
+            await store.close()
+            await runner.cleanup()
+
+    return asyncio.run(run()), requests
+
+def stored_files(root):
+    return sorted(name for _, _, names in os.walk(root) for name in names if name != "index.json")
+
+def test_same_file_is_stored_once(bot, tmp_path):
+    async def fetch(store, url_for):
+        first, copy = await asyncio.gather(store.fetch(url_for("/a.jpg")), store.fetch(url_for("/a-again.jpg")))
+        again = await store.fetch(url_for("/a.jpg"))
+        return first, copy, again, store.used_bytes
+
+    (first, copy, again, used_bytes), requests = run_store(bot, str(tmp_path), fetch)
+    assert first == copy == again
+    with open(first, "rb") as f:
+        assert f.read() == FILES["/a.jpg"]
+    assert used_bytes == 400
+    assert len(stored_files(str(tmp_path))) == 1
+    assert requests["/a.jpg"] == 1 and requests["/a-again.jpg"] == 1
+
+def test_least_recently_used_files_are_evicted(bot, tmp_path):
+    async def fetch(store, url_for):
+        a, b, c = url_for("/a.jpg"), url_for("/b.jpg"), url_for("/c.png")
+        await store.fetch(a)
+        await store.fetch(b)
+        await store.fetch(a)  # b is now the least recently used
+        await store.fetch(c)
+        return [store.lookup(url) is not None for url in (a, b, c)], store.used_bytes
+
+    (cached, used_bytes), requests = run_store(bot, str(tmp_path), fetch)
+    assert cached == [True, False, True]
+    assert used_bytes == 800
+    assert len(stored_files(str(tmp_path))) == 2
+
+def test_failed_downloads_store_nothing(bot, tmp_path):
+    async def fetch(store, url_for):
+        paths = ("/404.jpg", "/500.jpg", "/big.mp4")
+        results = [await store.fetch(url_for(path)) for path in paths]
+        results.append(await store.fetch(url_for("/500.jpg")))  # Failures aren't cached
+        return results, store.used_bytes
+
+    (results, used_bytes), requests = run_store(bot, str(tmp_path), fetch)
+    assert results == [None, None, None, None]
+    assert used_bytes == 0
+    assert stored_files(str(tmp_path)) == []  # No temp files left behind either
+    assert requests["/500.jpg"] == 2
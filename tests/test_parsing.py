@@ -0,0 +1,55 @@
+"""The fast created_at parser and the multi-process parse against their reference versions."""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+import bench
+
+def test_parse_created_at_matches_strptime(bot):
+    mismatches = []
+    for text in bench.created_at_cases(bench.DEFAULT_SEED, 20_000):
+        expected = bot.parse_tweet_date({"tweet_created_at": text})
+        if expected is not None:
+            expected = (int(expected.timestamp()), int(expected.utcoffset().total_seconds()))
+        if bot.parse_created_at(text) != expected:
+            mismatches.append(text)
+    assert mismatches == []
+
+def tweet_fields(tweets):
+    return [(t.tweet_id, t.user_handle, t.text, t.timestamp, t.utc_offset, t.media, t.media_types) for t in tweets]
+
+def test_parallel_parse_matches_serial(bot, archive):
+    pool = bot.PARSE_POOL or bot.start_parse_pool(2)
+    if pool is None:
+        pytest.skip("needs fork")
+    serial = bot.parse_tweets_file(archive, parallel=False)
+    parallel = bot.parse_tweets_parallel(archive, pool)
+    assert parallel is not None
+    assert tweet_fields(parallel[0]) == tweet_fields(serial[0])
+    assert parallel[2] == serial[2]
+
+def test_pool_started_at_import_parses(archive, tmp_path):
+    """The pool bot.py starts at import (for profiles of PARALLEL_PARSE_MB or more) can parse,
+    which needs its forked workers to have the whole module."""
+    profile = os.path.basename(os.path.dirname(archive))
+    users = tmp_path / "users"
+    os.makedirs(users / profile)
+    shutil.copyfile(archive, users / profile / "liked_tweets.json")
+    with open(tmp_path / "config.json", "w") as f:
+        json.dump({"TOKEN": "x", "PARALLEL_PARSE_MB": 0.5, "PARSE_PROCESSES": 2, "SNAPSHOTS": False}, f)
+    script = (
+        "import bot, sys\n"
+        "if bot.PARSE_POOL is None: sys.exit('no parse pool')\n"
+        "parallel = bot.parse_tweets_parallel(bot.PROFILES[bot.DEFAULT_PROFILE])\n"
+        "serial = bot.parse_tweets_file(bot.PROFILES[bot.DEFAULT_PROFILE], parallel=False)\n"
+        "if parallel is None or len(parallel[0]) != len(serial[0]): sys.exit('parallel parse failed')\n"
+    )
+    env = dict(os.environ, TWEETFETCH_USERS_PATH=str(users) + os.sep, TWEETFETCH_PROFILE=profile,
+               PYTHONPATH=bench.REPO_DIR)
+    result = subprocess.run([sys.executable, "-c", script], cwd=tmp_path, env=env, capture_output=True, text=True, timeout=300)
+    assert result.returncode == 0, result.stdout + result.stderr
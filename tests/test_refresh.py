@@ -0,0 +1,29 @@
+"""Lookups the event loop and workers make while a refresh extends the profile in another thread."""
+
+import threading
+
+import bench
+
+def test_lookups_during_extend(bot, archive):
+    tweets = bench.verification_tweets(bot, archive)
+    data = bot.ProfileData("refresh", archive, tweets[:200], {}, {})
+    errors = []
+
+    def look_up():
+        while not done.is_set():
+            try:
+                data.stats.find_user("NOBODY")
+                data.handles.containing("u")
+                data.text_index.entry_count()
+                data.estimated_bytes()
+            except Exception as e:
+                errors.append(e)
+
+    done = threading.Event()
+    thread = threading.Thread(target=look_up)
+    thread.start()
+    for start in range(200, len(tweets), 20):
+        data.extend(tweets[start:start + 20])
+    done.set()
+    thread.join()
+    assert errors == []
@@ -0,0 +1,12 @@
+"""How .search queries are split into OR-groups of AND-ed clauses."""
+
+def test_words_are_anded(bot):
+    assert bot.parse_search_query("cat dog") == [[("cat",), ("dog",)]]
+
+def test_explicit_and_is_skipped(bot):
+    expected = bot.parse_search_query("cat dog")
+    assert bot.parse_search_query("cat AND dog") == expected
+    assert bot.parse_search_query("cat & dog") == expected
+
+def test_or_and_phrases(bot):
+    assert bot.parse_search_query('cat AND dog OR "red fox" | owl') == [[("cat",), ("dog",)], [("red", "fox")], [("owl",)]]
@@ -0,0 +1,57 @@
+"""RateLimitedSender against a local mock of Discord's message endpoint."""
+
+import asyncio
+
+from aiohttp import web
+
+def run_sender(bot, responses, **kwargs):
+    """Send one message to a mock API that answers with responses (a list of web.Response
+    factories, the last one repeated). Returns (send's result, requests received)."""
+    requests = []
+
+    async def post_message(request):
+        requests.append(await request.json())
+        return responses[min(len(requests), len(responses)) - 1]()
+
+    async def run():
+        app = web.Application()
+        app.router.add_post("/channels/{channel_id}/messages", post_message)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        sender = bot.RateLimitedSender("token", api_base=f"http://127.0.0.1:{port}")
+        sender.SERVER_ERROR_BACKOFF = 0
+        try:
+            return await sender.send(1, content="hi", **kwargs)
+        finally:
+            await sender.close()
+            await runner.cleanup()
+
+    return asyncio.run(run()), requests
+
+def sent():
+    return web.json_response({"id": "1"})
+
+def test_429_with_html_body_backs_off(bot):
+    html_429 = lambda: web.Response(status=429, text="<html>slow down</html>", content_type="text/html",
+                                    headers={"Retry-After": "0"})
+    result, requests = run_sender(bot, [html_429, sent])
+    assert result == {"id": "1"}
+    assert len(requests) == 2
+
+def test_429_uses_reset_after_header(bot):
+    assert bot.RateLimitedSender._retry_after({}, {"X-RateLimit-Reset-After": "2.5"}) == 2.5
+    assert bot.RateLimitedSender._retry_after({}, {"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}) == 1.0
+    assert bot.RateLimitedSender._retry_after({"retry_after": 0.25}, {"Retry-After": "3"}) == 0.25
+
+def test_server_errors_are_retried(bot):
+    result, requests = run_sender(bot, [lambda: web.Response(status=502), lambda: web.Response(status=503), sent])
+    assert result == {"id": "1"}
+    assert len(requests) == 3
+
+def test_persistent_server_error_gives_up_on_the_message(bot):
+    result, requests = run_sender(bot, [lambda: web.Response(status=500)])
+    assert result is None
+    assert len(requests) == bot.RateLimitedSender.SERVER_ERROR_RETRIES + 1
@@ -0,0 +1,44 @@
+"""The --loader's publishing: what it republishes and what it skips."""
+
+import os
+import shutil
+
+import pytest
+
+@pytest.fixture
+def loader(bot, archive, tmp_path, monkeypatch):
+    """A profile "shared" backed by a copy of the archive, publishing to a store under tmp_path.
+    Hash blocks are shrunk so the file is only sampled, like a big export."""
+    monkeypatch.setattr(bot, "SNAPSHOT_HASH_BLOCK", 256)
+    monkeypatch.setattr(bot, "SNAPSHOT_HASH_BLOCKS", 4)
+    json_path = str(tmp_path / "liked_tweets.json")
+    shutil.copyfile(archive, json_path)
+    monkeypatch.setitem(bot.PROFILES, "shared", json_path)
+    monkeypatch.setattr(bot, "SHARED_STORE", bot.SharedStore(str(tmp_path / "store")))
+    monkeypatch.setattr(bot, "PROFILE_CACHE", bot.ProfileCache(1024))
+    bot.publish_profile("shared")
+    return json_path
+
+def test_unchanged_file_is_not_loaded(bot, loader, monkeypatch):
+    monkeypatch.setattr(bot, "load_tweets", lambda *args, **kwargs: pytest.fail("reloaded an unchanged file"))
+    bot.publish_profile("shared")
+    assert bot.SHARED_STORE.current("shared")["version"] == 1
+
+def test_touched_file_is_not_republished(bot, loader, monkeypatch):
+    stat = os.stat(loader)
+    os.utime(loader, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    bot.publish_profile("shared")
+    pointer = bot.SHARED_STORE.current("shared")
+    assert pointer["version"] == 1
+    assert pointer["source"]["mtime_ns"] == stat.st_mtime_ns + 10**9
+
+def test_edit_between_sampled_blocks_is_republished(bot, loader):
+    stat = os.stat(loader)
+    with open(loader, "rb+") as f:
+        content = f.read()
+        f.seek(content.index(b"user_", len(content) // 6) + len(b"user_"))
+        f.write(b"9")
+    os.utime(loader, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert bot.content_hash(loader, stat.st_size) == bot.SHARED_STORE.current("shared")["source"]["hash"]
+    bot.publish_profile("shared")
+    assert bot.SHARED_STORE.current("shared")["version"] == 2
@@ -0,0 +1,84 @@
+"""Loading a profile through its snapshot, unchanged and after tweets were appended."""
+
+import json
+import os
+import shutil
+
+import pytest
+
+import bench
+
+@pytest.fixture
+def json_path(archive, tmp_path):
+    path = str(tmp_path / "liked_tweets.json")
+    shutil.copyfile(archive, path)
+    return path
+
+def append_tweets(path, count, seed=2):
+    """Add count generated tweets to the end of the file's array, the way the exporter does."""
+    with open(path, "rb+") as f:
+        content = f.read()
+        f.seek(content.rindex(b"]"))
+        f.write("".join(",\n" + json.dumps(tweet) for tweet in bench.generate_tweets(count, seed)).encode() + b"\n]\n")
+
+def text_index_state(index):
+    return index.postings, index.frequencies, index.lengths, index.total_length
+
+def test_text_index_is_stored(bot, json_path):
+    tweets, _, _, built = bot.load_profile_tweets(json_path)
+    loaded_tweets, _, _, loaded = bot.load_profile_tweets(json_path)
+    assert len(loaded_tweets) == len(tweets)
+    assert text_index_state(loaded) == text_index_state(built)
+
+def test_appended_tweets_are_indexed(bot, json_path):
+    bot.load_profile_tweets(json_path)
+    append_tweets(json_path, 50)
+    tweets, _, _, text_index = bot.load_profile_tweets(json_path)
+    assert text_index_state(text_index) == text_index_state(bot.TextIndex(tweets))
+    assert text_index_state(bot.load_profile_tweets(json_path)[3]) == text_index_state(text_index)
+
+def test_touched_file_updates_the_snapshot(bot, json_path):
+    bot.load_profile_tweets(json_path)
+    stat = os.stat(json_path)
+    os.utime(json_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    source = bot.load_profile_tweets(json_path)[2]
+    meta, _ = bot.open_snapshot(bot.snapshot_path_for(json_path))
+    assert meta["source"] == source
+    assert source["mtime_ns"] == stat.st_mtime_ns + 10**9
+
+def test_append_hashes_the_old_bytes_once(bot, json_path, monkeypatch):
+    monkeypatch.setattr(bot, "PREFIX_CHUNK", 4096)
+    bot.load_profile_tweets(json_path)
+    old_size = os.path.getsize(json_path)
+    append_tweets(json_path, 50)
+
+    hashed = []
+    chunk_digests = bot.chunk_digests
+    def recording_chunk_digests(path, start, end):
+        hashed.append(end - start)
+        return chunk_digests(path, start, end)
+    monkeypatch.setattr(bot, "chunk_digests", recording_chunk_digests)
+    source = bot.load_profile_tweets(json_path)[2]
+
+    # Every old chunk to check the append, then the new bytes (and the old last chunk) to record it
+    assert sum(hashed) <= os.path.getsize(json_path) + bot.PREFIX_CHUNK
+    assert source["prefix_chunks"] == chunk_digests(json_path, 0, source["append_offset"])
+
+def test_append_after_an_edit_is_a_change(bot, json_path, monkeypatch):
+    monkeypatch.setattr(bot, "PREFIX_CHUNK", 4096)
+    source = bot.load_profile_tweets(json_path)[2]
+    with open(json_path, "rb+") as f:
+        content = f.read()
+        offset = content.index(b"tweet_content", 5 * 4096) + len(b'tweet_content": "')
+        f.seek(offset)
+        f.write(b"X" if content[offset:offset + 1] != b"X" else b"Y")  # Same length, one chunk in the middle
+    append_tweets(json_path, 50)
+    assert bot.detect_change(json_path, source) == "changed"
+
+def test_refresh_reads_appended_tweets(bot, json_path):
+    tweets, memory_report, source, text_index = bot.load_profile_tweets(json_path)
+    data = bot.ProfileData("refresh", json_path, tweets, memory_report, source, text_index=text_index)
+    append_tweets(json_path, 50)
+    assert data.refresh() == 50
+    assert data.source["prefix_chunks"] == bot.chunk_digests(json_path, 0, data.source["append_offset"])
+    assert data.refresh() == 0
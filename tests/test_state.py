@@ -0,0 +1,53 @@
+"""StateStore crash recovery: what a reopened store replays from the log, and the file it compacts to."""
+
+import json
+
+def reopened(bot, path):
+    store = bot.StateStore(path)
+    store.load()
+    return store
+
+def test_reopen_after_crash_replays_flushed_changes(bot, tmp_path):
+    path = str(tmp_path / "state.json")
+    store = reopened(bot, path)
+    store.put("user_prefs", "1", "jpg")
+    store.put("user_prefs", "2", "mp4")
+    store.flush()
+    store.put("user_prefs", "2", None)
+    store.put("profiles", "guild:1", "archive")
+    store.flush()
+    store.put("user_prefs", "3", "png")  # Never flushed: lost in the crash
+    with open(store.log_path, "a") as f:
+        f.write('[0, "user_prefs", "4", "jp')  # A line the crash cut off
+    del store
+
+    store = reopened(bot, path)
+    expected = {"user_prefs": {"1": "jpg"}, "profiles": {"guild:1": "archive"}}
+    assert store.data == expected
+    # The damaged log was folded into the state file and a clean log started
+    with open(path) as f:
+        assert json.load(f) == {"generation": 1, "data": expected}
+    with open(store.log_path) as f:
+        assert f.read() == ""
+
+    store.put("user_prefs", "5", "all")
+    store.flush()
+    del store
+    assert reopened(bot, path).data == {**expected, "user_prefs": {"1": "jpg", "5": "all"}}
+
+def test_log_of_an_older_generation_is_ignored(bot, tmp_path):
+    path = str(tmp_path / "state.json")
+    store = reopened(bot, path)
+    store.put("user_prefs", "1", "jpg")
+    store.flush()
+    with open(store.log_path) as f:
+        old_log = f.read()
+    store.put("user_prefs", "1", "png")
+    store.flush(compact=True)
+    with open(store.log_path, "w") as f:
+        f.write(old_log)  # As if the crash came between writing the state file and emptying the log
+    del store
+
+    store = reopened(bot, path)
+    assert store.data == {"user_prefs": {"1": "png"}}
+    assert store.generation == 1